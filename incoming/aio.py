@@ -0,0 +1,218 @@
+'''
+    incoming.aio
+    ~~~~~~~~~~~~
+
+    :mod:`asyncio` support. Requires Python 3.5 or later.
+'''
+
+import asyncio
+import itertools
+
+from .compat import isawaitable, iteritems
+from .datatypes import _func, _passing, Array, Instance, JSON, Types
+from .incoming import CompactErrors, PayloadErrors
+
+
+async def avalidate(validator, payload, required=None, strict=None,
+                    fail_fast=None):
+    '''
+    Validates a payload like :meth:`incoming.PayloadValidator.validate`, but
+    runs the checks of all the fields/keys concurrently. Validation functions
+    of :class:`incoming.datatypes.Function` may be coroutine functions and
+    nested :class:`incoming.datatypes.JSON` payloads are validated
+    concurrently as well, so validating a payload takes as long as its slowest
+    check.
+
+    In ``fail_fast`` mode, checks that are still running when the first field
+    fails are cancelled.
+
+    Use :meth:`incoming.PayloadValidator.avalidate` instead of calling this
+    directly.
+    '''
+
+    # Nested JSON payloads are validated with the options passed in.
+    options = (required, strict, fail_fast)
+    required = required if required is not None else validator.required
+    strict = strict if strict is not None else validator.strict
+    fail_fast = fail_fast if fail_fast is not None else validator.fail_fast
+
+    rules = validator._rules
+    checks = validator._plan.checks
+    max_errors = validator.max_errors
+    errors = {}
+    pending = []
+
+    shape = validator._plan.shape(payload, required,
+                                  validator.max_extra_keys)
+
+    for key in shape.present:
+        value = payload[key]
+        if key in checks:
+            if not isinstance(value, checks[key]):
+                errors[key] = [rules[key].error]
+        else:
+            pending.append(_test(rules[key], key, value, payload, options))
+
+    # Number of extra keys left out of shape.extra, see max_extra_keys
+    unlisted = 0
+    if strict:
+        for key in shape.extra:
+            errors[key] = [validator.strict_error]
+        unlisted = shape.extra_count - len(shape.extra)
+
+    for field in shape.missing:
+        errors[field] = [validator.required_error]
+
+    for field in shape.optional:
+        pending.append(_test(rules[field], field, None, payload, options))
+
+    # Checks still running once ``limit`` fields/keys have failed are
+    # cancelled. At most max_errors fields/keys are reported, and only if no
+    # more than that many fail, so validation goes on until one more fails.
+    if fail_fast:
+        limit = 1
+    else:
+        limit = max_errors + 1 if max_errors is not None else None
+    if (errors or unlisted) and fail_fast or \
+            limit is not None and len(errors) >= limit:
+        for coro in pending:
+            coro.close()
+        pending = []
+
+    if pending and limit is not None:
+        tasks = [asyncio.ensure_future(coro) for coro in pending]
+        try:
+            for task in asyncio.as_completed(tasks):
+                key, field_errors = await task
+                if field_errors:
+                    errors[key] = field_errors
+                    if len(errors) >= limit:
+                        break
+        finally:
+            for task in tasks:
+                task.cancel()
+    elif pending:
+        for key, field_errors in await asyncio.gather(*pending):
+            if field_errors:
+                errors[key] = field_errors
+
+    if not errors and not unlisted:
+        return True, None
+
+    if fail_fast:
+        if not errors:
+            return False, _errors(validator, {validator.payload_error_key: [
+                validator.max_extra_keys_error % unlisted]})
+        key = next(iter(errors))
+        return False, _errors(validator, {key: errors[key]})
+
+    truncated = max_errors is not None and len(errors) > max_errors
+    if truncated:
+        errors = dict(itertools.islice(iteritems(errors), max_errors))
+
+    summary = []
+    if unlisted:
+        summary.append(validator.max_extra_keys_error % unlisted)
+    if truncated:
+        summary.append(validator.max_errors_error % max_errors)
+    if summary:
+        errors[validator.payload_error_key] = summary
+
+    return False, _errors(validator, errors)
+
+
+def _errors(validator, errors):
+    # Returns a dict of errors as PayloadValidator.validate would, i.e. as
+    # CompactErrors if compact_errors is on. Errors of nested validators are
+    # converted either way.
+    result = CompactErrors() if validator.compact_errors else PayloadErrors()
+    for key, field_errors in iteritems(errors):
+        result._record(key, field_errors)
+    if validator.compact_errors:
+        return result
+    return result._errors
+
+
+async def _test(rule, key, value, payload, options):
+    # Runs a rule that is not a plain type check. Returns the key along with
+    # the list of errors for it.
+    errors = []
+    await _atest(rule, key, value, payload, errors, options)
+    return key, errors
+
+
+async def _atest(rule, key, value, payload, errors, options):
+    # Runs the test of a rule, awaiting the results of coroutine validation
+    # functions. Rules that override the test of their datatype are run as
+    # they are.
+    test = _func(rule.__class__.test)
+    if test is _func(Types.test):
+        return await _avalidate(rule, key, value, payload, errors, options)
+    if test is _func(Array.test):
+        return await _test_array(rule, key, value, payload, errors, options)
+    # Tasks take turns on the thread, so the options are passed to nested
+    # validators of synchronous tests only while those run.
+    with _passing(*options):
+        return rule.test(key, value, payload=payload, errors=errors)
+
+
+async def _avalidate(rule, key, value, payload, errors, options):
+    # Same as Types.test. Nested JSON payloads are validated concurrently.
+    if isinstance(rule, JSON) and \
+            _func(rule.__class__.validate) is _func(JSON.validate):
+        result = isinstance(value, dict)
+        if result:
+            result, nested_errors = await rule.validator.avalidate(
+                value, *options)
+            if not result:
+                errors.append(nested_errors)
+    else:
+        with _passing(*options):
+            result = rule.validate(value, key=key, payload=payload,
+                                   errors=errors)
+        if isawaitable(result):
+            result = await result
+        if not isinstance(result, bool):
+            raise TypeError('The value returned by validate() method must be '
+                            'a bool value.')
+
+    if not result:
+        errors.insert(0, rule.error)
+    return result
+
+
+async def _test_array(rule, key, value, payload, errors, options):
+    # Same as Array.test, but the items are validated concurrently.
+    if not await _avalidate(rule, key, value, payload, errors, options):
+        return False
+
+    if not rule._test_length(value, errors):
+        return False
+
+    of = rule.of
+    if of is None or not value:
+        return True
+
+    if isinstance(of, Instance) and of._type_only():
+        item_errors = rule._test_types(value)
+    else:
+        results = await asyncio.gather(*[
+            _test(of, index, item, payload, options)
+            for index, item in enumerate(value)])
+        # The errors of the first max_item_errors invalid items are reported,
+        # like Array.test does.
+        item_errors = dict(itertools.islice(
+            ((index, item_errors) for index, item_errors in results
+             if item_errors), rule.max_item_errors))
+
+    if item_errors:
+        errors.extend((rule.error, item_errors))
+        return False
+
+    return True
+
+
+async def _settle(awaitable, settled, *args):
+    # Awaits the result of a coroutine validation function of
+    # incoming.datatypes.Function and hands it to ``settled``.
+    return settled(await awaitable, *args)
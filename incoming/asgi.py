@@ -0,0 +1,107 @@
+'''
+    incoming.asgi
+    ~~~~~~~~~~~~~
+
+    ASGI middleware that validates JSON request bodies. Requires Python 3.5
+    or later.
+'''
+
+from .middleware import error_response, METHODS, MAX_CONTENT_LENGTH, \
+    PAYLOAD_KEY, Router, too_large
+
+
+class ASGIMiddleware(object):
+
+    '''
+    ASGI middleware that validates the JSON bodies of HTTP requests with the
+    validator of their route, see :class:`incoming.middleware.Router`.
+    Requests with a ``Content-Length`` larger than allowed are answered with
+    ``413`` before their bodies are received, and so are requests whose
+    bodies turn out to be larger while they are received. Requests with
+    invalid bodies are answered with ``400``, with the errors as JSON.
+
+    The validated payload is stored in the scope under ``payload_key`` and
+    the body can still be received by the application.
+
+    :param app: the ASGI application to wrap.
+    :param dict routes: see :class:`incoming.middleware.Router`.
+    '''
+
+    def __init__(self, app, routes, methods=METHODS,
+                 max_content_length=MAX_CONTENT_LENGTH,
+                 payload_key=PAYLOAD_KEY):
+        self.app = app
+        self.router = Router(routes, methods, max_content_length)
+        self.payload_key = payload_key
+
+    async def __call__(self, scope, receive, send):
+        validator = None
+        if scope['type'] == 'http':
+            validator = self.router.match(scope['method'], scope['path'])
+        if validator is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.router.limit(validator)
+        for name, value in scope.get('headers', ()):
+            if name.lower() == b'content-length':
+                try:
+                    length = int(value)
+                except ValueError:
+                    break
+                if length > limit:
+                    await _respond(send, *too_large(validator))
+                    return
+                break
+
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                # The client disconnected.
+                return
+
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                await _respond(send, *too_large(validator))
+                return
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+
+        body = b''.join(chunks)
+        is_valid, errors, payload = validator.validate_bytes(body)
+        if not is_valid:
+            await _respond(send, *error_response(validator, errors))
+            return
+
+        scope = dict(scope)
+        scope[self.payload_key] = payload
+        await self.app(scope, _replay(body, receive), send)
+
+
+def _replay(body, receive):
+    # Returns a receive callable that hands out the body that has been
+    # received already and then defers to ``receive``.
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def replay():
+        if pending:
+            return pending.pop()
+        return await receive()
+
+    return replay
+
+
+async def _respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
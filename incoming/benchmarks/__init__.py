@@ -0,0 +1,45 @@
+'''
+    incoming.benchmarks
+    ~~~~~~~~~~~~~~~~~~~
+
+    Benchmarks for incoming. The benchmark suite in
+    :mod:`incoming.benchmarks.suite` is run like so::
+
+        python -m incoming.benchmarks
+
+    Benchmarks of particular features live in their own modules, which can
+    be run on their own, for example::
+
+        python -m incoming.benchmarks.fail_fast
+'''
+
+from __future__ import print_function
+
+import timeit
+
+
+def measure(func, number=1000, repeat=5):
+    '''
+    Measures how long a call to ``func`` takes.
+
+    :param func: a callable that accepts no arguments.
+    :param int number: number of calls to ``func`` per measurement.
+    :param int repeat: number of measurements. The best one is used.
+
+    :returns float: seconds per call.
+    '''
+
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(name, seconds, baseline=None):
+    '''
+    Prints the result of a measurement, optionally along with the speedup over
+    a ``baseline`` measurement.
+    '''
+
+    line = '%-45s %10.2f us/op %12.0f ops/s' % (name, seconds * 1e6,
+                                                1.0 / seconds)
+    if baseline is not None:
+        line += '  %6.2fx' % (baseline / seconds)
+    print(line)
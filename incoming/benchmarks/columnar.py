@@ -0,0 +1,57 @@
+'''
+    incoming.benchmarks.columnar
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Validation of a batch of records stored as columns with
+    :meth:`incoming.PayloadValidator.validate_columns`, compared with
+    transposing the columns into records and validating every record.
+'''
+
+from .. import datatypes, PayloadValidator
+from ..columnar import numpy
+from . import measure, report
+
+ROWS = 10000
+
+
+class RecordValidator(PayloadValidator):
+    id = datatypes.Integer()
+    name = datatypes.String()
+    score = datatypes.Float()
+    rank = datatypes.Number()
+    active = datatypes.Boolean()
+
+
+def columns(rows=ROWS):
+    return dict(id=list(range(rows)), name=['name'] * rows,
+                score=[1.5] * rows, rank=[3] * rows, active=[True] * rows)
+
+
+def main():
+    validator = RecordValidator()
+    data = columns()
+
+    def transposed():
+        fields = list(data)
+        for values in zip(*[data[field] for field in fields]):
+            validator.validate(dict(zip(fields, values)))
+
+    baseline = measure(transposed, number=5)
+    report('%d rows, transposed' % ROWS, baseline)
+    report('%d rows, columns' % ROWS,
+           measure(lambda: validator.validate_columns(data), number=5),
+           baseline)
+
+    if numpy is not None:
+        arrays = dict(id=numpy.arange(ROWS),
+                      name=numpy.array(data['name']),
+                      score=numpy.array(data['score']),
+                      rank=numpy.array(data['rank']),
+                      active=numpy.array(data['active']))
+        report('%d rows, numpy columns' % ROWS,
+               measure(lambda: validator.validate_columns(arrays), number=5),
+               baseline)
+
+
+if __name__ == '__main__':
+    main()
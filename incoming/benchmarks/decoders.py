@@ -0,0 +1,45 @@
+'''
+    incoming.benchmarks.decoders
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Decoding typical payloads with every installed decoder of
+    :mod:`incoming.decoders`, compared with the :mod:`json` module of the
+    standard library.
+'''
+
+import json
+
+from ..decoders import DECODERS, get_decoder
+from . import measure, report
+
+
+def payloads():
+    event = dict(id=1, type='click', user='alice', active=True, score=9.5,
+                 tags=['a', 'b'], data=dict(x=1, y=2, label=u'caf\xe9'))
+    return [
+        ('event', event),
+        ('100 events', dict(events=[dict(event, id=i) for i in range(100)])),
+        ('500 keys', dict(('key%d' % i, i) for i in range(500))),
+    ]
+
+
+def main():
+    stdlib = get_decoder('json')
+    for name, payload in payloads():
+        data = json.dumps(payload).encode('utf-8')
+        baseline = measure(lambda: stdlib.loads(data), number=200)
+        report('%s (json)' % name, baseline)
+
+        for decoder_name in sorted(DECODERS):
+            if decoder_name == 'json':
+                continue
+            decoder = get_decoder(decoder_name)
+            report('%s (%s)' % (name, decoder_name),
+                   measure(lambda: decoder.loads(data), number=200), baseline)
+            report('%s (%s, memoryview)' % (name, decoder_name),
+                   measure(lambda: decoder.loads(memoryview(data)),
+                           number=200), baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+    incoming.benchmarks.errors
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Memory held by the errors of invalid payloads, with and without
+    :attr:`incoming.PayloadValidator.compact_errors`.
+'''
+
+from __future__ import print_function
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from .. import datatypes, PayloadValidator
+from . import measure, report
+
+RESULTS = 1000
+
+
+class RecordValidator(PayloadValidator):
+    strict = True
+
+    id = datatypes.Integer()
+    name = datatypes.String()
+    email = datatypes.String()
+    score = datatypes.Float()
+
+
+class CompactRecordValidator(RecordValidator):
+    compact_errors = True
+
+
+def retained(validator, payload):
+    # Bytes held per result by RESULTS results of validating ``payload``.
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        results = [validator.validate(payload) for _ in range(RESULTS)]
+        size = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    del results
+    return size // RESULTS
+
+
+def main():
+    payload = dict(('extra%d' % i, i) for i in range(50))
+    payload.update(id='1', score='9.5')
+
+    for validator in (RecordValidator(), CompactRecordValidator()):
+        name = validator.__class__.__name__
+        report('%s, 54 errors' % name,
+               measure(lambda: validator.validate(payload)))
+        if tracemalloc is not None:
+            print('%-45s %10d bytes/result' % (name,
+                                               retained(validator, payload)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''
+    incoming.benchmarks.fail_fast
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compares ``fail_fast`` mode with full validation on invalid-heavy traffic.
+'''
+
+import hashlib
+
+from .. import datatypes, PayloadValidator
+from . import measure, report
+
+
+def expensive_check(val, *args, **kwargs):
+    # stands in for a costly check, like verifying a signature
+    if not isinstance(val, str):
+        return False
+
+    digest = val.encode('utf-8')
+    for _ in range(20):
+        digest = hashlib.sha256(digest).digest()
+    return True
+
+
+class EventValidator(PayloadValidator):
+    id = datatypes.Integer()
+    kind = datatypes.String()
+    user = datatypes.String()
+    score = datatypes.Number()
+    active = datatypes.Boolean()
+    tags = datatypes.Array()
+    checksum = datatypes.Function(expensive_check)
+    signature = datatypes.Function(expensive_check)
+    origin = datatypes.Function(expensive_check)
+    notes = datatypes.Function(expensive_check)
+
+
+def payloads(invalid_ratio, count=100):
+    valid = dict(id=1, kind='click', user='someone', score=1.5, active=True,
+                 tags=['a', 'b'], checksum='abcdef', signature='abcdef',
+                 origin='abcdef', notes='abcdef')
+    invalid = dict(valid, id='1', kind=0, score='1.5', checksum=0,
+                   signature=0)
+
+    invalid_count = int(count * invalid_ratio)
+    return [invalid] * invalid_count + [valid] * (count - invalid_count)
+
+
+def main():
+    validator = EventValidator()
+
+    for ratio in (0.5, 0.9, 1.0):
+        batch = payloads(ratio)
+
+        def full():
+            for payload in batch:
+                validator.validate(payload)
+
+        def fail_fast():
+            for payload in batch:
+                validator.validate(payload, fail_fast=True)
+
+        baseline = measure(full, number=100) / len(batch)
+        report('full validation (%d%% invalid)' % (ratio * 100), baseline)
+        report('fail_fast validation (%d%% invalid)' % (ratio * 100),
+               measure(fail_fast, number=100) / len(batch), baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+'''
+    incoming.benchmarks.middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Throughput of :class:`incoming.middleware.WSGIMiddleware` and
+    :class:`incoming.asgi.ASGIMiddleware`, called in-process, compared with an
+    application that decodes and validates request bodies itself.
+'''
+
+import io
+import json
+from wsgiref.util import setup_testing_defaults
+
+from .. import datatypes, PayloadValidator
+from ..middleware import WSGIMiddleware
+from . import measure, report
+
+
+class EventValidator(PayloadValidator):
+    id = datatypes.Integer()
+    type = datatypes.String()
+    user = datatypes.String()
+    active = datatypes.Boolean()
+    tags = datatypes.Array(required=False)
+
+
+def ok(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+def glue(environ, start_response):
+    # What every application does without the middleware.
+    length = int(environ.get('CONTENT_LENGTH') or 0)
+    payload = json.loads(environ['wsgi.input'].read(length).decode('utf-8'))
+    is_valid, errors = EventValidator().validate(payload)
+    if not is_valid:
+        start_response('400 Bad Request', [])
+        return [json.dumps(errors).encode('utf-8')]
+    return ok(environ, start_response)
+
+
+def wsgi_request(app, body):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/events',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    setup_testing_defaults(environ)
+    return b''.join(app(environ, lambda status, headers: None))
+
+
+def asgi_benchmark(body, baseline):
+    try:
+        import asyncio
+        from ..asgi import ASGIMiddleware
+    except (ImportError, SyntaxError):  # Python 2
+        return
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    middleware = ASGIMiddleware(app, {'/events': EventValidator})
+    scope = dict(type='http', method='POST', path='/events', headers=[])
+    message = {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def receive():
+        return message
+
+    async def send(message):
+        pass
+
+    async def requests(count):
+        for _ in range(count):
+            await middleware(scope, receive, send)
+
+    loop = asyncio.new_event_loop()
+    count = 1000
+    seconds = measure(lambda: loop.run_until_complete(requests(count)),
+                      number=1) / count
+    report('asgi middleware', seconds, baseline)
+    loop.close()
+
+
+def main():
+    body = json.dumps(dict(id=1, type='click', user='alice', active=True,
+                           tags=['a', 'b'])).encode('utf-8')
+    middleware = WSGIMiddleware(ok, {'/events': EventValidator})
+
+    baseline = measure(lambda: wsgi_request(glue, body))
+    report('wsgi, validating in the application', baseline)
+    report('wsgi middleware', measure(lambda: wsgi_request(middleware, body)),
+           baseline)
+    asgi_benchmark(body, baseline)
+
+
+if __name__ == '__main__':
+    main()
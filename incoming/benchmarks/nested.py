@@ -0,0 +1,92 @@
+'''
+    incoming.benchmarks.nested
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Validation of deeply nested and wide nested payloads. Compares
+    :class:`incoming.datatypes.JSON`, which shares one nested validator, with
+    creating a nested validator for every nested value.
+'''
+
+from .. import datatypes, PayloadValidator
+from . import measure, report
+
+
+class FreshJSON(datatypes.JSON):
+
+    '''
+    :class:`incoming.datatypes.JSON` that creates a new nested validator for
+    every value it validates.
+    '''
+
+    def validate(self, val, *args, **kwargs):
+        if not isinstance(val, dict):
+            return False
+
+        is_valid, result = self.cls().validate(val)
+        if not is_valid:
+            kwargs['errors'].append(result)
+            return False
+        return True
+
+
+def deep_validator(json, depth):
+    # A chain of ``depth`` validators, each one nesting the next.
+    validator = None
+    for level in range(depth):
+        attrs = dict(id=datatypes.Integer(), name=datatypes.String())
+        if validator is not None:
+            attrs['child'] = json(validator)
+        validator = type('Level%d' % level, (PayloadValidator,), attrs)
+    return validator
+
+
+def deep_payload(depth):
+    payload = dict(id=0, name='leaf')
+    for level in range(1, depth):
+        payload = dict(id=level, name='level', child=payload)
+    return payload
+
+
+def wide_validator(json, width):
+    class ItemValidator(PayloadValidator):
+        sku = datatypes.String()
+        quantity = datatypes.Integer()
+        price = datatypes.Number()
+
+    attrs = dict(('item%d' % i, json(ItemValidator)) for i in range(width))
+    attrs['items'] = datatypes.Array(of=json(ItemValidator))
+    return type('WideValidator', (PayloadValidator,), attrs)
+
+
+def wide_payload(width):
+    item = dict(sku='sku', quantity=1, price=9.99)
+    payload = dict(('item%d' % i, dict(item)) for i in range(width))
+    payload['items'] = [dict(item) for _ in range(width)]
+    return payload
+
+
+def main():
+    for depth in (5, 20):
+        payload = deep_payload(depth)
+        fresh = deep_validator(FreshJSON, depth)()
+        shared = deep_validator(datatypes.JSON, depth)()
+
+        baseline = measure(lambda: fresh.validate(payload))
+        report('deep nesting, depth %d (fresh)' % depth, baseline)
+        report('deep nesting, depth %d (shared)' % depth,
+               measure(lambda: shared.validate(payload)), baseline)
+
+    for width in (10, 100):
+        payload = wide_payload(width)
+        fresh = wide_validator(FreshJSON, width)()
+        shared = wide_validator(datatypes.JSON, width)()
+
+        baseline = measure(lambda: fresh.validate(payload), number=100)
+        report('wide nesting, width %d (fresh)' % width, baseline)
+        report('wide nesting, width %d (shared)' % width,
+               measure(lambda: shared.validate(payload), number=100),
+               baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+    incoming.benchmarks.parallel
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Shows how the throughput of :func:`incoming.parallel.validate_parallel`
+    scales with the number of worker processes.
+'''
+
+from __future__ import print_function
+
+import hashlib
+import time
+from multiprocessing import cpu_count
+
+from .. import datatypes, PayloadValidator
+from ..parallel import validate_parallel
+
+
+def checksum(val, *args, **kwargs):
+    # stands in for a CPU bound check, like verifying a signature
+    if not isinstance(val, str):
+        return False
+
+    digest = val.encode('utf-8')
+    for _ in range(20):
+        digest = hashlib.sha256(digest).digest()
+    return True
+
+
+class OrderValidator(PayloadValidator):
+
+    class ItemValidator(PayloadValidator):
+        sku = datatypes.String()
+        quantity = datatypes.Integer()
+        price = datatypes.Number()
+
+    id = datatypes.Integer()
+    customer = datatypes.String()
+    item = datatypes.JSON(ItemValidator)
+    signature = datatypes.Function(checksum)
+    reference = datatypes.Function(checksum)
+
+
+def payloads(count):
+    for i in range(count):
+        yield dict(id=i, customer='customer-%d' % i,
+                   item=dict(sku='sku-%d' % i, quantity=i % 10, price=9.99),
+                   signature='signature-%d' % i,
+                   reference='reference-%d' % i)
+
+
+def main(count=100000):
+    validator = OrderValidator()
+
+    start = time.time()
+    for payload in payloads(count):
+        validator.validate(payload)
+    baseline = count / (time.time() - start)
+    print('%-25s %12.0f records/s' % ('in process', baseline))
+
+    workers = 1
+    while True:
+        start = time.time()
+        for result in validate_parallel(OrderValidator, payloads(count),
+                                        workers=workers):
+            pass
+        rate = count / (time.time() - start)
+        print('%-25s %12.0f records/s  %6.2fx' % (
+            '%d worker(s)' % workers, rate, rate / baseline))
+
+        if workers >= cpu_count():
+            break
+        workers = min(workers * 2, cpu_count())
+
+
+if __name__ == '__main__':
+    main()
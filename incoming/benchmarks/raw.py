@@ -0,0 +1,61 @@
+'''
+    incoming.benchmarks.raw
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Validation of raw JSON payloads. Compares
+    :meth:`incoming.PayloadValidator.validate_bytes` with decoding payloads
+    with :func:`json.loads` before validating them.
+'''
+
+import json
+
+from .. import datatypes, PayloadValidator
+from . import measure, report
+
+
+class EventValidator(PayloadValidator):
+    fail_fast = True
+
+    id = datatypes.Integer()
+    type = datatypes.String()
+    user = datatypes.String()
+    active = datatypes.Boolean()
+    tags = datatypes.Array(required=False)
+    data = datatypes.JSON('DataValidator', required=False)
+
+    class DataValidator(PayloadValidator):
+        value = datatypes.Number()
+
+
+def main():
+    event = dict(id=1, type='click', user='alice', active=True,
+                 tags=['a', 'b'], data=dict(value=1.5))
+    big = dict(event, tags=['tag%d' % i for i in range(10000)])
+
+    payloads = [
+        ('small', json.dumps(event).encode('utf-8')),
+        ('large', json.dumps(big).encode('utf-8')),
+        ('large, invalid',
+         json.dumps(dict(big, id='x')).encode('utf-8')),
+    ]
+
+    validator = EventValidator()
+    for name, data in payloads:
+        # Parsing key by key pays off in fail_fast mode, where parsing stops
+        # at the first invalid key; otherwise the whole payload is decoded at
+        # once.
+        baseline = measure(
+            lambda: validator.validate(json.loads(data.decode('utf-8'))),
+            number=100)
+        report('%s (json.loads)' % name, baseline)
+        report('%s (validate_bytes)' % name,
+               measure(lambda: validator.validate_bytes(data), number=100),
+               baseline)
+        report('%s (validate_bytes, no fail_fast)' % name,
+               measure(lambda: validator.validate_bytes(data, fail_fast=False),
+                       number=100),
+               baseline)
+
+
+if __name__ == '__main__':
+    main()
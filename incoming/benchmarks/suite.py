@@ -0,0 +1,276 @@
+'''
+    incoming.benchmarks.suite
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Benchmark suite for validation throughput and latency. Run it like so::
+
+        python -m incoming.benchmarks --output results.json
+
+    and compare two runs like so::
+
+        python -m incoming.benchmarks --output new.json --compare old.json
+'''
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from .. import __version__, datatypes, PayloadValidator
+
+
+class Scenario(object):
+
+    '''
+    A benchmark scenario: a validator and the payloads validated by it, in
+    turns, along with the options passed to
+    :meth:`incoming.PayloadValidator.validate`.
+    '''
+
+    def __init__(self, name, validator, payloads, **options):
+        self.name = name
+        self.validator = validator
+        self.payloads = payloads
+        self.options = options
+
+    def run(self, number=10000, samples=2000):
+        '''
+        Runs the scenario.
+
+        :param int number: number of validations used for measuring
+                           throughput.
+        :param int samples: number of validations timed one by one for
+                            measuring latency.
+
+        :returns dict: ``ops_per_sec``, ``p50_us`` and ``p99_us`` latencies in
+                       microseconds and ``alloc_bytes``, the bytes allocated
+                       per validation at peak (``None`` if
+                       :mod:`tracemalloc` is not available).
+        '''
+
+        validate = self.validator.validate
+        payloads = self.payloads
+        options = self.options
+        count = len(payloads)
+        timer = timeit.default_timer
+
+        # warm up
+        for payload in payloads:
+            validate(payload, **options)
+
+        start = timer()
+        for i in range(number):
+            validate(payloads[i % count], **options)
+        ops_per_sec = number / (timer() - start)
+
+        latencies = []
+        for i in range(samples):
+            payload = payloads[i % count]
+            start = timer()
+            validate(payload, **options)
+            latencies.append(timer() - start)
+        latencies.sort()
+
+        return dict(
+            ops_per_sec=ops_per_sec,
+            p50_us=_percentile(latencies, 50) * 1e6,
+            p99_us=_percentile(latencies, 99) * 1e6,
+            alloc_bytes=self._allocations(min(samples, 200)),
+        )
+
+    def _allocations(self, samples):
+        if tracemalloc is None or not hasattr(tracemalloc, 'reset_peak'):
+            return None
+
+        validate = self.validator.validate
+        payloads = self.payloads
+        options = self.options
+
+        total = 0
+        tracemalloc.start()
+        try:
+            for i in range(samples):
+                payload = payloads[i % len(payloads)]
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                validate(payload, **options)
+                total += tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+        return total // samples
+
+
+def _percentile(values, percent):
+    # ``values`` must be sorted.
+    index = int(round((len(values) - 1) * percent / 100.0))
+    return values[index]
+
+
+def _flat():
+    class FlatValidator(PayloadValidator):
+        id = datatypes.Integer()
+        name = datatypes.String()
+        email = datatypes.String()
+        score = datatypes.Float()
+        rank = datatypes.Number()
+        active = datatypes.Boolean()
+        tags = datatypes.Array()
+        country = datatypes.String()
+        age = datatypes.Integer(required=False)
+        notes = datatypes.String(required=False)
+
+    valid = dict(id=1, name='Test', email='test@example.com', score=9.5,
+                 rank=3, active=True, tags=['a', 'b'], country='in', age=30)
+    invalid = dict(valid, id='1', score='9.5', active='yes')
+    del invalid['country']
+    return FlatValidator(), valid, invalid
+
+
+def _wide(width=500):
+    types = (datatypes.Integer, datatypes.String, datatypes.Boolean,
+             datatypes.Float)
+    values = (1, 'value', True, 1.5)
+    attrs = dict(('field%d' % i, types[i % 4]()) for i in range(width))
+    validator = type('WideValidator', (PayloadValidator,), attrs)
+    payload = dict(('field%d' % i, values[i % 4]) for i in range(width))
+    return validator(), payload
+
+
+def _deep(depth=10):
+    validator = None
+    for level in range(depth):
+        attrs = dict(id=datatypes.Integer(), name=datatypes.String())
+        if validator is not None:
+            attrs['child'] = datatypes.JSON(validator)
+        validator = type('Level%d' % level, (PayloadValidator,), attrs)
+
+    payload = dict(id=0, name='leaf')
+    for level in range(1, depth):
+        payload = dict(id=level, name='level', child=payload)
+    return validator(), payload
+
+
+def _functions(count=20):
+    def positive(val, *args, **kwargs):
+        return isinstance(val, int) and val > 0
+
+    attrs = dict(('field%d' % i, datatypes.Function(positive))
+                 for i in range(count))
+    validator = type('FunctionValidator', (PayloadValidator,), attrs)
+    payload = dict(('field%d' % i, i + 1) for i in range(count))
+    return validator(), payload
+
+
+def scenarios():
+    '''
+    :returns: a list of all the :class:`Scenario` objects of the suite.
+    '''
+
+    flat, valid, invalid = _flat()
+    wide, wide_payload = _wide()
+    deep, deep_payload = _deep()
+    functions, functions_payload = _functions()
+    extra = dict(valid)
+    extra.update(('extra%d' % i, i) for i in range(200))
+
+    return [
+        Scenario('flat', flat, [valid]),
+        Scenario('wide_500', wide, [wide_payload]),
+        Scenario('deep_10', deep, [deep_payload]),
+        Scenario('functions_20', functions, [functions_payload]),
+        Scenario('strict_200_extra_keys', flat, [extra], strict=True),
+        Scenario('mostly_invalid', flat, [invalid] * 9 + [valid]),
+    ]
+
+
+def run(names=None, number=10000, samples=2000, out=sys.stdout):
+    '''
+    Runs the scenarios of the suite and prints their results.
+
+    :param names: names of the scenarios to run. All by default.
+
+    :returns dict: results of the run, as saved by ``--output``.
+    '''
+
+    results = {}
+    print('%-24s %12s %10s %10s %12s' % ('scenario', 'ops/sec', 'p50 us',
+                                         'p99 us', 'bytes/op'), file=out)
+    for scenario in scenarios():
+        if names and scenario.name not in names:
+            continue
+
+        result = results[scenario.name] = scenario.run(number, samples)
+        print('%-24s %12.0f %10.2f %10.2f %12s' % (
+            scenario.name, result['ops_per_sec'], result['p50_us'],
+            result['p99_us'], result['alloc_bytes']), file=out)
+
+    return dict(
+        version=__version__,
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        results=results,
+    )
+
+
+def compare(old, new, out=sys.stdout):
+    '''
+    Prints how the results of two runs compare. Ratios above 1 mean ``new``
+    is faster (or allocates less) than ``old``.
+    '''
+
+    print('%-24s %12s %10s %10s %12s' % ('scenario', 'ops/sec', 'p50', 'p99',
+                                         'bytes/op'), file=out)
+    for name, result in sorted(new['results'].items()):
+        if name not in old['results']:
+            continue
+
+        before = old['results'][name]
+        print('%-24s %11.2fx %9.2fx %9.2fx %12s' % (
+            name,
+            result['ops_per_sec'] / before['ops_per_sec'],
+            before['p50_us'] / result['p50_us'],
+            before['p99_us'] / result['p99_us'],
+            _ratio(before['alloc_bytes'], result['alloc_bytes'])), file=out)
+
+
+def _ratio(before, after):
+    if not before or not after:
+        return '-'
+    return '%.2fx' % (float(before) / after)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m incoming.benchmarks',
+        description='Benchmark validation throughput and latency.')
+    parser.add_argument('scenarios', nargs='*',
+                        help='names of the scenarios to run (default: all)')
+    parser.add_argument('-n', '--number', type=int, default=10000,
+                        help='validations per throughput measurement')
+    parser.add_argument('-s', '--samples', type=int, default=2000,
+                        help='validations timed for latency percentiles')
+    parser.add_argument('-o', '--output',
+                        help='save the results as JSON to this file')
+    parser.add_argument('-c', '--compare',
+                        help='compare the results with a saved JSON file')
+    args = parser.parse_args(argv)
+
+    results = run(args.scenarios, args.number, args.samples)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print()
+        compare(old, results)
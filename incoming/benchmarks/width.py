@@ -0,0 +1,54 @@
+'''
+    incoming.benchmarks.width
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Validation of payloads of schemas of increasing width, from 10 to 5000
+    fields. The time per field should stay flat as the width grows, for
+    repeat payload shapes as well as for payloads whose shape is new every
+    time.
+'''
+
+from __future__ import print_function
+
+from .. import datatypes, PayloadValidator
+from . import measure
+
+WIDTHS = (10, 100, 500, 1000, 5000)
+
+
+def wide_validator(width, **attrs):
+    types = (datatypes.Integer, datatypes.String, datatypes.Boolean,
+             datatypes.Float)
+    attrs.update(('field%d' % i, types[i % 4]()) for i in range(width))
+    return type('Width%dValidator' % width, (PayloadValidator,), attrs)
+
+
+def wide_payload(width):
+    values = (1, 'value', True, 1.5)
+    return dict(('field%d' % i, values[i % 4]) for i in range(width))
+
+
+def main():
+    print('%-8s %20s %20s %20s' % ('fields', 'us/op', 'ns/field',
+                                   'ns/field (no cache)'))
+    for width in WIDTHS:
+        number = max(10, 20000 // width)
+        payload = wide_payload(width)
+        # Payloads missing a field and with an extra key in strict mode
+        # exercise finding missing and extra keys as well.
+        partial = dict(payload, extra=0)
+        del partial['field0']
+
+        cached = wide_validator(width)()
+        uncached = wide_validator(width, shape_cache_size=0)()
+
+        seconds = measure(lambda: cached.validate(payload), number=number)
+        uncached_seconds = measure(
+            lambda: uncached.validate(partial, strict=True), number=number)
+        print('%-8d %20.2f %20.2f %20.2f' % (
+            width, seconds * 1e6, seconds * 1e9 / width,
+            uncached_seconds * 1e9 / width))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''
+    incoming.cache
+    ~~~~~~~~~~~~~~
+
+    A small thread-safe LRU cache used for caching validation results.
+'''
+
+import threading
+import time
+from collections import OrderedDict
+
+_timer = getattr(time, 'monotonic', time.time)
+
+
+class LRUCache(object):
+
+    '''
+    A thread-safe cache that holds at most ``maxsize`` items and evicts the
+    least recently used item when full. If ``ttl`` is given, items expire
+    ``ttl`` seconds after they were stored.
+    '''
+
+    #: value returned by :meth:`get` when a key is not in the cache
+    MISSING = object()
+
+    def __init__(self, maxsize, ttl=None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1.')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        :returns: the value stored for ``key`` or :attr:`MISSING`.
+        '''
+
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                self.misses += 1
+                return self.MISSING
+
+            value, expires = item
+            if expires is not None and expires <= _timer():
+                self.misses += 1
+                return self.MISSING
+
+            self._items[key] = item
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        '''
+        Stores ``value`` for ``key``, evicting the least recently used item
+        if the cache is full.
+        '''
+
+        expires = None if self.ttl is None else _timer() + self.ttl
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (value, expires)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''Removes all the items and resets the statistics.'''
+
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        '''
+        :returns dict: statistics of the cache - ``hits``, ``misses``,
+                       ``evictions``, ``size`` and ``maxsize``.
+        '''
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        evictions=self.evictions, size=len(self._items),
+                        maxsize=self.maxsize)
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,328 @@
+'''
+    incoming.cli
+    ~~~~~~~~~~~~
+
+    Command line interface for validating JSON and NDJSON files offline::
+
+        python -m incoming myapp.validators:EventValidator events.ndjson \\
+            --workers 8 --output failures.ndjson
+
+    Run ``python -m incoming --help`` for all the options.
+'''
+
+from __future__ import print_function
+
+import argparse
+import importlib
+import json
+import sys
+import timeit
+
+from . import decoders
+from .compat import quote
+from .incoming import _json_default, _option, PayloadValidator
+from .parallel import validate_ndjson_parallel, validate_parallel
+from .stream import validate_ndjson
+
+#: Exit status when all the records are valid.
+EXIT_VALID = 0
+
+#: Exit status when some records are invalid.
+EXIT_INVALID = 1
+
+#: Exit status when validation was interrupted.
+EXIT_INTERRUPTED = 130
+
+
+def load_validator(spec):
+    '''
+    Imports a validator class.
+
+    :param str spec: ``module:ClassName``, where ``ClassName`` may be a
+                     dotted path to a nested class.
+
+    :returns: the :class:`incoming.PayloadValidator` sub-class. Raises
+              :class:`ValueError` if ``spec`` does not name one.
+    '''
+
+    module_name, _, name = spec.partition(':')
+    if not module_name or not name:
+        raise ValueError('Expecting module:ClassName, got %r.' % spec)
+
+    try:
+        obj = importlib.import_module(module_name)
+        for attr in name.split('.'):
+            obj = getattr(obj, attr)
+    except (ImportError, AttributeError) as e:
+        raise ValueError('Can not load %r: %s' % (spec, e))
+
+    if not (isinstance(obj, type) and issubclass(obj, PayloadValidator)):
+        raise ValueError('%r is not a PayloadValidator sub-class.' % spec)
+    return obj
+
+
+class Stats(object):
+
+    '''
+    Counts of the records validated by the command and of the failures of
+    every field/key.
+    '''
+
+    def __init__(self):
+        self.records = 0
+        self.failures = 0
+        self.fields = {}
+        self.start = timeit.default_timer()
+
+    def add(self, is_valid, errors):
+        self.records += 1
+        if not is_valid:
+            self.failures += 1
+            for field in errors:
+                self.fields[field] = self.fields.get(field, 0) + 1
+
+    @property
+    def elapsed(self):
+        return timeit.default_timer() - self.start
+
+    def top_fields(self, limit=10):
+        '''
+        :returns: a list of ``(field, failures)`` tuples of the fields that
+                  failed most often, most failures first.
+        '''
+
+        fields = sorted(self.fields.items(),
+                        key=lambda item: (-item[1], str(item[0])))
+        return fields[:limit]
+
+    def report(self, limit=10):
+        elapsed = self.elapsed
+        rate = float(self.failures) / self.records if self.records else 0.0
+        lines = [
+            'records:      %d' % self.records,
+            'invalid:      %d (%.2f%%)' % (self.failures, rate * 100),
+            'elapsed:      %.2fs' % elapsed,
+            'records/sec:  %.0f' % (self.records / elapsed if elapsed else 0),
+        ]
+        top = self.top_fields(limit)
+        if top:
+            lines.append('top failing fields:')
+            width = max(len(str(field)) for field, count in top)
+            for field, count in top:
+                lines.append('  %-*s %d' % (width, field, count))
+        return '\n'.join(lines)
+
+
+def is_ndjson(path):
+    '''Files other than ``.json`` files are read as NDJSON.'''
+
+    return not path.lower().endswith('.json')
+
+
+def iter_results(validator, path, offset=0, workers=1, **options):
+    '''
+    Validates the records of a file.
+
+    :param validator: a sub-class of :class:`incoming.PayloadValidator`.
+    :param str path: path of a NDJSON file, or of a ``.json`` file holding an
+                     object or an array of objects.
+    :param int offset: byte offset to start reading a NDJSON file from.
+    :param int workers: number of worker processes; records are validated in
+                        this process if ``1``.
+
+    Other keyword arguments are passed on to
+    :meth:`incoming.PayloadValidator.validate_many`.
+
+    :returns: a generator of ``(position, is_valid, errors)`` tuples in the
+              order of the records in the file. ``position`` is a
+              :py:class:`dict` that locates the record in the file: its
+              ``line`` and ``offset`` in NDJSON files and its ``index`` in
+              JSON files.
+    '''
+
+    if is_ndjson(path):
+        with open(path, 'rb') as f:
+            if workers == 1:
+                results = validate_ndjson(f, validator, offset=offset,
+                                          **options)
+            else:
+                results = validate_ndjson_parallel(
+                    f, validator, workers=workers, offset=offset, **options)
+            for result in results:
+                yield (dict(line=result.line, offset=result.offset),
+                       result.is_valid, result.errors)
+        return
+
+    if offset:
+        raise ValueError('Offsets are supported only for NDJSON files.')
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    decoder = _option(validator, 'decoder')
+    payloads = (decoder or decoders.default).loads(data)
+    if isinstance(payloads, dict):
+        payloads = [payloads]
+    if not (isinstance(payloads, list) and
+            all(isinstance(payload, dict) for payload in payloads)):
+        raise ValueError('%s: expecting an object or an array of objects.' %
+                         path)
+
+    if workers == 1:
+        results = validator().validate_many(payloads, **options)
+    else:
+        results = validate_parallel(validator, payloads, workers=workers,
+                                    **options)
+    for index, is_valid, errors in results:
+        yield dict(index=index), is_valid, errors
+
+
+def run(validator, paths, out, offset=0, workers=1, stats=None, **options):
+    '''
+    Validates the records of ``paths`` and writes a line of JSON to ``out``
+    for every invalid record.
+
+    :param stats: a :class:`Stats` object to count the records in.
+
+    :returns: ``None`` if all the files were validated, else, if validation
+              was interrupted, a tuple of the index in ``paths`` of the file
+              being validated and the byte offset to resume validating it
+              from, which is ``None`` for JSON files.
+    '''
+
+    stats = stats if stats is not None else Stats()
+
+    for i, path in enumerate(paths):
+        start = offset if i == 0 else 0
+        results = iter_results(validator, path, start, workers, **options)
+
+        # A result is handled only once the next one has arrived. The offset
+        # of the first result that has not been handled is where validation
+        # resumes from if it is interrupted.
+        pending = None
+        try:
+            for result in results:
+                if pending is not None:
+                    _handle(path, pending, out, stats)
+                pending = result
+        except KeyboardInterrupt:
+            if not is_ndjson(path):
+                return i, None
+            if pending is not None:
+                return i, pending[0]['offset']
+            return i, start
+        finally:
+            results.close()
+
+        if pending is not None:
+            _handle(path, pending, out, stats)
+
+    return None
+
+
+def _handle(path, result, out, stats):
+    position, is_valid, errors = result
+    stats.add(is_valid, errors)
+    if not is_valid:
+        record = dict(position, file=path, errors=errors)
+        out.write(json.dumps(record, sort_keys=True,
+                             default=_json_default) + '\n')
+
+
+def resume_command(args, index, offset):
+    '''
+    Returns the command that resumes validating where an interrupted command
+    stopped, with all of its options.
+
+    :param args: the parsed arguments of the interrupted command.
+    :param int index: index in ``args.files`` of the file being validated.
+    :param int offset: byte offset to resume validating that file from.
+    '''
+
+    argv = [args.validator] + args.files[index:]
+    if offset:
+        argv += ['--offset', str(offset)]
+    if args.output:
+        # The failures written so far are kept.
+        argv += ['--output', args.output, '--append']
+    if args.workers != 1:
+        argv += ['--workers', str(args.workers)]
+    if args.strict:
+        argv.append('--strict')
+    if args.fail_fast:
+        argv.append('--fail-fast')
+    if args.max_failures is not None:
+        argv += ['--max-failures', str(args.max_failures)]
+    if args.top != 10:
+        argv += ['--top', str(args.top)]
+    return 'python -m incoming ' + ' '.join(quote(arg) for arg in argv)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m incoming',
+        description='Validate JSON and NDJSON files with a validator.')
+    parser.add_argument('validator',
+                        help='the validator class, as module:ClassName')
+    parser.add_argument('files', nargs='+',
+                        help='NDJSON files, or .json files holding an object '
+                             'or an array of objects')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes (default: 1)')
+    parser.add_argument('-o', '--output',
+                        help='write invalid records as NDJSON to this file '
+                             '(default: stdout)')
+    parser.add_argument('--offset', type=int, default=0,
+                        help='byte offset to resume validating the first '
+                             'file from')
+    parser.add_argument('--append', action='store_true',
+                        help='append to the output file instead of '
+                             'overwriting it')
+    parser.add_argument('--strict', action='store_true', default=None,
+                        help='report keys that are not in the validator')
+    parser.add_argument('--fail-fast', action='store_true', default=None,
+                        help='report only the first error of every record')
+    parser.add_argument('--max-failures', type=int,
+                        help='stop after these many invalid records per file')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of failing fields to report '
+                             '(default: 10)')
+    return parser
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    try:
+        validator = load_validator(args.validator)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output:
+        # Appending keeps the failures written before validation was
+        # interrupted.
+        out = open(args.output, 'a' if args.append or args.offset else 'w')
+    else:
+        out = sys.stdout
+
+    stats = Stats()
+    try:
+        interrupted = run(validator, args.files, out, args.offset,
+                          args.workers, stats, strict=args.strict,
+                          fail_fast=args.fail_fast,
+                          max_failures=args.max_failures)
+    except (IOError, ValueError) as e:
+        print('error: %s' % e, file=sys.stderr)
+        return 2
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(stats.report(args.top), file=sys.stderr)
+
+    if interrupted is not None:
+        print('interrupted; resume with:\n  %s' % resume_command(
+            args, *interrupted), file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+    return EXIT_INVALID if stats.failures else EXIT_VALID
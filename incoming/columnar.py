@@ -0,0 +1,204 @@
+'''
+    incoming.columnar
+    ~~~~~~~~~~~~~~~~~
+
+    Validation of batches of records stored as columns. See
+    :meth:`incoming.PayloadValidator.validate_columns`.
+'''
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .compat import iteritems, Mapping, PY2, string_type
+from .datatypes import _passing, Function
+
+# Kinds of NumPy dtypes whose values pass the isinstance check of a type.
+# Like isinstance(True, int), booleans pass as integers.
+_KINDS = {
+    int: 'biu',
+    float: 'f',
+    bool: 'b',
+    string_type: 'SU' if PY2 else 'U',
+}
+
+
+def validate_columns(validator, columns, required=None, strict=None):
+    '''
+    Validates a batch of records stored as columns, i.e. as a
+    :py:class:`dict` mapping every field/key to a list of the values of all
+    the records. Plain type checks of :class:`incoming.datatypes.Integer`,
+    :class:`incoming.datatypes.Float`, :class:`incoming.datatypes.Number`,
+    :class:`incoming.datatypes.String` and :class:`incoming.datatypes.Boolean`
+    are run on whole columns at once, and on the dtype of NumPy arrays without
+    looking at their values. Other rules are run row by row.
+
+    A column that is not in ``columns`` is missing from all the records.
+    Rules that are run row by row are passed a read-only mapping of the
+    record as the ``payload``, not a :py:class:`dict`.
+
+    Use :meth:`incoming.PayloadValidator.validate_columns` instead of calling
+    this directly.
+
+    :returns: a tuple of two items - the validity mask, a list of
+              :class:`bool`, or a NumPy array if any of the columns is one,
+              with an item for every row, and a :py:class:`dict` mapping the
+              index of every invalid row to its errors.
+    '''
+
+    options = (required, strict)
+    required = required if required is not None else validator.required
+    strict = strict if strict is not None else validator.strict
+
+    size = None
+    is_numpy = False
+    for field, column in iteritems(columns):
+        if size is None:
+            size = len(column)
+        elif len(column) != size:
+            raise ValueError('Column %r has %d items, expected %d.' % (
+                field, len(column), size))
+        if numpy is not None and isinstance(column, numpy.ndarray):
+            is_numpy = True
+    size = size or 0
+
+    rules = validator._rules
+    checks = validator._plan.checks
+    errors = {}
+    rows = _Rows(columns)
+
+    def record(row, field, field_errors):
+        row_errors = errors.get(row)
+        if row_errors is None:
+            row_errors = errors[row] = {}
+        row_errors[field] = field_errors
+
+    for field in validator._fields:
+        rule = rules[field]
+        column = columns.get(field)
+
+        if column is None:
+            if rule.required is None:
+                field_required = required
+            else:
+                field_required = rule.required
+
+            if field_required:
+                for row in range(size):
+                    record(row, field, [validator.required_error])
+            elif isinstance(rule, Function):
+                _test_rows(rule, field, [None] * size, rows, record,
+                           options)
+            continue
+
+        type_ = checks.get(field)
+        if type_ is not None:
+            for row in _invalid_rows(column, type_):
+                record(row, field, [rule.error])
+        else:
+            _test_rows(rule, field, _values(column), rows, record,
+                       options)
+
+    if strict:
+        for field in columns:
+            if field not in rules:
+                for row in range(size):
+                    record(row, field, [validator.strict_error])
+
+    if is_numpy:
+        mask = numpy.ones(size, dtype=bool)
+        if errors:
+            mask[list(errors)] = False
+    else:
+        mask = [True] * size
+        for row in errors:
+            mask[row] = False
+
+    return mask, errors
+
+
+def _invalid_rows(column, type_):
+    # Returns the indexes of the values of ``column`` that are not instances
+    # of ``type_``.
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        if column.dtype.kind != 'O':
+            types = type_ if isinstance(type_, tuple) else (type_, )
+            kinds = ''.join(_KINDS.get(t, '') for t in types)
+            if column.dtype.kind in kinds:
+                return []
+            return range(len(column))
+        column = column.tolist()
+
+    # Columns usually hold values of one or two types, which are checked once
+    # instead of once per value.
+    invalid = set(t for t in set(map(type, column))
+                  if not issubclass(t, type_))
+    if not invalid:
+        return []
+    return [row for row, value in enumerate(column)
+            if type(value) in invalid]
+
+
+def _values(column):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.tolist()
+    return column
+
+
+def _test_rows(rule, field, values, rows, record, options):
+    # Nested validators of JSON fields are run with the options passed to
+    # validate_columns(), like PayloadValidator.validate() does.
+    scratch = []
+    with _passing(*options):
+        for row, value in enumerate(values):
+            rule.test(field, value, payload=rows[row], errors=scratch)
+            if scratch:
+                record(row, field, scratch)
+                scratch = []
+
+
+class _Rows(object):
+
+    '''
+    Records of a batch of columns for rules that are run row by row. A record
+    is a read-only view of a row of the columns, so no :py:class:`dict` is
+    built for it and nothing is kept once the rule is done with it.
+    '''
+
+    def __init__(self, columns):
+        self.columns = columns
+        # values of the columns that rules looked up, as lists
+        self.values = {}
+
+    def __getitem__(self, row):
+        return _Row(self, row)
+
+    def value(self, field, row):
+        values = self.values.get(field)
+        if values is None:
+            values = self.values[field] = _values(self.columns[field])
+        return values[row]
+
+
+class _Row(Mapping):
+
+    '''
+    Read-only mapping of the fields/keys of a record of :class:`_Rows` to
+    its values.
+    '''
+
+    __slots__ = ('_rows', '_row')
+
+    def __init__(self, rows, row):
+        self._rows = rows
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._rows.value(field, self._row)
+
+    def __iter__(self):
+        return iter(self._rows.columns)
+
+    def __len__(self):
+        return len(self._rows.columns)
@@ -7,6 +7,21 @@
 
 import sys
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+try:
+    from inspect import isawaitable
+except ImportError:  # Python 2 and Python 3.4
+    isawaitable = lambda obj: False
+
+try:
+    from shlex import quote
+except ImportError:  # Python 2
+    from pipes import quote
+
 PY2 = sys.version_info[0] == 2
 
 if PY2:
@@ -15,3 +30,16 @@ if PY2:
 else:
     string_type = str
     iteritems = lambda x: iter(x.items())
+
+
+def with_metaclass(meta, *bases):
+    '''
+    Create a base class with a metaclass in a way that works on both Python 2
+    and Python 3.
+    '''
+
+    class metaclass(meta):
+        def __new__(cls, name, this_bases, attrs):
+            return meta(name, bases or (object,), attrs)
+
+    return type.__new__(metaclass, 'temporary_class', (), {})
@@ -5,7 +5,54 @@
     Datatypes that can be used to define the rules of validation.
 '''
 
-from .compat import string_type
+import threading
+from contextlib import contextmanager
+
+from .cache import LRUCache
+from .compat import isawaitable, string_type
+
+# Options passed to the validations in progress on this thread, which nested
+# validators of JSON fields are run with as well. See _passing().
+_passed = threading.local()
+
+
+def _func(method):
+    '''
+    Return the plain function behind a (bound, unbound or class) method.
+    '''
+
+    return getattr(method, '__func__', method)
+
+
+@contextmanager
+def _passing(required=None, strict=None, fail_fast=None):
+    '''
+    Makes the nested validators of :class:`JSON` fields validated within the
+    context run with the given options, on top of those of enclosing
+    contexts. Options that are ``None`` are left to the nested validators.
+    '''
+
+    previous = _passed_options()
+    options = dict(previous)
+    for name, value in (('required', required), ('strict', strict),
+                        ('fail_fast', fail_fast)):
+        if value is not None:
+            options[name] = value
+
+    _passed.options = options
+    try:
+        yield
+    finally:
+        _passed.options = previous
+
+
+def _passed_options():
+    '''
+    Returns the options that nested validators of :class:`JSON` fields must
+    be run with on this thread, see :func:`_passing`.
+    '''
+
+    return getattr(_passed, 'options', None) or {}
 
 
 class Types(object):
@@ -16,6 +63,9 @@ class Types(object):
     this method will be resposible for the actual validation.
     '''
 
+    # Relative cost of running the validation test, see _default_cost()
+    _DEFAULT_COST = 1
+
     def __init__(self, required=None, error=None, *args, **kwargs):
         '''
         :param bool required: if a particular (this) field is required or not.
@@ -24,10 +74,26 @@ class Types(object):
         :param str error: a generic error message that will be used by
                           :class:`incoming.PayloadValidator` when the
                           validation test fails.
+        :param cost: a hint of how expensive the validation test is relative
+                     to other datatypes. :class:`incoming.PayloadValidator`
+                     runs the tests of cheaper datatypes first. Type checks
+                     cost ``1``, :class:`JSON` costs ``10`` and
+                     :class:`Function` costs ``100`` by default. Must be
+                     passed as a keyword argument.
         '''
 
+        cost = kwargs.pop('cost', None)
+
         self.required = required
         self.error = error or self._DEFAULT_ERROR
+        self.cost = cost if cost is not None else self._default_cost()
+
+    def _default_cost(self):
+        '''
+        Returns the cost of the validation test when no ``cost`` is passed.
+        '''
+
+        return self._DEFAULT_COST
 
     def validate(self, val, *args, **kwargs):
         '''
@@ -98,6 +164,16 @@ class Instance(Types):
         else:
             return isinstance(val, cls.type_)
 
+    def _type_only(self):
+        '''
+        Checks if this datatype only tests the type of values, in which case
+        the test can be done with just an :func:`isinstance` call.
+        '''
+
+        return (self.type_ is not None and
+                _func(self.__class__.validate) is _func(Instance.validate) and
+                _func(self.__class__.test) is _func(Types.test))
+
 
 class Integer(Instance):
 
@@ -148,11 +224,159 @@ class Array(Instance):
     '''
     Sub-class of :class:`Types` class for Array type. Validates if a value is
     a :class:`list` object.
+
+    Optionally, every item of the array can be validated with another
+    datatype and the number of items can be limited. Errors of items are
+    reported in a :class:`dict` keyed by the index of the item, like errors of
+    nested JSON are reported.
     '''
 
     _DEFAULT_ERROR = 'Invalid data. Expected an array.'
     type_ = list
 
+    #: Error message used when an array has less than ``min_items`` items.
+    min_items_error = 'Expected at least %d items.'
+
+    #: Error message used when an array has more than ``max_items`` items.
+    max_items_error = 'Expected at most %d items.'
+
+    def __init__(self, *args, **kwargs):
+        '''
+        Takes ``required`` and ``error`` like :class:`Types` and these
+        keyword arguments:
+
+        :param of: datatype (an instance or a sub-class of :class:`Types`) for
+                   validating every item of the array.
+        :param int min_items: minimum number of items in the array.
+        :param int max_items: maximum number of items in the array.
+        :param int max_item_errors: maximum number of items for which errors
+                                    are reported. Items after that are not
+                                    validated.
+        '''
+
+        of = kwargs.pop('of', None)
+        min_items = kwargs.pop('min_items', None)
+        max_items = kwargs.pop('max_items', None)
+        max_item_errors = kwargs.pop('max_item_errors', 10)
+
+        if isinstance(of, type):
+            of = of()
+
+        if of is not None and not isinstance(of, Types):
+            raise TypeError('of must be a datatype.')
+
+        if isinstance(of, Function) and isinstance(of.func, str):
+            raise TypeError('Items of an array can not be validated with '
+                            'methods of the validator class.')
+
+        self.of = of
+        self.min_items = min_items
+        self.max_items = max_items
+        self.max_item_errors = max_item_errors
+
+        super(Array, self).__init__(*args, **kwargs)
+
+    def _type_only(self):
+        return (super(Array, self)._type_only() and self.of is None and
+                self.min_items is None and self.max_items is None)
+
+    def test(self, key, val, payload, errors):
+        if not super(Array, self).test(key, val, payload=payload,
+                                       errors=errors):
+            return False
+
+        if not self._test_length(val, errors):
+            return False
+
+        if self.of is None or not val:
+            return True
+
+        if isinstance(self.of, Instance) and self.of._type_only():
+            item_errors = self._test_types(val)
+        elif (isinstance(self.of, JSON) and
+                _func(self.of.__class__.validate) is _func(JSON.validate)):
+            item_errors = self._test_json(val)
+        else:
+            item_errors = self._test_items(val, payload)
+
+        if item_errors:
+            errors.extend((self.error, item_errors))
+            return False
+
+        return True
+
+    def _test_length(self, val, errors):
+        # Checks the number of items of a list.
+        if self.min_items is not None and len(val) < self.min_items:
+            errors.extend((self.error, self.min_items_error % self.min_items))
+            return False
+
+        if self.max_items is not None and len(val) > self.max_items:
+            errors.extend((self.error, self.max_items_error % self.max_items))
+            return False
+
+        return True
+
+    def _test_types(self, val):
+        # Items are checked by their type. Most arrays are homogeneous, so
+        # the distinct types are checked first and items are looked at one by
+        # one only if some of them are of an invalid type.
+        type_ = self.of.type_
+        invalid = set(t for t in set(map(type, val))
+                      if not issubclass(t, type_))
+        if not invalid:
+            return None
+
+        item_errors = {}
+        for index, item in enumerate(val):
+            if type(item) in invalid:
+                item_errors[index] = [self.of.error]
+                if len(item_errors) >= self.max_item_errors:
+                    break
+        return item_errors
+
+    def _test_json(self, val):
+        # Every item is validated by the same nested validator.
+        of = self.of
+        validator = of.validator
+        options = _passed_options()
+
+        item_errors = {}
+        for index, item in enumerate(val):
+            if not isinstance(item, dict):
+                item_errors[index] = [of.error]
+            else:
+                is_valid, result = validator.validate(item, **options)
+                if is_valid:
+                    continue
+                item_errors[index] = [of.error, result]
+
+            if len(item_errors) >= self.max_item_errors:
+                break
+        return item_errors
+
+    def _test_items(self, val, payload):
+        test = self.of.test
+
+        item_errors = {}
+        scratch = []
+        for index, item in enumerate(val):
+            test(index, item, payload=payload, errors=scratch)
+            if not scratch:
+                continue
+
+            item_errors[index], scratch = scratch, []
+            if len(item_errors) >= self.max_item_errors:
+                break
+        return item_errors
+
+    def _default_cost(self):
+        # Items are validated after the type of the array is checked.
+        cost = super(Array, self)._default_cost()
+        if self.of is not None:
+            cost += self.of.cost
+        return cost
+
 
 class Boolean(Instance):
 
@@ -176,12 +400,20 @@ class Function(Types):
     '''
 
     _DEFAULT_ERROR = 'Invalid data.'
+    _DEFAULT_COST = 100
 
     def __init__(self, func, *args, **kwargs):
         '''
         :param func: any callable that accepts ``val``, ``*args`` and
                      ``**kwawrgs`` and returns a :class:`bool` value, True
                      if ``val`` validates, False otherwise.
+        :param bool pure: if ``func`` is a pure function of ``val``, i.e. it
+                          always returns the same result for the same value
+                          and has no side effects. Must be passed as a keyword
+                          argument.
+        :param int cache_size: memoize the results of a ``pure`` function for
+                               up to these many distinct hashable values.
+                               Must be passed as a keyword argument.
         '''
 
         if not callable(func) and not isinstance(func, str):
@@ -190,16 +422,66 @@ class Function(Types):
                             'class.')
 
         self.func = func
+        self.pure = kwargs.pop('pure', False)
+
+        cache_size = kwargs.pop('cache_size', None)
+        if cache_size and not self.pure:
+            raise ValueError('Results of only pure functions can be cached.')
+        self._cache = LRUCache(cache_size) if cache_size else None
 
         super(Function, self).__init__(*args, **kwargs)
 
     def validate(self, val, *args, **kwargs):
+        cache = self._cache
+        key = None
+        if cache is not None:
+            # The type is a part of the key so that values that are equal
+            # but of different types, like 1 and True, are told apart.
+            key = (val.__class__, val)
+            try:
+                cached = cache.get(key)
+            except TypeError:
+                key = None
+            else:
+                if cached is not cache.MISSING:
+                    result, messages = cached
+                    if messages:
+                        kwargs['errors'].extend(messages)
+                    return result
+
+        errors = kwargs.get('errors')
+        count = len(errors) if errors is not None else 0
+
         result = self.func(val, *args, **kwargs)
+        if isawaitable(result):
+            # Results of coroutine functions are awaited by incoming.aio,
+            # which only exists on Python 3.5 or later.
+            from .aio import _settle
+            return _settle(result, self._settled, key, errors, count)
+        return self._settled(result, key, errors, count)
+
+    def _settled(self, result, key, errors, count):
+        # Checks the result of the function and memoizes it under ``key``
+        # along with the messages appended to ``errors`` after ``count``.
         if not isinstance(result, bool):
             raise ValueError('Validation function does not return a bool.')
 
+        if key is not None:
+            # errors added by the function are replayed on cache hits
+            messages = tuple(errors[count:]) if errors is not None else ()
+            self._cache.put(key, (result, messages))
+
         return result
 
+    def cache_info(self):
+        '''
+        :returns: statistics of the memoized results as returned by
+                  :meth:`incoming.cache.LRUCache.info`, or ``None`` if results
+                  are not memoized.
+        '''
+
+        return None if self._cache is None else self._cache.info()
+
 
 class JSON(Types):
 
@@ -209,6 +491,9 @@ class JSON(Types):
     '''
 
     _DEFAULT_ERROR = 'Invalid data. Expected JSON.'
+    _DEFAULT_COST = 10
+
+    _validator = None
 
     def __init__(self, cls, *args, **kwargs):
         '''
@@ -222,12 +507,25 @@ class JSON(Types):
         self.cls = cls
         super(JSON, self).__init__(*args, **kwargs)
 
+    @property
+    def validator(self):
+        '''
+        The instance of :attr:`cls` used for validating nested JSON. It is
+        created on first use and shared by all the validations done by this
+        datatype, which for a field of a validator class means all the
+        validations done by instances of that class.
+        '''
+
+        validator = self._validator
+        if validator is None:
+            validator = self._validator = self.cls()
+        return validator
+
     def validate(self, val, *args, **kwargs):
         if not isinstance(val, dict):
             return False
 
-        obj = self.cls()
-        is_valid, result = obj.validate(val)
+        is_valid, result = self.validator.validate(val, **_passed_options())
 
         if not is_valid:
             kwargs['errors'].append(result)
@@ -0,0 +1,124 @@
+'''
+    incoming.decoders
+    ~~~~~~~~~~~~~~~~~
+
+    JSON decoders used for decoding raw payloads by
+    :meth:`incoming.PayloadValidator.validate_bytes` and
+    :mod:`incoming.stream`.
+    `orjson <https://github.com/ijl/orjson>`_ is used if it is installed, else
+    the :mod:`json` module of the standard library.
+'''
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .compat import PY2, string_type
+
+
+_INFINITY = float('inf')
+
+
+def _reject_constant(name):
+    raise ValueError('%s is not valid JSON.' % name)
+
+
+def _parse_float(text):
+    value = float(text)
+    if value == _INFINITY or value == -_INFINITY:
+        raise ValueError('%s is out of the range of floats.' % text)
+    return value
+
+
+#: :class:`json.JSONDecoder` that, like orjson, rejects ``NaN``,
+#: ``Infinity`` and ``-Infinity`` as well as numbers too large for a float,
+#: which :func:`json.loads` accepts.
+JSON_DECODER = json.JSONDecoder(parse_constant=_reject_constant,
+                                parse_float=_parse_float)
+
+
+class Decoder(object):
+
+    '''
+    Base class of decoders. Sub-classes must implement :meth:`loads`.
+    '''
+
+    #: name of the decoder, see :func:`get_decoder`
+    name = None
+
+    def loads(self, data):
+        '''
+        Decodes a JSON document.
+
+        :param data: the document as :class:`bytes`, :class:`bytearray` or
+                     :class:`memoryview` encoded in UTF-8, or as
+                     :class:`str`.
+
+        :returns: the decoded value. Raises :class:`ValueError` if ``data``
+                  is not valid JSON.
+        '''
+
+        raise NotImplementedError
+
+
+class StdlibDecoder(Decoder):
+
+    '''
+    Decoder that uses the :mod:`json` module of the standard library. Values
+    that orjson rejects are rejected as well, see :data:`JSON_DECODER`.
+    '''
+
+    name = 'json'
+
+    def loads(self, data):
+        if not isinstance(data, (bytes, string_type)):
+            data = bytes(data)
+        if not PY2 and isinstance(data, bytes):
+            # json.loads would detect the encoding; payloads are UTF-8.
+            data = data.decode('utf-8')
+        return JSON_DECODER.decode(data)
+
+
+class ORJSONDecoder(Decoder):
+
+    '''
+    Decoder that uses `orjson <https://github.com/ijl/orjson>`_, which
+    decodes :class:`bytes` and :class:`memoryview` without copying them.
+    '''
+
+    name = 'orjson'
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+#: Decoder classes by name. Only installed decoders are included.
+DECODERS = {}
+if orjson is not None:
+    DECODERS[ORJSONDecoder.name] = ORJSONDecoder
+DECODERS[StdlibDecoder.name] = StdlibDecoder
+
+
+def get_decoder(name=None):
+    '''
+    :param str name: name of the decoder, ``'orjson'`` or ``'json'``. The
+                     fastest decoder installed by default.
+
+    :returns: an instance of the :class:`Decoder` named ``name``. Raises
+              :class:`ValueError` if the decoder is not installed.
+    '''
+
+    if name is None:
+        name = 'orjson' if 'orjson' in DECODERS else 'json'
+
+    try:
+        return DECODERS[name]()
+    except KeyError:
+        raise ValueError('Decoder %r is not available.' % name)
+
+
+#: The decoder used by default.
+default = get_decoder()
@@ -6,9 +6,19 @@
 '''
 
 import copy
+import hashlib
+import itertools
+import json
+import threading
+from array import array
+from contextlib import contextmanager
+from timeit import default_timer
 
-from .compat import iteritems
-from .datatypes import Function, JSON, Types
+from .compat import iteritems, Mapping, PY2, with_metaclass
+from .datatypes import _passing, Array, Function, Instance, JSON, Types
+from .cache import LRUCache
+from .ordering import AdaptiveOrder
+from .profiling import Profiler
 
 
 class PayloadErrors(object):
@@ -23,15 +33,69 @@ class PayloadErrors(object):
     Ideally, the keys should be name of the field/key in the payload and the
     value should be a :class:`list` object that holds errors related to that
     field.
+
+    Lists of errors are allocated only when an error is recorded for a key
+    using :meth:`add` or :meth:`extend`. Looking up a key with ``[]`` hands
+    out a mutable list and is supported for backwards compatibility.
     '''
 
     def __init__(self):
         self._errors = {}
 
+        # True once a list has been handed out by __getitem__. Such lists may
+        # be left empty by their users and need to be skipped.
+        self._unchecked = False
+
     def __getitem__(self, key):
-        if key not in self._errors:
-            self._errors[key] = []
-        return self._errors[key]
+        errors = self._errors.get(key)
+        if errors is None:
+            errors = self._errors[key] = []
+        self._unchecked = True
+        return errors
+
+    def add(self, key, error):
+        '''
+        Records an error for a key.
+
+        :param str key: key or type of error.
+        :param error: the error to be recorded.
+        '''
+
+        errors = self._errors.get(key)
+        if errors is None:
+            self._errors[key] = [error]
+        else:
+            errors.append(error)
+
+    def extend(self, key, errors):
+        '''
+        Records a list of errors for a key.
+
+        :param str key: key or type of error.
+        :param list errors: the errors to be recorded.
+        '''
+
+        if errors:
+            self._record(key, list(errors))
+
+    def _record(self, key, errors):
+        # Like extend, but takes ownership of the non-empty list ``errors``.
+        _plain(errors)
+        existing = self._errors.get(key)
+        if existing is None:
+            self._errors[key] = errors
+        else:
+            existing.extend(errors)
+
+    def _record_all(self, keys, message):
+        # Records the same error message for every key of ``keys``.
+        errors = self._errors
+        for key in keys:
+            existing = errors.get(key)
+            if existing is None:
+                errors[key] = [message]
+            else:
+                existing.append(message)
 
     def has_errors(self):
         '''
@@ -40,7 +104,13 @@ class PayloadErrors(object):
         :returns bool: True if has errors, else False.
         '''
 
-        return True if len(self.to_dict().keys()) else False
+        if not self._unchecked:
+            return bool(self._errors)
+
+        for errors in self._errors.values():
+            if errors:
+                return True
+        return False
 
     def to_dict(self):
         '''
@@ -50,11 +120,8 @@ class PayloadErrors(object):
         :returns dict: a dictionary of errors
         '''
 
-        errors = copy.deepcopy(self._errors)
-        for key, val in iteritems(self._errors):
-            if not len(val):
-                errors.pop(key)
-        return errors
+        return dict((key, list(errors))
+                    for key, errors in iteritems(self._errors) if errors)
 
     def __contains__(self, key):
         '''
@@ -66,10 +133,672 @@ class PayloadErrors(object):
         :returns bool: the test result of membership of the provided key
         '''
 
-        return key in self.to_dict().keys()
+        return bool(self._errors.get(key))
+
+
+#: Maximum number of distinct messages interned by :class:`CompactErrors`.
+#: Messages seen after that are stored as they are.
+MAX_INTERNED_MESSAGES = 1 << 16
+
+# Interned error messages by code, and codes by message.
+_messages = []
+_codes = {}
+_intern_lock = threading.Lock()
+
+
+def _intern(message):
+    # Returns the code of ``message``, or -1 if it can not be interned.
+    code = _codes.get(message)
+    if code is not None:
+        return code
+
+    with _intern_lock:
+        code = _codes.get(message)
+        if code is None:
+            if len(_messages) >= MAX_INTERNED_MESSAGES:
+                return -1
+            code = _codes[message] = len(_messages)
+            _messages.append(message)
+    return code
+
+
+class _NestedPath(tuple):
+    # Path of an error of a nested key, as opposed to a key of the payload.
+    __slots__ = ()
+
+
+class CompactErrors(Mapping):
+
+    '''
+    Errors returned by :meth:`PayloadValidator.validate` when
+    :attr:`PayloadValidator.compact_errors` is on. Errors are stored as a flat
+    list of paths, the keys of the payload or, for errors of nested JSON and
+    of items of arrays, tuples of keys and indexes, along with an array of
+    codes of interned messages, so that an error takes a few bytes no matter
+    how often its message repeats.
+
+    It is a read-only mapping like the :py:class:`dict` of errors returned
+    otherwise, which is built the first time a key is looked up. Iterating
+    over :meth:`pairs` does not build it.
+    '''
+
+    __slots__ = ('_paths', '_codes', '_uninterned', '_dict')
+
+    def __init__(self):
+        self._paths = []
+        self._codes = array('i')
+        # messages that could not be interned, by position
+        self._uninterned = None
+        self._dict = None
+
+    def add(self, key, error):
+        '''
+        Records an error for a key.
+
+        :param key: key of the payload.
+        :param error: the error message, or a :py:class:`dict` of errors of
+                      nested keys.
+        '''
+
+        self._record(key, [error])
+
+    def _record(self, key, errors):
+        # Records a list of errors for a key like PayloadErrors._record.
+        for error in errors:
+            # CompactErrors is checked for by class; isinstance checks of
+            # abstract base classes are slow.
+            if isinstance(error, dict) or error.__class__ is CompactErrors:
+                for path, message in _flatten(key, [error]):
+                    self._append(path, message)
+                continue
+
+            code = _codes.get(error) if error.__class__ is str else None
+            if code is None:
+                self._append(key, error)
+            else:
+                self._paths.append(key)
+                self._codes.append(code)
+        self._dict = None
+
+    def _record_all(self, keys, message):
+        # Records the same error message for every key of ``keys``.
+        for key in keys:
+            self._append(key, message)
+            break
+        else:
+            return
+        code = self._codes[-1]
+        if code == -1:
+            for key in keys[1:]:
+                self._append(key, message)
+        else:
+            self._paths.extend(keys[1:])
+            self._codes.extend([code] * (len(keys) - 1))
+
+    def _append(self, path, message):
+        try:
+            code = _codes.get(message)
+            if code is None:
+                code = _intern(message)
+        except TypeError:  # unhashable
+            code = -1
+        if code == -1:
+            if self._uninterned is None:
+                self._uninterned = {}
+            self._uninterned[len(self._codes)] = message
+        self._paths.append(path)
+        self._codes.append(code)
+
+    def pairs(self):
+        '''
+        :returns: a generator of ``(path, message)`` tuples of all the errors,
+                  in the order they were recorded. ``path`` is a tuple of the
+                  key of the payload followed by keys of nested JSON and
+                  indexes of items of arrays.
+        '''
+
+        for path, message in self._pairs():
+            yield (tuple(path) if isinstance(path, _NestedPath) else
+                   (path, )), message
+
+    def _pairs(self):
+        uninterned = self._uninterned
+        for i, (path, code) in enumerate(zip(self._paths, self._codes)):
+            if code == -1:
+                yield path, uninterned[i]
+            else:
+                yield path, _messages[code]
+
+    def has_errors(self):
+        '''
+        :returns bool: True if has errors, else False.
+        '''
+
+        return bool(self._codes)
+
+    def to_dict(self):
+        '''
+        Return a :class:`dict` of errors in the same format as
+        :meth:`PayloadErrors.to_dict`.
+        '''
+
+        result = {}
+        for path, message in self._pairs():
+            if not isinstance(path, _NestedPath):
+                result.setdefault(path, []).append(message)
+                continue
+
+            errors = result.setdefault(path[0], [])
+            for key in path[1:]:
+                if not errors or not isinstance(errors[-1], dict):
+                    errors.append({})
+                errors = errors[-1].setdefault(key, [])
+            errors.append(message)
+        return result
+
+    def _as_dict(self):
+        if self._dict is None:
+            self._dict = self.to_dict()
+        return self._dict
+
+    def __getitem__(self, key):
+        return self._as_dict()[key]
+
+    def __iter__(self):
+        return iter(self._as_dict())
+
+    def __len__(self):
+        return len(self._as_dict())
+
+    def __contains__(self, key):
+        return key in self._as_dict()
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self._as_dict())
+
+    def __reduce__(self):
+        # Codes are only meaningful in this process.
+        return _compact_errors, (list(self._pairs()), )
+
+
+def _plain(errors):
+    # Replaces the CompactErrors of nested validators that have
+    # compact_errors on, at any depth of a list of errors, with dicts.
+    for index, error in enumerate(errors):
+        if error.__class__ is CompactErrors:
+            errors[index] = error.to_dict()
+        elif error.__class__ is dict:
+            for nested in error.values():
+                _plain(nested)
+
+
+def _json_default(obj):
+    # ``default`` of json.dumps for encoding errors, which may hold
+    # CompactErrors at any depth.
+    if isinstance(obj, CompactErrors):
+        return obj.to_dict()
+    raise TypeError('%r is not JSON serializable' % (obj, ))
+
+
+def _compact_errors(pairs):
+    errors = CompactErrors()
+    for path, message in pairs:
+        errors._append(path, message)
+    return errors
+
+
+def _flatten(path, errors):
+    # Generates (path, message) tuples of a list of errors of ``path``, where
+    # dicts in the list hold the errors of nested keys.
+    for error in errors:
+        if error.__class__ is CompactErrors:
+            for nested, message in error._pairs():
+                if isinstance(nested, _NestedPath):
+                    nested = tuple(nested)
+                else:
+                    nested = (nested, )
+                yield _extend(path, nested), message
+        elif isinstance(error, dict):
+            for key, nested_errors in iteritems(error):
+                for item in _flatten(_extend(path, (key, )), nested_errors):
+                    yield item
+        else:
+            yield path, error
+
+
+def _extend(path, keys):
+    if isinstance(path, _NestedPath):
+        return _NestedPath(path + keys)
+    return _NestedPath((path, ) + keys)
+
+
+def _type_check(rule):
+    '''
+    Return the Python type(s) ``rule`` checks against if ``rule`` is an
+    :class:`incoming.datatypes.Instance` type that does nothing but check the
+    type of values, else ``None``. Such rules can be run by the validation
+    plan with a single :func:`isinstance` call instead of going through
+    :meth:`incoming.datatypes.Types.test`.
+    '''
+
+    if isinstance(rule, Instance) and rule._type_only():
+        return rule.type_
+    return None
+
+
+# Returned by _option() for names that are not options.
+_MISSING = object()
+
+
+def _option(cls, name):
+    '''
+    Returns the value of the option ``name`` of a validator class, like
+    :attr:`PayloadValidator.metrics`. Fields/keys are class attributes too, so
+    a field named like an option hides it; the option is then looked up in
+    the classes of the MRO, skipping datatypes. Returns ``_MISSING`` if no
+    class defines ``name`` as anything but a datatype or a method.
+    '''
+
+    for klass in cls.__mro__:
+        value = vars(klass).get(name, _MISSING)
+        if value is _MISSING or isinstance(value, Types):
+            continue
+        if callable(value) or hasattr(value, '__get__'):
+            break
+        return value
+    return _MISSING
+
+
+def _is_pure(rule):
+    '''
+    Checks if the result of ``rule`` depends only on the value it validates.
+    '''
+
+    if isinstance(rule, Function):
+        return rule.pure
+    if isinstance(rule, JSON):
+        # Plans with unresolved classes can not be used; see bind().
+        return isinstance(rule.cls, str) or rule.cls._plan.pure
+    if isinstance(rule, Array) and rule.of is not None:
+        return _is_pure(rule.of)
+    return True
+
+
+def _payload_key(payload):
+    '''
+    Returns the SHA-256 hash of the canonical JSON serialization of
+    ``payload``, or ``None`` if ``payload`` holds values other than those
+    decoded from JSON, whose serialization would not tell them apart from
+    other values, like tuples from lists or integer keys from string keys.
+    A payload whose hash collides with that of a valid payload would skip
+    validation, so the hash must be collision resistant, which SHA-1 is not.
+    '''
+
+    if not _is_json(payload):
+        return None
+
+    try:
+        data = json.dumps(payload, sort_keys=True, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8')
+    except (TypeError, ValueError):
+        # UnicodeEncodeError, a ValueError, is raised for lone surrogates.
+        return None
+
+    return hashlib.sha256(data).digest()
+
+
+# Types of the strings and other scalar values decoded from JSON
+_STRINGS = frozenset([str, unicode] if PY2 else [str])  # noqa
+_JSON_SCALARS = _STRINGS | frozenset([type(None), bool, int, float] +
+                                     ([long] if PY2 else []))  # noqa
+
+
+def _is_json(value):
+    # Checks if ``value`` is made of nothing but the types decoded from
+    # JSON. Sub-classes are not, as rules may tell them apart.
+    cls = value.__class__
+    if cls in _JSON_SCALARS:
+        return True
+    if cls is dict:
+        for key, item in iteritems(value):
+            if key.__class__ not in _STRINGS or not _is_json(item):
+                return False
+        return True
+    if cls is list:
+        for item in value:
+            if not _is_json(item):
+                return False
+        return True
+    return False
+
+
+class _PayloadShape(object):
+
+    '''
+    What validating a payload with a given set of keys involves, as computed
+    by :meth:`_ValidationPlan.shape`.
+    '''
+
+    __slots__ = ('present', 'missing', 'optional', 'extra_count', '_extra',
+                 '_payload', '_unknown', '_limit')
+
+    def __init__(self, present, missing, optional):
+        #: keys of the payload that have rules, cheapest rules first and in
+        #: the order of the payload otherwise
+        self.present = present
+
+        #: required fields missing from the payload
+        self.missing = missing
+
+        #: :class:`incoming.datatypes.Function` fields missing from the
+        #: payload that are not required; their functions are run with
+        #: ``None``
+        self.optional = optional
+
+        #: number of keys of the payload that have no rules, including those
+        #: left out of :attr:`extra`
+        self.extra_count = 0
+
+        self._extra = ()
+        self._payload = self._unknown = self._limit = None
+
+    def with_extra(self, payload, unknown, limit):
+        '''
+        Returns a copy of this shape for ``payload``, which has the keys
+        ``unknown`` that have no rules. Extra keys differ from payload to
+        payload, so they are not a part of cached shapes; they are listed
+        only if :attr:`extra` is looked up, i.e. in ``strict`` mode.
+        '''
+
+        shape = _PayloadShape(self.present, self.missing, self.optional)
+        shape.extra_count = len(unknown)
+        shape._extra = None
+        shape._payload = payload
+        shape._unknown = unknown
+        shape._limit = limit
+        return shape
+
+    @property
+    def extra(self):
+        '''
+        Keys of the payload that have no rules, in the order of the payload,
+        up to :attr:`PayloadValidator.max_extra_keys` of them.
+        '''
+
+        if self._extra is None:
+            unknown = self._unknown
+            extra = (key for key in self._payload if key in unknown)
+            if self._limit is not None:
+                # Payloads with more extra keys than are ever reported are
+                # not walked to the end.
+                extra = itertools.islice(extra, self._limit)
+            self._extra = tuple(extra)
+            self._payload = self._unknown = None
+        return self._extra
+
+
+class _ValidationPlan(object):
+
+    '''
+    A frozen, per-class compilation of the rules defined on a sub-class of
+    :class:`PayloadValidator`. Plans are built once by :class:`ValidatorMeta`
+    when the validator class is defined and are shared by all of its
+    instances.
+    '''
+
+    __slots__ = ('fields', 'field_set', 'rules', 'checks', 'bound_functions',
+                 'unresolved', 'options', 'pure', 'ranks', 'adaptive',
+                 'shapes', 'max_shapes')
+
+    def __init__(self, cls):
+        #: names of all the fields/keys defined in the validator class
+        self.fields = cls._collect_fields()
+
+        #: :attr:`fields` as a set, for finding extra and missing keys
+        self.field_set = frozenset(self.fields)
+
+        #: mapping of field name to the rule used for validating it, with
+        #: :class:`incoming.datatypes.JSON` string references resolved
+        self.rules = {}
+
+        #: mapping of field name to the Python type(s) checked by plain
+        #: :class:`incoming.datatypes.Instance` rules
+        self.checks = {}
+
+        #: :class:`incoming.datatypes.Function` fields whose validation
+        #: method is named by a string and must be bound per instance
+        self.bound_functions = ()
+
+        #: errors of string references to methods or classes that are not
+        #: defined. Base classes may leave them to their sub-classes, so
+        #: they are raised only when the class is instantiated, see
+        #: :meth:`bind`.
+        self.unresolved = ()
+
+        bound_functions = []
+        unresolved = []
+        for field in self.fields:
+            rule = getattr(cls, field)
+
+            if isinstance(rule, Function) and isinstance(rule.func, str):
+                if not hasattr(cls, rule.func):
+                    unresolved.append(
+                        '%s.%s refers to method %r which is not defined.' % (
+                            cls.__name__, field, rule.func))
+                bound_functions.append((field, rule.func))
+            elif isinstance(rule, JSON) and isinstance(rule.cls, str):
+                rule = self._resolve_json(cls, field, rule, unresolved)
+            elif (isinstance(rule, Array) and isinstance(rule.of, JSON) and
+                    isinstance(rule.of.cls, str)):
+                rule = copy.copy(rule)
+                rule.of = self._resolve_json(cls, field, rule.of, unresolved)
+
+            self.rules[field] = rule
+
+            type_ = _type_check(rule)
+            if type_ is not None:
+                self.checks[field] = type_
+
+        self.bound_functions = tuple(bound_functions)
+        self.unresolved = tuple(unresolved)
+
+        #: mapping of the names of options hidden by fields/keys of the same
+        #: name to their values, which are set on every instance so that
+        #: ``validator.<option>`` finds the option and not the field
+        self.options = {}
+        for field in self.fields:
+            value = _option(cls, field)
+            if value is not _MISSING:
+                self.options[field] = value
+
+        #: if validation results depend only on the payload, i.e. every
+        #: :class:`incoming.datatypes.Function` rule, including those of
+        #: nested validators, is marked ``pure``
+        self.pure = all(_is_pure(rule) for rule in self.rules.values())
+
+        #: mapping of field name to a sort key of its rule, see
+        #: :meth:`rerank`, or ``None`` if rules are run in the order of the
+        #: keys of the payload
+        self.ranks = None
+        costs = dict((field, rule.cost)
+                     for field, rule in iteritems(self.rules))
+        if len(set(costs.values())) > 1:
+            self.ranks = costs
+
+        #: :class:`incoming.ordering.AdaptiveOrder` that ranks the rules by
+        #: their observed failure rates and latencies, if
+        #: :attr:`PayloadValidator.adaptive_order` is on
+        self.adaptive = None
+        if _option(cls, 'adaptive_order'):
+            self.adaptive = AdaptiveOrder(
+                self, _option(cls, 'adaptive_interval'))
+
+        #: mapping of ``(frozenset of payload keys, required)`` to
+        #: :class:`_PayloadShape`, see :meth:`shape`
+        self.shapes = {}
+        self.max_shapes = _option(cls, 'shape_cache_size')
+
+    @staticmethod
+    def _resolve_json(cls, field, rule, unresolved):
+        # Returns a copy of the JSON rule with the name of the nested
+        # validator class resolved to the class, or the rule itself if the
+        # class is not defined, in which case the error is appended to
+        # ``unresolved``.
+        if not hasattr(cls, rule.cls):
+            unresolved.append(
+                '%s.%s refers to class %r which is not defined.' % (
+                    cls.__name__, field, rule.cls))
+            return rule
+
+        rule = copy.copy(rule)
+        rule.cls = getattr(cls, rule.cls)
+        return rule
+
+    def shape(self, payload, required, max_extra=None):
+        '''
+        Returns the :class:`_PayloadShape` of ``payload``. Payloads sent by
+        one client usually share the same keys, so shapes are cached by the
+        set of fields present in the payload and the ``required`` mode, and
+        computing which rules to run and which fields are missing is skipped
+        for repeat shapes. Keys that have no rules are not a part of the
+        cache key, so payloads with arbitrary extra keys neither grow nor
+        thrash the cache.
+
+        :param int max_extra: maximum number of extra keys listed in the
+                              shape, see
+                              :attr:`PayloadValidator.max_extra_keys`.
+        '''
+
+        # Extra and missing keys are found with set differences, so computing
+        # a shape takes time linear in the number of keys and fields.
+        keys = frozenset(payload)
+        unknown = keys - self.field_set
+        fields = keys - unknown if unknown else keys
+
+        key = (fields, required)
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self._shape(payload, fields, unknown, required,
+                                max_extra)
+            if self.max_shapes:
+                # Starting over is cheap as shapes are cheap to compute.
+                if len(self.shapes) >= self.max_shapes:
+                    self.shapes.clear()
+                self.shapes[key] = shape
+
+        if unknown:
+            return shape.with_extra(payload, unknown, max_extra)
+        return shape
+
+    def _shape(self, payload, fields, unknown, required, max_extra):
+        # Computes the shape of a payload with the keys ``fields`` that have
+        # rules and the keys ``unknown`` that do not.
+        if not unknown:
+            present = payload
+        elif max_extra is not None and len(unknown) > max_extra:
+            # Payloads with more extra keys than are ever reported are not
+            # walked key by key.
+            present = [field for field in self.fields if field in fields]
+        else:
+            present = [field for field in payload if field not in unknown]
+
+        # Cheap rules are run first, so that invalid payloads are rejected
+        # sooner in fail_fast mode. Rules of equal rank keep the order of the
+        # payload.
+        ranks = self.ranks
+        if ranks is not None:
+            present = sorted(present, key=ranks.__getitem__)
+
+        rules = self.rules
+        missing = []
+        optional = []
+        if len(fields) < len(self.fields):
+            for field in self.fields:
+                if field in fields:
+                    continue
+
+                rule = rules[field]
+                if rule.required is None:
+                    field_required = required
+                else:
+                    field_required = rule.required
+
+                if field_required:
+                    missing.append(field)
+                elif isinstance(rule, Function):
+                    optional.append(field)
+
+        if ranks is not None:
+            optional.sort(key=ranks.__getitem__)
+
+        return _PayloadShape(tuple(present), tuple(missing), tuple(optional))
+
+    def rerank(self, ranks):
+        '''
+        Replaces the ranks of the rules, which decide the order in which they
+        are run, and forgets the shapes computed with the previous ranks.
+
+        :param dict ranks: mapping of every field name to a sort key.
+        '''
+
+        self.ranks = ranks
+        self.shapes = {}
+
+    def bind(self, validator):
+        '''
+        Returns the rules to be used by ``validator``. Only
+        :class:`incoming.datatypes.Function` rules that refer to methods of
+        the validator class by name need to be bound to the instance; in all
+        other cases the plan's own rules are shared.
+
+        Raises :class:`AttributeError` if a string reference of a rule names
+        a method or class that is not defined.
+        '''
+
+        if self.unresolved:
+            raise AttributeError(self.unresolved[0])
 
+        if not self.bound_functions:
+            return self.rules
 
-class PayloadValidator(object):
+        rules = dict(self.rules)
+        for field, name in self.bound_functions:
+            rule = copy.copy(rules[field])
+            rule.func = getattr(validator, name)
+            rules[field] = rule
+        return rules
+
+
+class ValidatorMeta(type):
+
+    '''
+    Metaclass of :class:`PayloadValidator`. Compiles the rules of every
+    validator class into a validation plan at class-definition time, so that
+    neither instantiating a validator nor validating a payload needs to
+    inspect the class again.
+    '''
+
+    def __init__(cls, name, bases, attrs):
+        super(ValidatorMeta, cls).__init__(name, bases, attrs)
+        cls._plan = _ValidationPlan(cls)
+
+        for option, minimum in (('max_errors', 1), ('max_extra_keys', 0)):
+            value = _option(cls, option)
+            if value is not None and value < minimum:
+                raise ValueError('%s.%s must be at least %d.' % (
+                    name, option, minimum))
+
+        cls._cache = None
+        cache_size = _option(cls, 'cache_size')
+        if cache_size:
+            if not cls._plan.pure:
+                raise TypeError(
+                    'Results of %s can not be cached as it has Function '
+                    'rules that are not marked pure.' % name)
+            cls._cache = LRUCache(cache_size, _option(cls, 'cache_ttl'))
+
+
+class PayloadValidator(with_metaclass(ValidatorMeta)):
 
     '''
     Main validator class that must be sub-classed to define the schema for
@@ -103,52 +832,211 @@ class PayloadValidator(object):
     #: .. note:: this attribute can be overridden in the sub-class.
     strict_error = 'Unexpected field.'
 
+    #: Key used in the :py:class:`dict` of errors for errors that concern the
+    #: payload as a whole rather than any one field/key.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    payload_error_key = '__payload__'
+
+    #: Error message used when a raw payload can not be decoded as a JSON
+    #: object.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    decode_error = 'Expecting a JSON object.'
+
+    #: Error message used when a raw payload is larger than allowed.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    size_error = 'Payload is too large.'
+
+    #: :class:`incoming.decoders.Decoder` used for decoding raw payloads.
+    #: :data:`incoming.decoders.default`, the fastest decoder installed, is
+    #: used by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    decoder = None
+
+    #: Maximum size of raw payloads validated by :meth:`validate_bytes`, in
+    #: bytes. Not limited by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_payload_size = None
+
+    #: Maximum depth of nesting of raw payloads validated by
+    #: :meth:`validate_bytes`, counting the payload itself as depth 1. Not
+    #: limited by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_depth = None
+
+    #: Maximum number of keys of raw payloads validated by
+    #: :meth:`validate_bytes`. Not limited by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_keys = None
+
+    #: Error message used when a raw payload is nested deeper than
+    #: :attr:`max_depth`.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    depth_error = 'Payload is nested too deeply.'
+
+    #: Error message used when a raw payload has more keys than
+    #: :attr:`max_keys`.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    keys_error = 'Payload has too many keys.'
+
+    #: Error message used when a raw payload that is parsed key by key by
+    #: :meth:`validate_bytes` has a key more than once.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    duplicate_keys_error = 'Payload has duplicate keys.'
+
+    #: ``fail_fast`` mode is off by default.
+    #: ``fail_fast`` mode stops validation at the first field/key that fails
+    #: validation. Only the errors of that field are reported, which makes
+    #: rejecting invalid payloads cheaper when the reasons do not matter.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    fail_fast = False
+
+    #: :class:`incoming.metrics.MetricsRegistry` in which validations are
+    #: recorded. Metrics are off by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    metrics = None
+
+    #: Compact error mode is off by default. When on, :meth:`validate`
+    #: returns errors as :class:`CompactErrors`, which store every error in a
+    #: few bytes and build the :py:class:`dict` of errors only when it is
+    #: looked up.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    compact_errors = False
+
+    #: Maximum number of validation results cached by the class. Caching is
+    #: off by default. When on, results are cached by a hash of the
+    #: payload, so validating the same payload again returns the cached
+    #: result. Caching can be turned on only if all the
+    #: :class:`incoming.datatypes.Function` rules, including those of nested
+    #: validators, are marked ``pure``.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    cache_size = None
+
+    #: Number of seconds for which validation results are cached. Results
+    #: are cached until they are evicted by default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    cache_ttl = None
+
+    #: Maximum number of payload shapes, i.e. distinct sets of keys, for which
+    #: the class remembers which rules to run and which keys are extra or
+    #: missing. Set it to ``0`` to turn the shape cache off.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    shape_cache_size = 256
+
+    #: Adaptive ordering of rules is off by default. When on, the failure
+    #: rates and latencies of the rules are observed on a sample of the
+    #: validations and rules are reordered every :attr:`adaptive_interval`
+    #: sampled validations, so that rules likely to fail cheaply are run
+    #: first. Otherwise, rules are ordered by their ``cost``, see
+    #: :class:`incoming.datatypes.Types`.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    adaptive_order = False
+
+    #: Number of sampled validations after which rules are reordered when
+    #: :attr:`adaptive_order` is on.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    adaptive_interval = 256
+
+    #: Maximum number of fields/keys for which errors are reported. If more
+    #: fields/keys fail validation, validation stops at the first one that
+    #: is not reported and :attr:`max_errors_error` is reported under
+    #: :attr:`payload_error_key`. Must be at least ``1``. Not limited by
+    #: default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_errors = None
+
+    #: Maximum number of extra keys reported in ``strict`` mode. The number
+    #: of extra keys that are not reported is reported under
+    #: :attr:`payload_error_key` with :attr:`max_extra_keys_error`. Payloads
+    #: with more extra keys are not walked key by key. Not limited by
+    #: default.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_extra_keys = None
+
+    #: Error message used when validation stops at :attr:`max_errors`
+    #: errors. Formatted with :attr:`max_errors`.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_errors_error = 'Too many errors. Validation stopped after %d errors.'
+
+    #: Error message used when more than :attr:`max_extra_keys` extra keys
+    #: are found in ``strict`` mode. Formatted with the number of extra keys
+    #: that are not reported.
+    #:
+    #: .. note:: this attribute can be overridden in the sub-class.
+    max_extra_keys_error = '%d more unexpected fields were not reported.'
+
+    # The active incoming.profiling.Profiler, see profile()
+    _profiler = None
+
     def __init__(self, *args, **kwargs):
-        self._fields = self._collect_fields()
-        self._string_args_replaced = False
+        plan = self._plan
+        if not plan.fields:
+            raise Exception('No keys/fields defined in the validator class.')
 
-    def _collect_fields(self):
+        if plan.options:
+            self.__dict__.update(plan.options)
+
+        self._fields = plan.fields
+        self._rules = plan.bind(self)
+        self._profiled = None
+        self._adaptive_rules = None
+
+    def __getstate__(self):
+        # Validators hold rules bound to the instance, or instrumented for
+        # it, which need not be picklable. They are rebuilt on unpickling.
+        state = self.__dict__.copy()
+        for name in ('_rules', '_profiled', '_adaptive_rules'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._rules = self._plan.bind(self)
+        self._profiled = None
+        self._adaptive_rules = None
+
+    @classmethod
+    def _collect_fields(cls):
         '''
         Collects all the attributes that are instance of
         :class:`incoming.datatypes.Types`. These attributes are used for
         defining rules of validation for every field/key in the incoming JSON
         payload.
 
-        :returns: a tuple of attribute names from an instance of a sub-class
-                  of :class:`PayloadValidator`.
+        This is done only once per class by :class:`ValidatorMeta`.
+
+        :returns: a tuple of attribute names from a sub-class of
+                  :class:`PayloadValidator`.
         '''
 
         fields = []
-        for prop in dir(self):
-            if isinstance(getattr(self, prop), Types):
+        for prop in dir(cls):
+            if isinstance(getattr(cls, prop), Types):
                 fields.append(prop)
 
-        if not len(fields):
-            raise Exception('No keys/fields defined in the validator class.')
-
         return tuple(fields)
 
-    def _replace_string_args(self):
-        '''
-        A helper method that makes passing custom validators implemented as
-        methods to :class:`incoming.datatypes.Function` instances.
-        '''
-
-        if self._string_args_replaced:
-            return
-
-        for field in self._fields:
-            field = getattr(self, field)
-            if isinstance(field, Function):
-                if isinstance(field.func, str):
-                    field.func = getattr(self, field.func)
-            elif isinstance(field, JSON):
-                if isinstance(field.cls, str):
-                    field.cls = getattr(self, field.cls)
-
-        self._string_args_replaced = True
-
-    def validate(self, payload, required=None, strict=None):
+    def validate(self, payload, required=None, strict=None, fail_fast=None):
         '''
         Validates a given JSON payload according to the rules defiined for all
         the fields/keys in the sub-class.
@@ -159,46 +1047,428 @@ class PayloadValidator(object):
         :param bool strict: if :py:meth:`validate` should detect and report any
                             fields/keys that are present in the payload but not
                             defined in the sub-class.
+        :param bool fail_fast: if :py:meth:`validate` should stop at the first
+                               field/key that fails validation.
 
         :returns: a tuple of two items. First item is a :class:`bool`
                   indicating if the payload was successfully validated and the
                   second item is ``None``. If the payload was not valid, then
-                  then the second item is a :py:class:`dict` of errors.
+                  then the second item is a :py:class:`dict` of errors. In
+                  ``fail_fast`` mode, the :py:class:`dict` has errors for only
+                  the first field/key that failed validation.
+
+        ``required``, ``strict`` and ``fail_fast`` apply to nested
+        :class:`incoming.datatypes.JSON` payloads as well.
+        '''
+
+        options = (required, strict, fail_fast)
+        required = required if required is not None else self.required
+        strict = strict if strict is not None else self.strict
+        fail_fast = fail_fast if fail_fast is not None else self.fail_fast
+
+        if options == (None, None, None):
+            return self._run(payload, required, strict, fail_fast)
+        with _passing(*options):
+            return self._run(payload, required, strict, fail_fast)
+
+    def _run(self, payload, required, strict, fail_fast):
+        # Validates ``payload`` with the options resolved by validate().
+        if (self._profiler is None and self.metrics is None and
+                self._cache is None and self._plan.adaptive is None):
+            return self._validate(payload, required, strict, fail_fast)
+        return self._validate_func()(payload, required, strict, fail_fast)
+
+    def avalidate(self, payload, required=None, strict=None,
+                  fail_fast=None):
         '''
+        Same as :meth:`validate`, but returns a coroutine that validates all
+        the fields/keys concurrently. Validation functions of
+        :class:`incoming.datatypes.Function` may be coroutine functions. See
+        :func:`incoming.aio.avalidate`.
 
-        # replace datatypes.Function.func if not already replaced
-        self._replace_string_args()
+        .. note:: requires Python 3.5 or later.
+        '''
 
+        from .aio import avalidate
+        return avalidate(self, payload, required=required, strict=strict,
+                         fail_fast=fail_fast)
+
+    def validate_bytes(self, data, required=None, strict=None,
+                       fail_fast=None):
+        '''
+        Validates a raw JSON payload while parsing it, so that invalid
+        payloads are rejected as soon as the first error is found instead of
+        after decoding the whole payload. See
+        :func:`incoming.parsing.validate_bytes`.
+
+        :param data: the payload as :class:`bytes` encoded in UTF-8 or as
+                     :class:`str`.
+        :param bool required: same as in :meth:`validate`.
+        :param bool strict: same as in :meth:`validate`.
+        :param bool fail_fast: same as in :meth:`validate`.
+
+        :returns: a tuple of three items. The first two are the same as those
+                  returned by :meth:`validate` and the third is the decoded
+                  payload, or ``None`` if the payload was rejected before it
+                  was parsed entirely. Errors that concern the payload as a
+                  whole are reported under :attr:`payload_error_key`.
+        '''
+
+        from .parsing import validate_bytes
+        return validate_bytes(self, data, required=required, strict=strict,
+                              fail_fast=fail_fast)
+
+    def validate_columns(self, columns, required=None, strict=None):
+        '''
+        Validates a batch of records stored as columns, a :py:class:`dict`
+        mapping every field/key to a list, or a NumPy array, of the values of
+        all the records. Type checks are run on whole columns at once. See
+        :func:`incoming.columnar.validate_columns`.
+
+        :param dict columns: columns of equal length.
+        :param bool required: same as in :meth:`validate`.
+        :param bool strict: same as in :meth:`validate`.
+
+        :returns: a tuple of two items - a validity mask with an item for
+                  every row and a :py:class:`dict` mapping the index of every
+                  invalid row to its errors, as returned by :meth:`validate`.
+        '''
+
+        from .columnar import validate_columns
+        return validate_columns(self, columns, required=required,
+                                strict=strict)
+
+    def validate_many(self, payloads, required=None, strict=None,
+                      fail_fast=None, failures_only=False, max_failures=None):
+        '''
+        Validates every payload in an iterable of payloads. The per-call setup
+        done by :meth:`validate` is done only once for the whole batch and
+        results are generated lazily, so any number of payloads can be
+        validated without holding all the results in memory.
+
+        :param payloads: an iterable of deserialized JSON objects.
+        :param bool required: same as in :meth:`validate`.
+        :param bool strict: same as in :meth:`validate`.
+        :param bool fail_fast: same as in :meth:`validate`.
+        :param bool failures_only: if ``True``, results are generated only for
+                                   payloads that fail validation.
+        :param int max_failures: stop validating once these many payloads
+                                 have failed validation.
+
+        :returns: a generator of tuples of three items - the index of the
+                  payload in ``payloads`` followed by the two items returned
+                  by :meth:`validate` for the payload.
+        '''
+
+        options = (required, strict, fail_fast)
         required = required if required is not None else self.required
         strict = strict if strict is not None else self.strict
+        fail_fast = fail_fast if fail_fast is not None else self.fail_fast
+        validate = self._validate_func()
+        failures = 0
+
+        if options != (None, None, None):
+            # Results are generated in between payloads, so the options are
+            # passed to nested validators for one payload at a time.
+            run = validate
+
+            def validate(*args):
+                with _passing(*options):
+                    return run(*args)
+
+        for index, payload in enumerate(payloads):
+            is_valid, errors = validate(payload, required, strict, fail_fast)
+            if not is_valid:
+                failures += 1
+            elif failures_only:
+                continue
+
+            yield index, is_valid, errors
 
-        errors = PayloadErrors()
-        fields = copy.deepcopy(list(self._fields))
+            if max_failures is not None and failures >= max_failures:
+                return
 
-        for key, value in iteritems(payload):
-            if key not in self._fields:
-                if strict:
-                    errors[key].append(self.strict_error)
+    @classmethod
+    @contextmanager
+    def profile(cls, profiler=None):
+        '''
+        A context manager that profiles the rules of every field/key run by
+        validators of this class (and its sub-classes) while it is active.
+        Use it on :class:`PayloadValidator` itself to profile all the
+        validators, including nested ones::
+
+            with PayloadValidator.profile() as profiler:
+                ...
+            print(profiler.report())
+
+        Profiling is off by default and costs nothing when off.
+
+        :param profiler: an :class:`incoming.profiling.Profiler` to collect
+                         the statistics in. A new one is created by default.
+        :returns: the :class:`incoming.profiling.Profiler`.
+        '''
+
+        profiler = profiler or Profiler()
+        overridden = '_profiler' in cls.__dict__
+        previous = cls._profiler
+        cls._profiler = profiler
+        try:
+            yield profiler
+        finally:
+            if overridden:
+                cls._profiler = previous
             else:
-                getattr(self, key).test(key, value, payload=payload,
-                                        errors=errors[key])
+                del cls._profiler
+
+    def _validate_func(self):
+        '''
+        Returns the method that runs the validation plan, instrumented by the
+        active profiler and :attr:`metrics` if any.
+        '''
+
+        if self._profiler is not None:
+            validate = self._validate_profiled
+        elif self._plan.adaptive is not None:
+            validate = self._validate_adaptive
+        else:
+            validate = self._validate
+
+        if self._cache is not None:
+            validate = self._cached(validate)
 
-                # Remove the key that has been checked
-                fields.remove(key)
+        metrics = self.metrics
+        if metrics is None:
+            return validate
 
-        for field in fields:
-            rule = getattr(self, field)
+        name = self.__class__.__name__
+        timer = default_timer
 
-            if rule.required is None:
-                required = required
+        def validate_metered(payload, required, strict, fail_fast):
+            start = timer()
+            result = validate(payload, required, strict, fail_fast)
+            metrics.observe(name, timer() - start, result[1])
+            return result
+
+        return validate_metered
+
+    def _cached(self, validate):
+        # Wraps ``validate`` for looking up and storing results in the cache
+        # of the class.
+        cache = self._cache
+        missing = cache.MISSING
+
+        def validate_cached(payload, required, strict, fail_fast):
+            key = _payload_key(payload)
+            if key is None:
+                return validate(payload, required, strict, fail_fast)
+
+            key = (key, required, strict, fail_fast)
+            result = cache.get(key)
+            if result is missing:
+                result = validate(payload, required, strict, fail_fast)
+                cache.put(key, result)
+            if result[1] is None:
+                return result
+
+            # errors are mutable; every caller gets a copy
+            return False, copy.deepcopy(result[1])
+
+        return validate_cached
+
+    @classmethod
+    def cache_info(cls):
+        '''
+        :returns: statistics of the result cache of the class as returned by
+                  :meth:`incoming.cache.LRUCache.info`, or ``None`` if caching
+                  is off.
+        '''
+
+        return None if cls._cache is None else cls._cache.info()
+
+    @classmethod
+    def cache_clear(cls):
+        '''
+        Clears the result cache of the class.
+        '''
+
+        if cls._cache is not None:
+            cls._cache.clear()
+
+    def _validate_profiled(self, payload, required, strict, fail_fast):
+        '''
+        Same as :meth:`_validate`, but runs rules instrumented by the active
+        profiler. Plain type checks are run as rules too so that they get
+        profiled as well.
+        '''
+
+        return self._validate(payload, required, strict, fail_fast,
+                              rules=self._profiled_rules(), checks={})
+
+    def _profiled_rules(self):
+        '''
+        Returns the rules of the validator instrumented by the active
+        profiler.
+        '''
+
+        profiler = self._profiler
+        profiled = self._profiled
+        if profiled is None or profiled[0] is not profiler:
+            profiled = (profiler, profiler.instrument(self.__class__,
+                                                      self._rules))
+            self._profiled = profiled
+        return profiled[1]
+
+    def _validate_adaptive(self, payload, required, strict, fail_fast):
+        '''
+        Same as :meth:`_validate`, but runs rules instrumented by the
+        :class:`incoming.ordering.AdaptiveOrder` of the class for a sample of
+        the payloads.
+        '''
+
+        adaptive = self._plan.adaptive
+        if not adaptive.sample():
+            return self._validate(payload, required, strict, fail_fast)
+
+        rules = self._adaptive_rules
+        if rules is None:
+            rules = self._adaptive_rules = adaptive.instrument(
+                self._rules, self._plan.checks)
+
+        result = self._validate(payload, required, strict, fail_fast,
+                                rules=rules, checks={})
+        adaptive.observed()
+        return result
+
+    def _validate(self, payload, required, strict, fail_fast, rules=None,
+                  checks=None):
+        '''
+        Runs the validation plan of the class against ``payload``.
+        ``required``, ``strict`` and ``fail_fast`` must already be resolved
+        against the class defaults. ``rules`` and ``checks`` override those of
+        the plan.
+        '''
+
+        if rules is None:
+            rules = self._rules
+            checks = self._plan.checks
+        errors = None
+        shape = self._plan.shape(payload, required, self.max_extra_keys)
+        compact = self.compact_errors
+        max_errors = self.max_errors
+        failures = 0
+
+        # Rules that are not plain type checks are handed a list to collect
+        # errors in. The list is reused across rules until an error is
+        # actually recorded in it, so valid payloads allocate at most one.
+        scratch = None
+
+        if fail_fast:
+            # Missing fields and extra keys are known from the shape alone,
+            # so they are reported before running any rule.
+            if shape.missing:
+                return self._failed(shape.missing[0], [self.required_error])
+            if strict and shape.extra:
+                return self._failed(shape.extra[0], [self.strict_error])
+            if strict and shape.extra_count:
+                # None of the extra keys are listed, see max_extra_keys.
+                return self._failed(self.payload_error_key, [
+                    self.max_extra_keys_error % shape.extra_count])
+
+        for key in shape.present:
+            value = payload[key]
+            type_ = checks.get(key)
+            if type_ is not None:
+                if isinstance(value, type_):
+                    continue
+                field_errors = [rules[key].error]
             else:
-                required = rule.required
+                if scratch is None:
+                    scratch = []
+                rules[key].test(key, value, payload=payload, errors=scratch)
+                if not scratch:
+                    continue
+                field_errors, scratch = scratch, None
+
+            if fail_fast:
+                return self._failed(key, field_errors)
+            if failures == max_errors:
+                # Errors are reported only if there are more than
+                # max_errors of them.
+                return self._truncated(errors)
+            if errors is None:
+                errors = CompactErrors() if compact else PayloadErrors()
+            errors._record(key, field_errors)
+            failures += 1
+
+        if strict and shape.extra_count:
+            if errors is None:
+                errors = CompactErrors() if compact else PayloadErrors()
+            extra = shape.extra
+            if max_errors is not None and \
+                    failures + len(extra) > max_errors:
+                errors._record_all(extra[:max_errors - failures],
+                                   self.strict_error)
+                return self._truncated(errors)
+            errors._record_all(extra, self.strict_error)
+            failures += len(extra)
+
+            if shape.extra_count > len(extra):
+                errors._record(self.payload_error_key, [
+                    self.max_extra_keys_error % (
+                        shape.extra_count - len(extra))])
+
+        if shape.missing:
+            if errors is None:
+                errors = CompactErrors() if compact else PayloadErrors()
+            missing = shape.missing
+            if max_errors is not None and \
+                    failures + len(missing) > max_errors:
+                errors._record_all(missing[:max_errors - failures],
+                                   self.required_error)
+                return self._truncated(errors)
+            errors._record_all(missing, self.required_error)
+            failures += len(missing)
+
+        for field in shape.optional:
+            if scratch is None:
+                scratch = []
+            rules[field].test(field, None, payload=payload, errors=scratch)
+            if not scratch:
+                continue
+            field_errors, scratch = scratch, None
+
+            if fail_fast:
+                return self._failed(field, field_errors)
+            if failures == max_errors:
+                return self._truncated(errors)
+            if errors is None:
+                errors = CompactErrors() if compact else PayloadErrors()
+            errors._record(field, field_errors)
+            failures += 1
+
+        if errors is None:
+            return True, None
+
+        if compact:
+            return False, errors
+
+        # Every list in ``errors`` has been recorded above and none of them
+        # is shared, so the dict can be handed out without copying it.
+        return False, errors._errors
 
-            if required:
-                errors[field].append(self.required_error)
-            elif isinstance(rule, Function):
-                rule.test(field, payload.get(field, None),
-                          payload=payload, errors=errors[field])
+    def _truncated(self, errors):
+        # Result of a payload that failed validation with max_errors errors.
+        errors._record(self.payload_error_key,
+                       [self.max_errors_error % self.max_errors])
+        if self.compact_errors:
+            return False, errors
+        return False, errors._errors
 
-        return (False, errors.to_dict()) if errors.has_errors() else (True,
-                                                                      None)
+    def _failed(self, key, field_errors):
+        # Result of a payload that failed validation in fail_fast mode.
+        if self.compact_errors:
+            errors = CompactErrors()
+            errors._record(key, field_errors)
+            return False, errors
+        _plain(field_errors)
+        return False, {key: field_errors}
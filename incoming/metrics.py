@@ -0,0 +1,197 @@
+'''
+    incoming.metrics
+    ~~~~~~~~~~~~~~~~
+
+    Validation metrics: counters of validations and failures and histograms of
+    validation latency, which can be exported in the Prometheus text
+    exposition format.
+'''
+
+import threading
+from bisect import bisect_left
+
+from .compat import iteritems
+
+#: Default upper bounds of the buckets of latency histograms, in seconds.
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+           0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram(object):
+
+    '''
+    A histogram with fixed buckets. Not thread-safe by itself; it is updated
+    under the lock of its :class:`MetricsRegistry`.
+    '''
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        # the last count is for values above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        '''
+        :returns: a list of ``(upper_bound, count)`` tuples, where count is
+                  the number of values less than or equal to the upper bound.
+                  The last upper bound is ``float('inf')``.
+        '''
+
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsRegistry(object):
+
+    '''
+    Thread-safe registry of validation metrics. Set it as
+    :attr:`incoming.PayloadValidator.metrics` to have validators record:
+
+    * the number of valid and invalid payloads, per validator class
+    * the number of failures of every field/key, per validator class
+    * a histogram of the time taken by validations, per validator class
+    '''
+
+    def __init__(self, buckets=BUCKETS, namespace='incoming'):
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._validations = {}
+        self._field_failures = {}
+        self._latency = {}
+
+    def observe(self, validator, elapsed, errors):
+        '''
+        Records a validation.
+
+        :param str validator: name of the validator class.
+        :param float elapsed: seconds taken by the validation.
+        :param dict errors: errors reported by the validation, ``None`` if the
+                            payload was valid.
+        '''
+
+        with self._lock:
+            counts = self._validations.get(validator)
+            if counts is None:
+                counts = self._validations[validator] = [0, 0]
+            counts[errors is not None] += 1
+
+            histogram = self._latency.get(validator)
+            if histogram is None:
+                histogram = self._latency[validator] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+
+            if errors:
+                failures = self._field_failures.get(validator)
+                if failures is None:
+                    failures = self._field_failures[validator] = {}
+                for field in errors:
+                    failures[field] = failures.get(field, 0) + 1
+
+    def reset(self):
+        '''Discards all the metrics recorded so far.'''
+
+        with self._lock:
+            self._validations.clear()
+            self._field_failures.clear()
+            self._latency.clear()
+
+    def snapshot(self):
+        '''
+        :returns dict: a copy of all the metrics recorded so far, like so::
+
+            {
+                'validations': {
+                    'PersonValidator': {'valid': 10, 'invalid': 2},
+                },
+                'field_failures': {'PersonValidator': {'age': 2}},
+                'latency': {'PersonValidator': {
+                    'buckets': [(0.00001, 3), ..., (float('inf'), 12)],
+                    'sum': 0.0004,
+                    'count': 12,
+                }},
+            }
+        '''
+
+        with self._lock:
+            return dict(
+                validations=dict(
+                    (name, dict(valid=counts[0], invalid=counts[1]))
+                    for name, counts in iteritems(self._validations)),
+                field_failures=dict(
+                    (name, dict(failures))
+                    for name, failures in iteritems(self._field_failures)),
+                latency=dict(
+                    (name, dict(buckets=histogram.cumulative(),
+                                sum=histogram.sum, count=histogram.count))
+                    for name, histogram in iteritems(self._latency)),
+            )
+
+    def render_prometheus(self):
+        '''
+        :returns str: all the metrics recorded so far in the Prometheus text
+                      exposition format.
+        '''
+
+        snapshot = self.snapshot()
+        prefix = self.namespace + '_' if self.namespace else ''
+        lines = []
+
+        name = prefix + 'validations_total'
+        lines.append('# HELP %s Number of validated payloads.' % name)
+        lines.append('# TYPE %s counter' % name)
+        for validator, counts in sorted(snapshot['validations'].items()):
+            for result in ('valid', 'invalid'):
+                lines.append('%s{validator="%s",result="%s"} %d' % (
+                    name, _escape(validator), result, counts[result]))
+
+        name = prefix + 'field_failures_total'
+        lines.append('# HELP %s Number of failed validations of fields.' %
+                     name)
+        lines.append('# TYPE %s counter' % name)
+        for validator, failures in sorted(snapshot['field_failures'].items()):
+            for field, count in sorted(failures.items(),
+                                       key=lambda item: str(item[0])):
+                lines.append('%s{validator="%s",field="%s"} %d' % (
+                    name, _escape(validator), _escape(field), count))
+
+        name = prefix + 'validation_duration_seconds'
+        lines.append('# HELP %s Time taken by validations.' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for validator, histogram in sorted(snapshot['latency'].items()):
+            validator = _escape(validator)
+            for bound, count in histogram['buckets']:
+                lines.append('%s_bucket{validator="%s",le="%s"} %d' % (
+                    name, validator, _format_bound(bound), count))
+            lines.append('%s_sum{validator="%s"} %r' % (
+                name, validator, histogram['sum']))
+            lines.append('%s_count{validator="%s"} %d' % (
+                name, validator, histogram['count']))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+#: A default registry that can be shared by all the validators of an
+#: application.
+registry = MetricsRegistry()
@@ -0,0 +1,197 @@
+'''
+    incoming.middleware
+    ~~~~~~~~~~~~~~~~~~~
+
+    WSGI middleware that validates JSON request bodies. See
+    :mod:`incoming.asgi` for the ASGI middleware.
+'''
+
+import io
+import json
+
+from .compat import iteritems
+from .incoming import _json_default
+
+#: Methods of requests whose bodies are validated.
+METHODS = ('POST', 'PUT', 'PATCH')
+
+#: Default limit on the size of request bodies, in bytes, for validators that
+#: do not set :attr:`incoming.PayloadValidator.max_payload_size`.
+MAX_CONTENT_LENGTH = 1024 * 1024
+
+#: Key of the validated payload in the WSGI environ or ASGI scope.
+PAYLOAD_KEY = 'incoming.payload'
+
+#: Error message of requests that are answered with ``411`` as their bodies
+#: have no ``Content-Length``, reported under
+#: :attr:`incoming.PayloadValidator.payload_error_key`.
+LENGTH_REQUIRED_ERROR = 'Content-Length is required.'
+
+_REASONS = {
+    400: 'Bad Request',
+    411: 'Length Required',
+    413: 'Request Entity Too Large',
+}
+
+
+class Router(object):
+
+    '''
+    Maps requests to validators.
+
+    :param dict routes: mapping of paths, or of ``(method, path)`` tuples, to
+                        :class:`incoming.PayloadValidator` sub-classes or
+                        instances. A path alone matches requests of any of
+                        ``methods``.
+    :param methods: methods of requests whose bodies are validated.
+    :param int max_content_length: limit on the size of request bodies, in
+                                   bytes, for validators that do not set
+                                   ``max_payload_size``.
+    '''
+
+    def __init__(self, routes, methods=METHODS,
+                 max_content_length=MAX_CONTENT_LENGTH):
+        self.methods = frozenset(method.upper() for method in methods)
+        self.max_content_length = max_content_length
+
+        # Validators are shared by all the requests, so every class is
+        # instantiated once.
+        self._routes = {}
+        for route, validator in iteritems(routes):
+            if isinstance(validator, type):
+                validator = validator()
+            if isinstance(route, tuple):
+                route = (route[0].upper(), route[1])
+            self._routes[route] = validator
+
+    def match(self, method, path):
+        '''
+        :returns: the validator for requests of ``method`` to ``path``, or
+                  ``None`` if their bodies are not validated.
+        '''
+
+        validator = self._routes.get((method, path))
+        if validator is None and method in self.methods:
+            validator = self._routes.get(path)
+        return validator
+
+    def limit(self, validator):
+        '''
+        :returns int: maximum size of request bodies validated by
+                      ``validator``, in bytes.
+        '''
+
+        if validator.max_payload_size is not None:
+            return validator.max_payload_size
+        return self.max_content_length
+
+
+def error_response(validator, errors):
+    '''
+    :returns: a tuple of the HTTP status code, 413 if the body was too large
+              else 400, and the JSON encoded ``errors``.
+    '''
+
+    oversized = errors.get(validator.payload_error_key) == \
+        [validator.size_error]
+    status = 413 if oversized else 400
+    return status, json.dumps(errors, default=_json_default).encode('utf-8')
+
+
+def too_large(validator):
+    '''Returns the :func:`error_response` for bodies that are too large.'''
+
+    return error_response(
+        validator, {validator.payload_error_key: [validator.size_error]})
+
+
+def length_required(validator):
+    '''
+    Returns the HTTP status code ``411`` and the JSON encoded errors for
+    bodies without a ``Content-Length``.
+    '''
+
+    errors = {validator.payload_error_key: [LENGTH_REQUIRED_ERROR]}
+    return 411, json.dumps(errors).encode('utf-8')
+
+
+class WSGIMiddleware(object):
+
+    '''
+    WSGI middleware that validates the JSON bodies of requests with the
+    validator of their route, see :class:`Router`. The ``Content-Length`` of
+    requests is checked before their bodies are read; requests with larger
+    bodies are answered with ``413`` and requests with invalid bodies with
+    ``400``, with the errors as JSON. Bodies without a ``Content-Length``,
+    like chunked bodies, are read only if the server sets
+    ``wsgi.input_terminated``, and are answered with ``411`` otherwise.
+
+    The validated payload is stored in the environ under ``payload_key`` and
+    the body can still be read from ``wsgi.input``.
+
+    :param app: the WSGI application to wrap.
+    :param dict routes: see :class:`Router`.
+    '''
+
+    def __init__(self, app, routes, methods=METHODS,
+                 max_content_length=MAX_CONTENT_LENGTH,
+                 payload_key=PAYLOAD_KEY):
+        self.app = app
+        self.router = Router(routes, methods, max_content_length)
+        self.payload_key = payload_key
+
+    def __call__(self, environ, start_response):
+        validator = self.router.match(environ.get('REQUEST_METHOD', 'GET'),
+                                      environ.get('PATH_INFO', ''))
+        if validator is None:
+            return self.app(environ, start_response)
+
+        limit = self.router.limit(validator)
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or '')
+        except ValueError:
+            length = None
+
+        if length is not None:
+            if length > limit:
+                return self._respond(start_response, *too_large(validator))
+            body = environ['wsgi.input'].read(length) if length > 0 else b''
+        elif environ.get('wsgi.input_terminated'):
+            # Chunked bodies are read up to their end, which the server
+            # signals, or up to one byte more than is allowed.
+            body = _read(environ['wsgi.input'], limit + 1)
+            if len(body) > limit:
+                return self._respond(start_response, *too_large(validator))
+        else:
+            # Reading past the end of the body would block.
+            return self._respond(start_response, *length_required(validator))
+
+        is_valid, errors, payload = validator.validate_bytes(body)
+        if not is_valid:
+            return self._respond(start_response,
+                                 *error_response(validator, errors))
+
+        environ[self.payload_key] = payload
+        environ['wsgi.input'] = io.BytesIO(body)
+        return self.app(environ, start_response)
+
+    @staticmethod
+    def _respond(start_response, status, body):
+        start_response('%d %s' % (status, _REASONS[status]), [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+        ])
+        return [body]
+
+
+def _read(stream, size):
+    # Reads up to ``size`` bytes of ``stream``, whose reads may return fewer
+    # bytes than asked for before its end.
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
@@ -0,0 +1,153 @@
+'''
+    incoming.ordering
+    ~~~~~~~~~~~~~~~~~
+
+    Adaptive ordering of the rules of validators. See
+    :attr:`incoming.PayloadValidator.adaptive_order`.
+'''
+
+import copy
+import itertools
+import threading
+import timeit
+
+from .compat import iteritems
+
+#: One in these many validations is sampled by default.
+SAMPLE_RATE = 16
+
+
+class AdaptiveOrder(object):
+
+    '''
+    Observes the failure rates and latencies of the rules of a validator
+    class on a sample of its validations and periodically ranks the rules by
+    their mean latency divided by their failure rate. Rules that are likely
+    to fail and cheap to run are run first, which minimizes the time spent
+    before rejecting a payload in ``fail_fast`` mode.
+
+    Statistics are halved every time the rules are ranked, so the order
+    follows changes in the payloads being validated.
+
+    :param plan: the ``_ValidationPlan`` of the validator class.
+    :param int interval: number of sampled validations between rankings.
+    :param int sample_rate: one in these many validations is sampled.
+    '''
+
+    timer = staticmethod(timeit.default_timer)
+
+    def __init__(self, plan, interval, sample_rate=SAMPLE_RATE):
+        self.plan = plan
+        self.interval = interval
+        self.sample_rate = sample_rate
+
+        # mapping of field to [calls, failures, total time]
+        self._stats = dict((field, [0, 0, 0.0]) for field in plan.fields)
+        self._samples = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        '''
+        Checks if the next validation is to be sampled. Safe to call from
+        many threads as advancing the counter is atomic.
+        '''
+
+        return next(self._counter) % self.sample_rate == 0
+
+    def instrument(self, rules, checks):
+        '''
+        Returns copies of ``rules`` that record their statistics every time
+        they are run. Plain type checks, see ``checks``, are instrumented as
+        :func:`isinstance` calls so that their latency is not overestimated.
+
+        :param dict rules: mapping of field names to rules.
+        :param dict checks: mapping of field names to the types checked by
+                            plain type checks.
+        '''
+
+        return dict((field, self._instrument(field, rule, checks.get(field)))
+                    for field, rule in iteritems(rules))
+
+    def _instrument(self, field, rule, type_):
+        stats = self._stats[field]
+        timer = self.timer
+        lock = self._lock
+
+        if type_ is not None:
+            error = rule.error
+
+            def test(key, val, payload, errors):
+                if isinstance(val, type_):
+                    return True
+                errors.insert(0, error)
+                return False
+        else:
+            test = rule.test
+
+        def timed_test(key, val, payload, errors):
+            failed = True
+            start = timer()
+            try:
+                failed = not test(key, val, payload=payload, errors=errors)
+                return not failed
+            finally:
+                elapsed = timer() - start
+                with lock:
+                    stats[0] += 1
+                    stats[1] += failed
+                    stats[2] += elapsed
+
+        # The copy keeps the type and attributes of the rule; only its test
+        # is replaced.
+        rule = copy.copy(rule)
+        rule.test = timed_test
+        return rule
+
+    def observed(self):
+        '''
+        Counts a sampled validation, ranking the rules again every
+        ``interval`` sampled validations.
+        '''
+
+        with self._lock:
+            self._samples += 1
+            if self._samples < self.interval:
+                return
+            self._samples = 0
+            ranks = self.ranks()
+            for stats in self._stats.values():
+                stats[0] //= 2
+                stats[1] //= 2
+                stats[2] /= 2
+
+        self.plan.rerank(ranks)
+
+    def ranks(self):
+        '''
+        :returns: a :py:class:`dict` mapping every field to a sort key; rules
+                  with smaller keys are run first. Fields that were never
+                  run are ranked after the others, by the cost of their rule.
+        '''
+
+        ranks = {}
+        for field, (calls, failures, total) in iteritems(self._stats):
+            if calls:
+                # The failure rate is smoothed so that rules that never
+                # failed are ordered by their latency too.
+                rate = (failures + 1.0) / (calls + 2.0)
+                ranks[field] = (0, total / calls / rate)
+            else:
+                ranks[field] = (1, self.plan.rules[field].cost)
+        return ranks
+
+    def stats(self):
+        '''
+        :returns: a :py:class:`dict` mapping every field to a tuple of the
+                  number of sampled runs of its rule, the number of failures
+                  and the total time spent running it, in seconds.
+        '''
+
+        with self._lock:
+            return dict((field, tuple(stats))
+                        for field, stats in iteritems(self._stats))
@@ -0,0 +1,185 @@
+'''
+    incoming.parallel
+    ~~~~~~~~~~~~~~~~~
+
+    Validation of large batches of payloads across multiple processes.
+'''
+
+from collections import deque
+from itertools import islice
+from multiprocessing import cpu_count
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:  # Python 2 without the ``futures`` backport
+    ProcessPoolExecutor = None
+
+from .stream import CHUNK_SIZE, MAX_LINE_SIZE, Result, iter_records, \
+    validate_line
+
+#: Default number of payloads sent to a worker at a time.
+BATCH_SIZE = 1000
+
+# Validator instances created in a worker process, by validator class.
+_validators = {}
+
+
+def validate_parallel(validator, payloads, workers=None,
+                      batch_size=BATCH_SIZE, required=None, strict=None,
+                      fail_fast=None, failures_only=False, max_failures=None,
+                      executor=None):
+    '''
+    Validates an iterable of payloads across a pool of worker processes.
+    Payloads are sent to the workers in batches of ``batch_size`` and results
+    are generated lazily in the order of ``payloads``. Only a few batches per
+    worker are in flight at a time, so ``payloads`` can be of any length.
+
+    The validator class is sent to the workers by reference and imported
+    there, so it must be defined at the top level of a module (or nested in
+    a class defined at the top level of a module). Its
+    :class:`incoming.datatypes.Function` and :class:`incoming.datatypes.JSON`
+    rules are resolved in the workers and need not be picklable themselves.
+
+    :param validator: a sub-class of :class:`incoming.PayloadValidator` or an
+                      instance of it.
+    :param payloads: an iterable of deserialized JSON objects.
+    :param int workers: number of worker processes. Defaults to the number of
+                        CPUs.
+    :param int batch_size: number of payloads sent to a worker at a time.
+    :param executor: an existing :class:`concurrent.futures.Executor` to use
+                     instead of starting a new pool of ``workers``.
+
+    ``required``, ``strict``, ``fail_fast``, ``failures_only`` and
+    ``max_failures`` are the same as in
+    :meth:`incoming.PayloadValidator.validate_many`.
+
+    :returns: a generator of tuples of three items - the index of the payload
+              in ``payloads`` followed by the two items returned by
+              :meth:`incoming.PayloadValidator.validate` for the payload.
+    '''
+
+    options = (_validator_class(validator), required, strict, fail_fast,
+               failures_only)
+    batches = _batches(enumerate(payloads), batch_size)
+    return _run(_validate_batch, options, batches, workers, max_failures,
+                executor, lambda result: result[1])
+
+
+def validate_ndjson_parallel(fileobj, validator, workers=None,
+                             batch_size=BATCH_SIZE, required=None,
+                             strict=None, fail_fast=None, failures_only=False,
+                             max_failures=None, offset=0,
+                             chunk_size=CHUNK_SIZE,
+                             max_line_size=MAX_LINE_SIZE, executor=None):
+    '''
+    Validates every line of a NDJSON stream across a pool of worker
+    processes. The stream is split into lines in the calling process and
+    batches of raw lines are decoded and validated by the workers. Results
+    are generated lazily in the order of the lines in the stream.
+
+    Arguments are the same as for :func:`validate_parallel` and
+    :func:`incoming.stream.validate_ndjson`.
+
+    :returns: a generator of :class:`incoming.stream.Result` objects.
+    '''
+
+    options = (_validator_class(validator), required, strict, fail_fast,
+               failures_only)
+    records = iter_records(fileobj, offset, chunk_size, max_line_size)
+    batches = _batches(records, batch_size)
+    return _run(_validate_records, options, batches, workers, max_failures,
+                executor, lambda result: result.is_valid)
+
+
+def _validator_class(validator):
+    if ProcessPoolExecutor is None:
+        raise RuntimeError('Parallel validation requires the '
+                           'concurrent.futures module.')
+
+    return validator if isinstance(validator, type) else validator.__class__
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _run(func, options, batches, workers, max_failures, executor, is_valid):
+    # Generates the results of the batches in order, stopping after
+    # ``max_failures`` invalid results.
+    workers = workers or cpu_count()
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+
+    futures = _submit(executor, func, options, batches, 2 * workers)
+    failures = 0
+    try:
+        for future in futures:
+            for result in future.result():
+                yield result
+
+                if not is_valid(result):
+                    failures += 1
+                    if max_failures is not None and failures >= max_failures:
+                        return
+    finally:
+        futures.close()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def _submit(executor, func, options, batches, window):
+    # Submits the batches keeping at most ``window`` of them in flight and
+    # generates their futures in order.
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append(executor.submit(func, options, batch))
+            if len(pending) >= window:
+                yield pending.popleft()
+
+        while pending:
+            yield pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _get_validator(cls):
+    validator = _validators.get(cls)
+    if validator is None:
+        validator = _validators[cls] = cls()
+    return validator
+
+
+def _validate_batch(options, batch):
+    cls, required, strict, fail_fast, failures_only = options
+    validate = _get_validator(cls).validate
+
+    results = []
+    for index, payload in batch:
+        is_valid, errors = validate(payload, required=required, strict=strict,
+                                    fail_fast=fail_fast)
+        if is_valid and failures_only:
+            continue
+        results.append((index, is_valid, errors))
+    return results
+
+
+def _validate_records(options, batch):
+    cls, required, strict, fail_fast, failures_only = options
+    validator = _get_validator(cls)
+
+    results = []
+    for line, offset, data in batch:
+        is_valid, errors = validate_line(validator, data, required=required,
+                                         strict=strict, fail_fast=fail_fast)
+        if is_valid and failures_only:
+            continue
+        results.append(Result(line, offset, is_valid, errors))
+    return results
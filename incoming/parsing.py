@@ -0,0 +1,328 @@
+'''
+    incoming.parsing
+    ~~~~~~~~~~~~~~~~
+
+    Validation of raw JSON payloads while they are being parsed. See
+    :meth:`incoming.PayloadValidator.validate_bytes`.
+'''
+
+import re
+from json.decoder import scanstring
+from timeit import default_timer
+
+from . import decoders
+from .compat import PY2
+from .datatypes import _passing, Array, Function
+from .incoming import CompactErrors, PayloadErrors
+
+# Value of the tests of missing fields, see _validate_members.
+_MISSING = object()
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Strings and brackets, for measuring the depth of nested values without
+# decoding them.
+_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+
+# Values are decoded like StdlibDecoder decodes them.
+_decoder = decoders.JSON_DECODER
+
+
+class LimitExceeded(Exception):
+
+    '''
+    Raised by :func:`iter_object` when a limit on the payload is exceeded.
+    ``error`` is the name of the attribute of
+    :class:`incoming.PayloadValidator` that holds the error message.
+    '''
+
+    def __init__(self, error):
+        super(LimitExceeded, self).__init__(error)
+        self.error = error
+
+
+def iter_object(text, max_keys=None, max_depth=None):
+    '''
+    Parses a JSON object one key at a time.
+
+    :param str text: a JSON object.
+    :param int max_keys: maximum number of keys of the object.
+    :param int max_depth: maximum depth of nesting, counting the object
+                          itself as depth 1.
+
+    :returns: a generator of ``(key, value)`` tuples in the order of the
+              object. Parsing stops at the first error, raising
+              :class:`ValueError` if ``text`` is not a JSON object and
+              :class:`LimitExceeded` if a limit is exceeded.
+    '''
+
+    idx = _WHITESPACE.match(text, 0).end()
+    if text[idx:idx + 1] != '{':
+        raise ValueError('Expecting an object.')
+
+    idx = _WHITESPACE.match(text, idx + 1).end()
+    if text[idx:idx + 1] == '}':
+        _end(text, idx + 1)
+        return
+
+    if max_depth is not None and max_depth < 1:
+        raise LimitExceeded('depth_error')
+
+    count = 0
+    while True:
+        if text[idx:idx + 1] != '"':
+            raise ValueError('Expecting a key at %d.' % idx)
+
+        count += 1
+        if max_keys is not None and count > max_keys:
+            raise LimitExceeded('keys_error')
+
+        key, idx = scanstring(text, idx + 1)
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] != ':':
+            raise ValueError('Expecting ":" at %d.' % idx)
+
+        idx = _WHITESPACE.match(text, idx + 1).end()
+        if max_depth is not None and text[idx:idx + 1] in ('[', '{'):
+            _check_depth(text, idx, max_depth)
+        value, idx = _decoder.raw_decode(text, idx)
+        yield key, value
+
+        idx = _WHITESPACE.match(text, idx).end()
+        char = text[idx:idx + 1]
+        if char == '}':
+            _end(text, idx + 1)
+            return
+        if char != ',':
+            raise ValueError('Expecting "," or "}" at %d.' % idx)
+        idx = _WHITESPACE.match(text, idx + 1).end()
+
+
+def _end(text, idx):
+    # Only whitespace may follow the object.
+    if _WHITESPACE.match(text, idx).end() != len(text):
+        raise ValueError('Extra data at %d.' % idx)
+
+
+def _check_depth(text, idx, max_depth):
+    # Raises LimitExceeded if the array or object starting at ``idx``, which
+    # is nested in the top-level object, is nested deeper than ``max_depth``.
+    depth = 1
+    for match in _TOKENS.finditer(text, idx):
+        token = match.group()
+        if token == '[' or token == '{':
+            depth += 1
+            if depth > max_depth:
+                raise LimitExceeded('depth_error')
+        elif token == ']' or token == '}':
+            depth -= 1
+            if depth == 1:
+                return
+
+
+def _uses_payload(rule):
+    # Rules that may look at the rest of the payload can only be run once the
+    # whole payload has been parsed.
+    if isinstance(rule, Function):
+        return True
+    if isinstance(rule, Array) and rule.of is not None:
+        return _uses_payload(rule.of)
+    return False
+
+
+def validate_bytes(validator, data, required=None, strict=None,
+                   fail_fast=None):
+    '''
+    Validates a raw JSON payload like
+    :meth:`incoming.PayloadValidator.validate`, but validates the keys of the
+    payload as they are parsed. Payloads larger than
+    :attr:`incoming.PayloadValidator.max_payload_size` are rejected without
+    being parsed, and parsing stops as soon as
+    :attr:`incoming.PayloadValidator.max_keys` or
+    :attr:`incoming.PayloadValidator.max_depth` is exceeded, as soon as
+    :attr:`incoming.PayloadValidator.max_errors` keys have failed validation
+    or, in ``fail_fast`` mode, as soon as a key fails validation.
+
+    Rules of :class:`incoming.datatypes.Function` fields, which may depend on
+    other keys of the payload, are run once the whole payload is parsed.
+
+    Use :meth:`incoming.PayloadValidator.validate_bytes` instead of calling
+    this directly.
+
+    :returns: a tuple of three items, ``is_valid`` and ``errors`` as returned
+              by :meth:`incoming.PayloadValidator.validate` and the decoded
+              payload, which is ``None`` if parsing stopped early.
+    '''
+
+    options = (required, strict, fail_fast)
+    required = required if required is not None else validator.required
+    strict = strict if strict is not None else validator.strict
+    fail_fast = fail_fast if fail_fast is not None else validator.fail_fast
+
+    max_size = validator.max_payload_size
+    if max_size is not None and len(data) > max_size:
+        return _rejected(validator, 'size_error')
+
+    max_keys = validator.max_keys
+    max_depth = validator.max_depth
+    max_errors = validator.max_errors
+    if (not fail_fast and max_keys is None and max_depth is None and
+            max_errors is None):
+        # Every key is parsed in any case, which the decoder does faster on
+        # its own.
+        decoder = validator.decoder or decoders.default
+        try:
+            payload = decoder.loads(data)
+        except RuntimeError:
+            return _rejected(validator, 'depth_error')
+        except ValueError:
+            return _rejected(validator, 'decode_error')
+        if not isinstance(payload, dict):
+            return _rejected(validator, 'decode_error')
+
+        is_valid, errors = validator.validate(payload, *options)
+        return is_valid, errors, payload
+
+    if not PY2 and not isinstance(data, str):
+        try:
+            data = bytes(data).decode('utf-8')
+        except UnicodeDecodeError:
+            return _rejected(validator, 'decode_error')
+
+    metrics = validator.metrics
+    start = default_timer()
+    try:
+        with _passing(*options):
+            result = _validate_members(validator, data, required, strict,
+                                       fail_fast)
+    except _Rejected as e:
+        return _rejected(validator, e.error)
+
+    # Like validate(), which records the payloads that are decoded in one go,
+    # payloads that are rejected before they are validated are not recorded.
+    if metrics is not None:
+        metrics.observe(validator.__class__.__name__,
+                        default_timer() - start, result[1])
+    return result
+
+
+class _Rejected(Exception):
+
+    # Raised by _validate_members for payloads that are rejected as a whole.
+    # ``error`` is the name of the attribute of the validator that holds the
+    # error message, like LimitExceeded.error.
+
+    def __init__(self, error):
+        super(_Rejected, self).__init__(error)
+        self.error = error
+
+
+def _validate_members(validator, text, required, strict, fail_fast):
+    # Validates the keys of the JSON object ``text`` as they are parsed.
+    # Errors are recorded like PayloadValidator._validate records them.
+    if validator._profiler is not None:
+        rules = validator._profiled_rules()
+        checks = {}
+    else:
+        rules = validator._rules
+        checks = validator._plan.checks
+    max_errors = validator.max_errors
+    max_extra = validator.max_extra_keys
+    compact = validator.compact_errors
+    payload = {}
+    errors = None
+    failures = 0
+    deferred = []
+    extra_count = 0
+
+    members = iter_object(text, validator.max_keys, validator.max_depth)
+    while True:
+        try:
+            key, value = next(members)
+        except StopIteration:
+            break
+        except LimitExceeded as e:
+            raise _Rejected(e.error)
+        except RuntimeError:
+            # Values nested too deeply for the decoder.
+            raise _Rejected('depth_error')
+        except ValueError:
+            raise _Rejected('decode_error')
+
+        if key in payload:
+            # The value validated earlier would silently be replaced.
+            raise _Rejected('duplicate_keys_error')
+        payload[key] = value
+
+        rule = rules.get(key)
+        if rule is None:
+            if not strict:
+                continue
+            extra_count += 1
+            if max_extra is not None and extra_count > max_extra:
+                continue
+            field_errors = [validator.strict_error]
+        else:
+            type_ = checks.get(key)
+            if type_ is not None:
+                if isinstance(value, type_):
+                    continue
+                field_errors = [rule.error]
+            elif _uses_payload(rule):
+                deferred.append(key)
+                continue
+            else:
+                field_errors = []
+                rule.test(key, value, payload=payload, errors=field_errors)
+                if not field_errors:
+                    continue
+
+        if fail_fast:
+            return validator._failed(key, field_errors) + (None, )
+        if failures == max_errors:
+            # Parsing stops as no more errors would be reported.
+            return validator._truncated(errors) + (None, )
+        if errors is None:
+            errors = CompactErrors() if compact else PayloadErrors()
+        errors._record(key, field_errors)
+        failures += 1
+
+    shape = validator._plan.shape(payload, required)
+    tests = [(key, payload[key]) for key in deferred]
+    tests.extend((field, None) for field in shape.optional)
+    tests.extend((field, _MISSING) for field in shape.missing)
+
+    for key, value in tests:
+        if value is _MISSING:
+            field_errors = [validator.required_error]
+        else:
+            field_errors = []
+            rules[key].test(key, value, payload=payload, errors=field_errors)
+            if not field_errors:
+                continue
+
+        if fail_fast:
+            return validator._failed(key, field_errors) + (payload, )
+        if failures == max_errors:
+            return validator._truncated(errors) + (payload, )
+        if errors is None:
+            errors = CompactErrors() if compact else PayloadErrors()
+        errors._record(key, field_errors)
+        failures += 1
+
+    if max_extra is not None and extra_count > max_extra:
+        if errors is None:
+            errors = CompactErrors() if compact else PayloadErrors()
+        errors._record(validator.payload_error_key, [
+            validator.max_extra_keys_error % (extra_count - max_extra)])
+
+    if errors is None:
+        return True, None, payload
+    if compact:
+        return False, errors, payload
+    return False, errors._errors, payload
+
+
+def _rejected(validator, error):
+    return validator._failed(validator.payload_error_key,
+                             [getattr(validator, error)]) + (None, )
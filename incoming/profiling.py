@@ -0,0 +1,149 @@
+'''
+    incoming.profiling
+    ~~~~~~~~~~~~~~~~~~
+
+    Per-field profiling of validation. See
+    :meth:`incoming.PayloadValidator.profile`.
+'''
+
+import copy
+import threading
+import timeit
+
+
+class FieldStats(object):
+
+    '''
+    Statistics of the rule of a field/key collected by a :class:`Profiler`.
+    Times are in seconds.
+    '''
+
+    __slots__ = ('validator', 'field', 'calls', 'failures', 'total', 'max')
+
+    def __init__(self, validator, field):
+        #: name of the validator class the field belongs to
+        self.validator = validator
+        #: name of the field/key
+        self.field = field
+        #: number of times the rule of the field was run
+        self.calls = 0
+        #: number of times the rule of the field failed
+        self.failures = 0
+        #: cumulative time spent running the rule
+        self.total = 0.0
+        #: longest time spent running the rule once
+        self.max = 0.0
+
+    @property
+    def mean(self):
+        '''Mean time spent running the rule once.'''
+
+        return self.total / self.calls if self.calls else 0.0
+
+    def to_dict(self):
+        return dict(validator=self.validator, field=self.field,
+                    calls=self.calls, failures=self.failures,
+                    total=self.total, mean=self.mean, max=self.max)
+
+
+class Profiler(object):
+
+    '''
+    Collects per-field call counts, failure counts and timings of the rules
+    run by validators. Time spent in :class:`incoming.datatypes.JSON` fields
+    includes the time spent validating the nested JSON.
+    '''
+
+    timer = staticmethod(timeit.default_timer)
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, validator_cls, rules):
+        '''
+        Returns copies of ``rules`` that record their statistics in this
+        profiler every time they are run.
+
+        :param validator_cls: the validator class the rules belong to.
+        :param dict rules: mapping of field names to rules.
+        '''
+
+        instrumented = {}
+        for field, rule in rules.items():
+            stats = self._get_stats(validator_cls.__name__, field)
+            instrumented[field] = self._instrument(rule, stats)
+        return instrumented
+
+    def _instrument(self, rule, stats):
+        test = rule.test
+        timer = self.timer
+        lock = self._lock
+
+        def timed_test(key, val, payload, errors):
+            start = timer()
+            try:
+                result = test(key, val, payload=payload, errors=errors)
+            except Exception:
+                result = False
+                raise
+            finally:
+                elapsed = timer() - start
+                with lock:
+                    stats.calls += 1
+                    stats.total += elapsed
+                    if elapsed > stats.max:
+                        stats.max = elapsed
+                    if not result:
+                        stats.failures += 1
+            return result
+
+        # The copy keeps the type and attributes of the rule; only its test
+        # is replaced.
+        rule = copy.copy(rule)
+        rule.test = timed_test
+        return rule
+
+    def _get_stats(self, validator, field):
+        with self._lock:
+            stats = self._stats.get((validator, field))
+            if stats is None:
+                stats = self._stats[(validator, field)] = FieldStats(
+                    validator, field)
+            return stats
+
+    def stats(self, sort_by='total'):
+        '''
+        :param str sort_by: attribute of :class:`FieldStats` to sort by, in
+                            descending order.
+
+        :returns: a list of :class:`FieldStats` of the rules that were run.
+        '''
+
+        with self._lock:
+            stats = [s for s in self._stats.values() if s.calls]
+        stats.sort(key=lambda s: getattr(s, sort_by), reverse=True)
+        return stats
+
+    def reset(self):
+        '''Discards all the statistics collected so far.'''
+
+        with self._lock:
+            for stats in self._stats.values():
+                stats.calls = stats.failures = 0
+                stats.total = stats.max = 0.0
+
+    def report(self, sort_by='total', limit=None):
+        '''
+        :returns str: a report of the statistics sorted by ``sort_by``, most
+                      expensive rules first.
+        '''
+
+        lines = ['%-40s %10s %10s %12s %12s %12s' % (
+            'field', 'calls', 'failures', 'total ms', 'mean us', 'max us')]
+        for stats in self.stats(sort_by)[:limit]:
+            lines.append('%-40s %10d %10d %12.3f %12.2f %12.2f' % (
+                '%s.%s' % (stats.validator, stats.field), stats.calls,
+                stats.failures, stats.total * 1e3, stats.mean * 1e6,
+                stats.max * 1e6))
+        return '\n'.join(lines)
@@ -0,0 +1,188 @@
+'''
+    incoming.stream
+    ~~~~~~~~~~~~~~~
+
+    Validation of newline-delimited JSON (NDJSON) streams.
+'''
+
+from collections import namedtuple
+
+from . import decoders
+
+#: Default number of bytes read from the stream at a time.
+CHUNK_SIZE = 1024 * 1024
+
+#: Default limit on the length of a single line, in bytes.
+MAX_LINE_SIZE = 16 * 1024 * 1024
+
+
+#: Result of validating a line of a NDJSON stream. ``line`` is the line number
+#: (starting from 1) and ``offset`` is the offset of the start of the line in
+#: the stream. ``is_valid`` and ``errors`` are the two items returned by
+#: :meth:`incoming.PayloadValidator.validate`.
+Result = namedtuple('Result', 'line offset is_valid errors')
+
+
+def iter_lines(fileobj, chunk_size=CHUNK_SIZE, max_line_size=MAX_LINE_SIZE):
+    '''
+    Splits a stream into lines by reading it in chunks of ``chunk_size``.
+    Lines longer than ``max_line_size`` are not buffered; ``None`` is
+    generated in their place.
+
+    :param fileobj: a file-like object opened in binary (or text) mode.
+
+    :returns: a generator of ``(offset, line)`` tuples, where ``offset`` is
+              the offset of the start of ``line`` in the stream. Lines do not
+              include the trailing newline.
+    '''
+
+    pos = 0
+    buf = None
+    newline = None
+    skipping = False
+
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+
+        if newline is None:
+            newline = b'\n' if isinstance(chunk, bytes) else '\n'
+
+        # offset of the start of the (buffered + new) data in the stream
+        base = pos - len(buf) if buf else pos
+        pos += len(chunk)
+        if buf:
+            chunk = buf + chunk
+
+        start = 0
+        while True:
+            end = chunk.find(newline, start)
+            if end == -1:
+                break
+
+            if skipping:
+                skipping = False
+            elif end - start > max_line_size:
+                yield base + start, None
+            else:
+                yield base + start, chunk[start:end]
+            start = end + 1
+
+        if skipping or len(chunk) - start > max_line_size:
+            if not skipping:
+                yield base + start, None
+                skipping = True
+            buf = None
+        else:
+            buf = chunk[start:]
+
+    if buf:
+        yield pos - len(buf), buf
+
+
+def validate_ndjson(fileobj, validator, required=None, strict=None,
+                    fail_fast=None, failures_only=False, max_failures=None,
+                    offset=0, chunk_size=CHUNK_SIZE,
+                    max_line_size=MAX_LINE_SIZE):
+    '''
+    Validates every line of a NDJSON stream. The stream is read in chunks of
+    ``chunk_size`` and results are generated lazily, so memory use is bounded
+    by ``chunk_size`` and ``max_line_size`` no matter how large the stream is.
+
+    Blank lines are skipped. Lines that are not JSON objects and lines longer
+    than ``max_line_size`` fail validation with errors reported under
+    :attr:`incoming.PayloadValidator.payload_error_key`.
+
+    :param fileobj: a file-like object. Open files in binary mode for offsets
+                    to be byte offsets.
+    :param validator: a sub-class of :class:`incoming.PayloadValidator` or an
+                      instance of it.
+    :param bool required: same as in
+                          :meth:`incoming.PayloadValidator.validate`.
+    :param bool strict: same as in :meth:`incoming.PayloadValidator.validate`.
+    :param bool fail_fast: same as in
+                           :meth:`incoming.PayloadValidator.validate`.
+    :param bool failures_only: if ``True``, results are generated only for
+                               lines that fail validation.
+    :param int max_failures: stop reading the stream once these many lines
+                             have failed validation.
+    :param int offset: offset to start reading the stream from. ``fileobj``
+                       must be seekable if this is not ``0``. Line numbers are
+                       counted from this offset.
+
+    :returns: a generator of :class:`Result` objects.
+    '''
+
+    if isinstance(validator, type):
+        validator = validator()
+
+    failures = 0
+    records = iter_records(fileobj, offset, chunk_size, max_line_size)
+
+    for line, start, data in records:
+        is_valid, errors = validate_line(validator, data, required=required,
+                                         strict=strict, fail_fast=fail_fast)
+
+        if not is_valid:
+            failures += 1
+        elif failures_only:
+            continue
+
+        yield Result(line, start, is_valid, errors)
+
+        if max_failures is not None and failures >= max_failures:
+            return
+
+
+def iter_records(fileobj, offset=0, chunk_size=CHUNK_SIZE,
+                 max_line_size=MAX_LINE_SIZE):
+    '''
+    Generates the non-blank lines of a NDJSON stream along with their line
+    numbers and offsets. See :func:`validate_ndjson` for the arguments.
+
+    :returns: a generator of ``(line, offset, data)`` tuples. ``data`` is
+              ``None`` for lines longer than ``max_line_size``.
+    '''
+
+    if offset:
+        fileobj.seek(offset)
+
+    line = 0
+    for start, data in iter_lines(fileobj, chunk_size, max_line_size):
+        line += 1
+        if data is None or data.strip():
+            yield line, offset + start, data
+
+
+def validate_line(validator, data, required=None, strict=None,
+                  fail_fast=None):
+    '''
+    Decodes and validates a single line of a NDJSON stream.
+
+    :param validator: an instance of a sub-class of
+                      :class:`incoming.PayloadValidator`.
+    :param data: the line as generated by :func:`iter_records`.
+
+    :returns: the two items returned by
+              :meth:`incoming.PayloadValidator.validate`.
+    '''
+
+    if data is None:
+        return False, {validator.payload_error_key: [validator.size_error]}
+
+    payload = _decode(data, validator.decoder or decoders.default)
+    if not isinstance(payload, dict):
+        return False, {validator.payload_error_key: [validator.decode_error]}
+
+    return validator.validate(payload, required=required, strict=strict,
+                              fail_fast=fail_fast)
+
+
+def _decode(data, decoder):
+    # Returns the decoded JSON value or None if data is not valid JSON.
+    try:
+        return decoder.loads(data)
+    except (ValueError, RuntimeError):
+        # RuntimeError is raised for values nested too deeply to decode.
+        return None
@@ -0,0 +1,202 @@
+'''
+    test_aio
+    ~~~~~~~~
+
+    Tests for incoming.aio module.
+'''
+
+import asyncio
+import time
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import CompactErrors, PayloadValidator
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class TestAsyncValidate(TestCase):
+
+    def setUp(self):
+        class CustomValidator(PayloadValidator):
+            class AddressValidator(PayloadValidator):
+                street = datatypes.String()
+                pincode = datatypes.Function('validate_pincode')
+
+                async def validate_pincode(self, val, *args, **kwargs):
+                    await asyncio.sleep(0.1)
+                    return isinstance(val, int)
+
+            name = datatypes.String()
+            username = datatypes.Function('validate_username')
+            email = datatypes.Function('validate_email')
+            age = datatypes.Function('validate_age')
+            address = datatypes.JSON(AddressValidator)
+
+            async def validate_username(self, val, *args, **kwargs):
+                await asyncio.sleep(0.1)
+                return val != 'taken'
+
+            async def validate_email(self, val, *args, **kwargs):
+                await asyncio.sleep(0.1)
+                if '@' not in val:
+                    kwargs['errors'].append('Missing @.')
+                    return False
+                return True
+
+            def validate_age(self, val, *args, **kwargs):
+                return isinstance(val, int)
+
+        self.CustomValidator = CustomValidator
+        self.payload = dict(name='Test', username='test',
+                            email='test@example.com', age=20,
+                            address=dict(street='Test street', pincode=123))
+
+    def test_avalidate_valid_payload(self):
+        start = time.time()
+        result, errors = run(self.CustomValidator().avalidate(self.payload))
+        self.assertTrue(result)
+        self.assertEqual(errors, None)
+
+        # checks run concurrently, including the nested ones
+        self.assertTrue(time.time() - start < 0.25)
+
+    def test_avalidate_invalid_payload(self):
+        payload = dict(self.payload, name=1, username='taken',
+                       email='test', address=dict(street='s', pincode='1'))
+        del payload['age']
+
+        result, errors = run(self.CustomValidator().avalidate(payload))
+        self.assertFalse(result)
+        self.assertDictEqual(errors, {
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'username': [datatypes.Function._DEFAULT_ERROR],
+            'email': [datatypes.Function._DEFAULT_ERROR, 'Missing @.'],
+            'age': [PayloadValidator.required_error],
+            'address': [datatypes.JSON._DEFAULT_ERROR,
+                        {'pincode': [datatypes.Function._DEFAULT_ERROR]}],
+        })
+
+    def test_avalidate_required_and_strict(self):
+        payload = dict(self.payload, extra=1)
+        del payload['age']
+
+        result, errors = run(self.CustomValidator().avalidate(
+            payload, required=False, strict=True))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['extra', 'age'])
+
+    def test_avalidate_fail_fast_cancels_pending_checks(self):
+        payload = dict(self.payload, username='taken')
+
+        start = time.time()
+        result, errors = run(self.CustomValidator().avalidate(
+            payload, fail_fast=True))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['username'])
+        self.assertTrue(time.time() - start < 0.25)
+
+        payload = dict(self.payload, name=1)
+        result, errors = run(self.CustomValidator().avalidate(
+            payload, fail_fast=True))
+        self.assertItemsEqual(errors.keys(), ['name'])
+
+    def test_avalidate_error_limits(self):
+        class LimitedValidator(self.CustomValidator):
+            strict = True
+            max_errors = 2
+            max_extra_keys = 1
+
+        key = LimitedValidator.payload_error_key
+        payload = dict(self.payload, name=1, username='taken', age='x',
+                       a=1, b=2)
+        start = time.time()
+        result, errors = run(LimitedValidator().avalidate(payload))
+        self.assertEqual(errors, {
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'a': [LimitedValidator.strict_error],
+            key: ['1 more unexpected fields were not reported.',
+                  'Too many errors. Validation stopped after 2 errors.'],
+        })
+        self.assertTrue(time.time() - start < 0.05)
+
+        # nothing is left out of payloads with max_errors errors
+        payload = dict(self.payload, name=1, username='taken')
+        result, errors = run(LimitedValidator().avalidate(payload))
+        self.assertEqual(errors, {
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'username': [datatypes.Function._DEFAULT_ERROR],
+        })
+
+        class ExtraKeysValidator(self.CustomValidator):
+            strict = True
+            max_extra_keys = 0
+
+        self.assertEqual(run(ExtraKeysValidator().avalidate(
+            dict(self.payload, a=1))), (False, {
+                key: ['1 more unexpected fields were not reported.']}))
+
+    def test_avalidate_runs_validate_of_rules(self):
+        calls = []
+
+        async def positive(val, *args, **kwargs):
+            calls.append(val)
+            await asyncio.sleep(0)
+            return val > 0
+
+        class Even(datatypes.Function):
+            def validate(self, val, *args, **kwargs):
+                return val % 2 == 0
+
+        class NumbersValidator(PayloadValidator):
+            count = datatypes.Function(positive, pure=True, cache_size=10)
+            even = Even(bool)
+            items = datatypes.Array(of=datatypes.Function(positive),
+                                    max_item_errors=2)
+
+        validator = NumbersValidator()
+        for i in range(2):
+            self.assertEqual(run(validator.avalidate(
+                dict(count=-1, even=3, items=[1, -1, 2, -2, -3]))), (False, {
+                    'count': [datatypes.Function._DEFAULT_ERROR],
+                    'even': [datatypes.Function._DEFAULT_ERROR],
+                    'items': [datatypes.Array._DEFAULT_ERROR, {
+                        1: [datatypes.Function._DEFAULT_ERROR],
+                        3: [datatypes.Function._DEFAULT_ERROR]}],
+                }))
+
+        # results of the pure function are memoized
+        self.assertEqual(calls.count(-1), 3)
+        self.assertEqual(NumbersValidator.count.cache_info()['hits'], 1)
+
+    def test_avalidate_returns_compact_errors(self):
+        class CompactValidator(self.CustomValidator):
+            compact_errors = True
+
+        payload = dict(self.payload, name=1,
+                       address=dict(street=1, pincode=1))
+        result, errors = run(CompactValidator().avalidate(payload))
+        self.assertTrue(isinstance(errors, CompactErrors))
+        self.assertEqual(errors.to_dict(), {
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'address': [datatypes.JSON._DEFAULT_ERROR,
+                        {'street': [datatypes.String._DEFAULT_ERROR]}],
+        })
+
+    def test_avalidate_passes_options_to_nested_validators(self):
+        payload = dict(self.payload,
+                       address=dict(street=1, pincode='1', extra=True))
+
+        result, errors = run(self.CustomValidator().avalidate(
+            payload, strict=True))
+        self.assertEqual(errors['address'][1], {
+            'street': [datatypes.String._DEFAULT_ERROR],
+            'pincode': [datatypes.Function._DEFAULT_ERROR],
+            'extra': [PayloadValidator.strict_error],
+        })
+
+        result, errors = run(self.CustomValidator().avalidate(
+            payload, fail_fast=True))
+        self.assertEqual(len(errors['address'][1]), 1)
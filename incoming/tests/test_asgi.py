@@ -0,0 +1,70 @@
+'''
+    test_asgi
+    ~~~~~~~~~
+
+    Tests for incoming.asgi module.
+'''
+
+import asyncio
+import json
+
+from . import TestCase
+from ..asgi import ASGIMiddleware
+from .test_middleware import PersonValidator
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+async def app(scope, receive, send):
+    message = await receive()
+    body = json.dumps([scope.get('incoming.payload'),
+                       message['body'].decode('utf-8')]).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': []})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class TestASGIMiddleware(TestCase):
+
+    def setUp(self):
+        self.app = ASGIMiddleware(app, {'/people': PersonValidator})
+
+    def request(self, chunks, method='POST', path='/people', headers=()):
+        scope = dict(type='http', method=method, path=path,
+                     headers=list(headers))
+        messages = [{'type': 'http.request', 'body': chunk,
+                     'more_body': i < len(chunks) - 1}
+                    for i, chunk in enumerate(chunks)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        run(self.app(scope, receive, send))
+        return sent[0]['status'], json.loads(sent[1]['body'].decode('utf-8'))
+
+    def test_valid_body_is_passed_on(self):
+        self.assertEqual(self.request([b'{"name": "Alice", ', b'"age": 30}']),
+                         (200, [dict(name='Alice', age=30),
+                                '{"name": "Alice", "age": 30}']))
+
+    def test_invalid_body_is_rejected(self):
+        status, errors = self.request([b'{"name": 1, "age": 30}'])
+        self.assertEqual(status, 400)
+        self.assertEqual(errors, dict(name=[PersonValidator.name.error]))
+
+    def test_large_body_is_rejected(self):
+        too_large = {'__payload__': [PersonValidator.size_error]}
+        self.assertEqual(self.request([], headers=[(b'content-length',
+                                                    b'65')]),
+                         (413, too_large))
+        self.assertEqual(self.request([b'x' * 40, b'x' * 40]),
+                         (413, too_large))
+
+    def test_other_routes_are_not_validated(self):
+        self.assertEqual(self.request([b'x'], path='/'), (200, [None, 'x']))
@@ -0,0 +1,73 @@
+'''
+    test_benchmarks
+    ~~~~~~~~~~~~~~~
+
+    Tests for incoming.benchmarks.suite and incoming.benchmarks.nested
+    modules.
+'''
+
+import io
+import json
+import os
+import tempfile
+
+from . import TestCase
+from ..benchmarks import nested, suite
+
+
+class TestBenchmarkSuite(TestCase):
+
+    def test_scenarios_validate_as_expected(self):
+        for scenario in suite.scenarios():
+            results = [scenario.validator.validate(payload, **scenario.options)
+                       for payload in scenario.payloads]
+            expected = scenario.name in ('strict_200_extra_keys',
+                                         'mostly_invalid')
+            self.assertEqual(any(not result for result, errors in results),
+                             expected)
+
+    def test_run_and_compare(self):
+        out = io.StringIO() if str is not bytes else io.BytesIO()
+        results = suite.run(['flat', 'deep_10'], number=10, samples=10,
+                            out=out)
+        self.assertItemsEqual(results['results'].keys(), ['flat', 'deep_10'])
+        for result in results['results'].values():
+            self.assertItemsEqual(result.keys(), ['ops_per_sec', 'p50_us',
+                                                  'p99_us', 'alloc_bytes'])
+
+        suite.compare(results, results, out=out)
+        self.assertTrue('1.00x' in out.getvalue())
+
+    def test_main_saves_results(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            suite.main(['flat', '-n', '10', '-s', '10', '-o', path])
+            with open(path) as f:
+                self.assertItemsEqual(json.load(f)['results'].keys(),
+                                      ['flat'])
+        finally:
+            os.remove(path)
+
+
+class TestNestedBenchmark(TestCase):
+
+    def test_fresh_json_creates_a_validator_for_every_value(self):
+        validator = nested.wide_validator(nested.FreshJSON, 3)
+        created = []
+        item_validator = validator._plan.rules['items'].of.cls
+        original_init = item_validator.__init__
+
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            original_init(self, *args, **kwargs)
+
+        item_validator.__init__ = __init__
+        try:
+            self.assertEqual(validator().validate(nested.wide_payload(3)),
+                             (True, None))
+        finally:
+            del item_validator.__init__
+
+        # three nested fields and three items of the array
+        self.assertEqual(len(created), 6)
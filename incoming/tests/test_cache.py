@@ -0,0 +1,170 @@
+'''
+    test_cache
+    ~~~~~~~~~~
+
+    Tests for incoming.cache module and caching of validation results.
+'''
+
+import json
+import time
+
+from . import TestCase
+from .. import datatypes
+from ..cache import LRUCache
+from ..incoming import _payload_key
+from ..incoming import PayloadValidator
+
+
+class TestLRUCache(TestCase):
+
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        self.assertTrue(cache.get('a') is LRUCache.MISSING)
+
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        # 'b' is the least recently used
+        cache.put('c', 3)
+        self.assertTrue(cache.get('b') is LRUCache.MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+        self.assertEqual(cache.info(), dict(hits=3, misses=2, evictions=1,
+                                            size=2, maxsize=2))
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.info()['hits'], 0)
+
+    def test_ttl(self):
+        cache = LRUCache(2, ttl=0.05)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.06)
+        self.assertTrue(cache.get('a') is LRUCache.MISSING)
+        self.assertEqual(len(cache), 0)
+
+    def test_maxsize_must_be_positive(self):
+        self.assertRaises(ValueError, LRUCache, 0)
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self):
+        calls = self.calls = []
+
+        def validate_sku(val, *args, **kwargs):
+            calls.append(val)
+            return isinstance(val, str) and val.startswith('sku-')
+
+        class ItemValidator(PayloadValidator):
+            sku = datatypes.Function(validate_sku, pure=True)
+
+        class OrderValidator(PayloadValidator):
+            cache_size = 2
+            id = datatypes.Integer()
+            item = datatypes.JSON(ItemValidator)
+
+        self.OrderValidator = OrderValidator
+
+    def test_caching_is_off_by_default(self):
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+
+        self.assertTrue(CustomValidator.cache_info() is None)
+        CustomValidator.cache_clear()
+
+    def test_fields_named_like_cache_options(self):
+        class StockValidator(PayloadValidator):
+            cache_size = datatypes.Integer()
+            cache_ttl = datatypes.Number()
+
+        self.assertTrue(StockValidator.cache_info() is None)
+        self.assertEqual(StockValidator().validate(
+            dict(cache_size=1, cache_ttl='1')), (False, {
+                'cache_ttl': [datatypes.Number._DEFAULT_ERROR]}))
+
+        class CachedStockValidator(self.OrderValidator):
+            cache_size = datatypes.Integer(required=False)
+
+        self.assertEqual(CachedStockValidator.cache_info()['maxsize'], 2)
+
+    def test_results_are_cached(self):
+        validator = self.OrderValidator()
+        payload = dict(id=1, item=dict(sku='sku-1'))
+
+        self.assertEqual(validator.validate(payload), (True, None))
+        self.assertEqual(self.OrderValidator().validate(
+            dict(item=dict(sku='sku-1'), id=1)), (True, None))
+        self.assertEqual(self.calls, ['sku-1'])
+
+        info = self.OrderValidator.cache_info()
+        self.assertEqual((info['hits'], info['misses']), (1, 1))
+
+        # options are part of the key
+        validator.validate(payload, strict=True)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_cached_errors_are_copied(self):
+        validator = self.OrderValidator()
+        payload = dict(id='1', item=dict(sku='1'))
+
+        result, errors = validator.validate(payload)
+        self.assertFalse(result)
+        errors['id'].append('Changed.')
+
+        result, errors = validator.validate(payload)
+        self.assertEqual(errors['id'], [datatypes.Integer._DEFAULT_ERROR])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_unserializable_payloads_are_not_cached(self):
+        validator = self.OrderValidator()
+        payload = dict(id=1, item=dict(sku='sku-1'), extra=object())
+
+        validator.validate(payload)
+        validator.validate(payload)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.OrderValidator.cache_info()['size'], 0)
+
+    def test_payloads_that_serialize_alike_are_told_apart(self):
+        class TagsValidator(PayloadValidator):
+            cache_size = 10
+            tags = datatypes.Array()
+
+        validator = TagsValidator()
+        self.assertEqual(validator.validate(dict(tags=[1, 2])), (True, None))
+        self.assertFalse(validator.validate(dict(tags=(1, 2)))[0])
+
+        self.assertEqual(len(_payload_key({'1': 'x'})), 32)
+        self.assertEqual(_payload_key({1: 'x'}), None)
+        self.assertEqual(_payload_key({'1': (1, 2)}), None)
+        self.assertNotEqual(_payload_key({'1': 1}), _payload_key({'1': True}))
+
+    def test_payloads_with_lone_surrogates_are_not_cached(self):
+        validator = self.OrderValidator()
+        payload = json.loads('{"id": 1, "item": {"sku": "sku-\\ud800"}}')
+
+        self.assertEqual(validator.validate(payload), (True, None))
+        self.assertEqual(self.OrderValidator.cache_info()['size'], 0)
+
+    def test_caching_refuses_impure_functions(self):
+        def define_validator():
+            class CustomValidator(PayloadValidator):
+                cache_size = 10
+                name = datatypes.Function(lambda val, **kwargs: True)
+
+        def define_nested_validator():
+            class InnerValidator(PayloadValidator):
+                name = datatypes.Function('validate_name')
+
+                def validate_name(self, val, *args, **kwargs):
+                    return True
+
+            class CustomValidator(PayloadValidator):
+                cache_size = 10
+                inner = datatypes.JSON(InnerValidator)
+
+        self.assertRaises(TypeError, define_validator)
+        self.assertRaises(TypeError, define_nested_validator)
@@ -0,0 +1,174 @@
+'''
+    test_cli
+    ~~~~~~~~
+
+    Tests for incoming.cli module.
+'''
+
+import io
+import json
+import os
+import shlex
+import shutil
+import tempfile
+
+from . import TestCase
+from .. import datatypes
+from ..cli import _parser, load_validator, main, resume_command, run, Stats
+from ..incoming import PayloadValidator
+
+
+class EventValidator(PayloadValidator):
+    id = datatypes.Integer()
+    type = datatypes.String()
+
+
+VALIDATOR = 'incoming.tests.test_cli:EventValidator'
+
+LINES = [
+    b'{"id": 1, "type": "click"}\n',
+    b'{"id": "2", "type": "click"}\n',
+    b'\n',
+    b'{"id": 3}\n',
+    b'not json\n',
+]
+
+
+class TestCLI(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.ndjson = self.path('events.ndjson', b''.join(LINES))
+        self.json = self.path('events.json', json.dumps([
+            dict(id=1, type='click'), dict(id=2)]).encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def failures(self, out):
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_load_validator(self):
+        self.assertTrue(load_validator(VALIDATOR) is EventValidator)
+        for spec in ('incoming.tests.test_cli', 'incoming.nothing:Validator',
+                     'incoming.tests.test_cli:Nothing',
+                     'incoming.tests.test_cli:Stats'):
+            self.assertRaises(ValueError, load_validator, spec)
+
+    def test_run_reports_failures_and_stats(self):
+        out = io.StringIO()
+        stats = Stats()
+        self.assertEqual(run(EventValidator, [self.ndjson, self.json], out,
+                             stats=stats), None)
+
+        failures = self.failures(out)
+        self.assertEqual([(f['file'], f.get('line'), f.get('offset'),
+                           f.get('index')) for f in failures],
+                         [(self.ndjson, 2, 27, None),
+                          (self.ndjson, 4, 57, None),
+                          (self.ndjson, 5, 67, None),
+                          (self.json, None, None, 1)])
+        self.assertEqual(failures[0]['errors'],
+                         dict(id=[EventValidator.id.error]))
+
+        self.assertEqual((stats.records, stats.failures), (6, 4))
+        self.assertEqual(stats.top_fields(2),
+                         [('type', 2), ('__payload__', 1)])
+        self.assertTrue('records/sec' in stats.report())
+
+    def test_run_encodes_compact_errors(self):
+        class CompactValidator(EventValidator):
+            compact_errors = True
+
+        class NestedValidator(PayloadValidator):
+            event = datatypes.JSON(CompactValidator)
+
+        nested = self.path('nested.ndjson', b'{"event": {"id": "1"}}\n')
+        for validator, path in ((CompactValidator, self.ndjson),
+                                (NestedValidator, nested)):
+            out = io.StringIO()
+            run(validator, [path], out)
+            self.assertTrue(self.failures(out))
+
+        self.assertEqual(self.failures(out)[0]['errors'], {'event': [
+            datatypes.JSON._DEFAULT_ERROR,
+            {'id': [EventValidator.id.error],
+             'type': [EventValidator.required_error]}]})
+
+    def test_run_with_field_named_decoder(self):
+        class UploadValidator(PayloadValidator):
+            decoder = datatypes.String()
+
+        out = io.StringIO()
+        path = self.path('uploads.json', b'[{"decoder": "json"}, {}]')
+        run(UploadValidator, [path], out)
+        self.assertEqual([f['index'] for f in self.failures(out)], [1])
+
+    def test_run_resumes_from_offset(self):
+        out = io.StringIO()
+        stats = Stats()
+        run(EventValidator, [self.ndjson], out, offset=57, stats=stats)
+        self.assertEqual([f['offset'] for f in self.failures(out)], [57, 67])
+        self.assertEqual(stats.records, 2)
+
+    def test_run_with_workers(self):
+        out = io.StringIO()
+        run(EventValidator, [self.ndjson, self.json], out, workers=2)
+        self.assertEqual(len(self.failures(out)), 4)
+
+    def test_main(self):
+        output = os.path.join(self.dir, 'failures.ndjson')
+        self.assertEqual(main([VALIDATOR, self.json, '-o', output]), 1)
+        with open(output) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        # resuming appends to the output
+        self.assertEqual(main([VALIDATOR, self.ndjson, '-o', output,
+                               '--offset', '67']), 1)
+        with open(output) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        valid = self.path('valid.ndjson', LINES[0])
+        self.assertEqual(main([VALIDATOR, valid, '-o', output]), 0)
+        self.assertEqual(main([VALIDATOR, self.json, '--offset', '1']), 2)
+
+    def test_resume_command_replays_options(self):
+        files = [self.ndjson, os.path.join(self.dir, 'more events.ndjson')]
+        output = os.path.join(self.dir, 'failures.ndjson')
+        args = _parser().parse_args([
+            VALIDATOR, self.json] + files + ['-o', output, '-w', '4',
+                                             '--strict', '--fail-fast',
+                                             '--max-failures', '5'])
+
+        command = resume_command(args, 1, 57)
+        argv = shlex.split(command)
+        self.assertEqual(argv[:3], ['python', '-m', 'incoming'])
+        resumed = _parser().parse_args(argv[3:])
+        self.assertEqual(resumed.files, files)
+        self.assertEqual(resumed.offset, 57)
+        self.assertTrue(resumed.append)
+        self.assertEqual(
+            (resumed.output, resumed.workers, resumed.strict,
+             resumed.fail_fast, resumed.max_failures, resumed.top),
+            (output, 4, True, True, 5, 10))
+
+        # failures written to the output before resuming from the start of
+        # a later file are kept too
+        resumed = _parser().parse_args(shlex.split(
+            resume_command(args, 2, 0))[3:])
+        self.assertEqual((resumed.files, resumed.offset, resumed.append),
+                         (files[1:], 0, True))
+
+    def test_main_appends(self):
+        output = os.path.join(self.dir, 'failures.ndjson')
+        self.assertEqual(main([VALIDATOR, self.json, '-o', output]), 1)
+        self.assertEqual(main([VALIDATOR, self.json, '-o', output,
+                               '--append']), 1)
+        with open(output) as f:
+            self.assertEqual(len(f.readlines()), 2)
@@ -0,0 +1,109 @@
+'''
+    test_columnar
+    ~~~~~~~~~~~~~
+
+    Tests for incoming.columnar module.
+'''
+
+import subprocess
+import sys
+import unittest
+
+from . import TestCase
+from .. import datatypes
+from ..columnar import numpy
+from ..incoming import PayloadValidator
+
+
+class DummyValidator(PayloadValidator):
+    id = datatypes.Integer()
+    name = datatypes.String()
+    score = datatypes.Number(required=False)
+    active = datatypes.Boolean(required=False)
+    age = datatypes.Function(
+        lambda val, *args, **kwargs: val is None or val >= 18,
+        required=False)
+
+
+def transpose(columns):
+    size = len(next(iter(columns.values())))
+    return [dict((field, column[row]) for field, column in columns.items())
+            for row in range(size)]
+
+
+class TestValidateColumns(TestCase):
+
+    def setUp(self):
+        self.validator = DummyValidator()
+
+    def test_validate_columns_matches_validate(self):
+        columns = dict(id=[1, 2, '3', 4], name=['a', None, 'c', 'd'],
+                       score=[1, 2.5, 'x', True], age=[20, 10, 30, None],
+                       extra=[0, 0, 0, 0])
+        for strict in (False, True):
+            mask, errors = self.validator.validate_columns(columns,
+                                                           strict=strict)
+            expected = [self.validator.validate(payload, strict=strict)
+                        for payload in transpose(columns)]
+            self.assertEqual(mask, [result for result, _ in expected])
+            self.assertEqual(errors, dict(
+                (row, row_errors)
+                for row, (result, row_errors) in enumerate(expected)
+                if not result))
+
+    def test_missing_columns(self):
+        mask, errors = self.validator.validate_columns(dict(id=[1, 2]))
+        self.assertEqual(mask, [False, False])
+        self.assertEqual(errors[1], dict(name=[DummyValidator.required_error]))
+
+        mask, errors = self.validator.validate_columns(dict(id=[1, 2]),
+                                                       required=False)
+        self.assertEqual(mask, [True, True])
+
+    def test_rules_look_up_rows_lazily(self):
+        payloads = []
+
+        class RowValidator(PayloadValidator):
+            id = datatypes.Integer()
+            total = datatypes.Function(
+                lambda val, payload, **kwargs: (
+                    payloads.append(payload) or val == payload['id'] * 2))
+
+        columns = dict(id=[1, 2, 3], total=[2, 5, 6], extra=['a', 'b', 'c'])
+        mask, errors = RowValidator().validate_columns(columns)
+        self.assertEqual(mask, [True, False, True])
+
+        # only the columns looked up by rules are converted to lists and no
+        # record is built
+        self.assertEqual(list(payloads[0]._rows.values), ['id'])
+        self.assertFalse(isinstance(payloads[1], dict))
+        self.assertEqual(dict(payloads[1]), dict(id=2, total=5, extra='b'))
+        self.assertEqual(payloads[2].get('missing', 0), 0)
+
+    def test_columns_must_have_equal_lengths(self):
+        self.assertRaises(ValueError, self.validator.validate_columns,
+                          dict(id=[1, 2], name=['a']))
+        self.assertEqual(self.validator.validate_columns({}), ([], {}))
+
+    def test_columnar_is_imported_on_first_use(self):
+        # NumPy takes long to import, so importing incoming does not.
+        code = ('import sys, incoming; '
+                'print("incoming.columnar" in sys.modules, '
+                '"numpy" in sys.modules)')
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(output.split(), [b'False', b'False'])
+
+    @unittest.skipIf(numpy is None, 'requires numpy')
+    def test_numpy_columns(self):
+        columns = dict(id=numpy.arange(3), name=numpy.array(['a', 'b', 'c']),
+                       score=numpy.array([1.5, 2, 3]),
+                       active=numpy.array([1, 0, 1]))
+        mask, errors = self.validator.validate_columns(columns)
+        self.assertEqual(mask.tolist(), [False, False, False])
+        self.assertEqual(errors[0], dict(active=[DummyValidator.active.error]))
+
+        columns['active'] = numpy.array([True, False, True])
+        columns['id'] = numpy.array([1, 'x', 3], dtype=object)
+        mask, errors = self.validator.validate_columns(columns)
+        self.assertEqual(mask.tolist(), [True, False, True])
+        self.assertEqual(list(errors), [1])
@@ -22,6 +22,15 @@ class TestTypes(TestCase):
 
         self.assertRaises(NotImplementedError, SomeType().validate, 'test')
 
+    def test_cost(self):
+        self.assertEqual(datatypes.String().cost, 1)
+        self.assertEqual(datatypes.String(cost=5).cost, 5)
+        self.assertEqual(datatypes.Array().cost, 1)
+        self.assertEqual(datatypes.Array(of=datatypes.Integer).cost, 2)
+        self.assertEqual(datatypes.JSON('Nested').cost, 10)
+        self.assertEqual(datatypes.Function(bool).cost, 100)
+        self.assertEqual(datatypes.Function(bool, cost=0).cost, 0)
+
 
 class TestInteger(TestCase):
 
@@ -65,6 +74,135 @@ class TestArray(TestCase):
         self.assertTrue(datatypes.Array.validate(['item1', 'item2']))
         self.assertFalse(datatypes.Array.validate({}))
 
+    def test_array_validates_items(self):
+        array = datatypes.Array(of=datatypes.Integer())
+
+        errors = PayloadErrors()
+        self.assertTrue(array.test('key', [1, 2, 3], payload=None,
+                                   errors=errors['key']))
+        self.assertTrue(array.test('key', [], payload=None,
+                                   errors=errors['key']))
+        self.assertFalse(errors.has_errors())
+
+        self.assertFalse(array.test('key', [1, '2', 3, 4.0], payload=None,
+                                    errors=errors['key']))
+        self.assertEqual(errors.to_dict(), {'key': [
+            datatypes.Array._DEFAULT_ERROR,
+            {1: [datatypes.Integer._DEFAULT_ERROR],
+             3: [datatypes.Integer._DEFAULT_ERROR]},
+        ]})
+
+    def test_array_takes_required_and_error_positionally(self):
+        array = datatypes.Array(False, 'Expected a list.')
+        self.assertEqual((array.required, array.error),
+                         (False, 'Expected a list.'))
+        self.assertEqual((array.of, array.min_items, array.max_items),
+                         (None, None, None))
+        self.assertTrue(array.test('key', [], payload=None, errors=[]))
+
+    def test_array_sub_classes_run_their_validate(self):
+        class NonEmpty(datatypes.Array):
+            def validate(self, val, *args, **kwargs):
+                return isinstance(val, list) and len(val) > 0
+
+        class TagsValidator(PayloadValidator):
+            tags = NonEmpty()
+
+        self.assertFalse(NonEmpty()._type_only())
+        self.assertEqual(TagsValidator().validate(dict(tags=[])),
+                         (False, {'tags': [datatypes.Array._DEFAULT_ERROR]}))
+        self.assertEqual(TagsValidator().validate(dict(tags=['x'])),
+                         (True, None))
+
+    def test_array_of_json_sub_class_runs_its_validate(self):
+        calls = []
+
+        class LoggingJSON(datatypes.JSON):
+            def validate(self, val, *args, **kwargs):
+                calls.append(val)
+                return super(LoggingJSON, self).validate(val, *args, **kwargs)
+
+        class ItemValidator(PayloadValidator):
+            sku = datatypes.String()
+
+        array = datatypes.Array(of=LoggingJSON(ItemValidator))
+        errors = []
+        self.assertFalse(array.test('key', [dict(sku='a'), dict(sku=1)],
+                                    payload=None, errors=errors))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(errors, [datatypes.Array._DEFAULT_ERROR, {
+            1: [datatypes.JSON._DEFAULT_ERROR,
+                {'sku': [datatypes.String._DEFAULT_ERROR]}]}])
+
+    def test_array_accepts_datatype_classes(self):
+        array = datatypes.Array(of=datatypes.String)
+        self.assertTrue(isinstance(array.of, datatypes.String))
+        self.assertRaises(TypeError, datatypes.Array, of=str)
+
+    def test_array_validates_items_with_function(self):
+        array = datatypes.Array(of=datatypes.Function(
+            lambda val, *args, **kwargs: val > 0))
+
+        errors = PayloadErrors()
+        self.assertTrue(array.test('key', [1, 2], payload=None,
+                                   errors=errors['key']))
+        self.assertFalse(array.test('key', [1, 0, -1], payload=None,
+                                    errors=errors['key']))
+        self.assertEqual(errors.to_dict()['key'][1], {
+            1: [datatypes.Function._DEFAULT_ERROR],
+            2: [datatypes.Function._DEFAULT_ERROR],
+        })
+
+    def test_array_validates_number_of_items(self):
+        array = datatypes.Array(min_items=1, max_items=2)
+
+        errors = PayloadErrors()
+        self.assertTrue(array.test('key', [1, 2], payload=None,
+                                   errors=errors['key']))
+        self.assertFalse(array.test('key', [], payload=None,
+                                    errors=errors['key']))
+        self.assertEqual(errors.to_dict()['key'],
+                         [array.error, array.min_items_error % 1])
+
+        errors = PayloadErrors()
+        self.assertFalse(array.test('key', [1, 2, 3], payload=None,
+                                    errors=errors['key']))
+        self.assertEqual(errors.to_dict()['key'],
+                         [array.error, array.max_items_error % 2])
+
+    def test_array_caps_item_errors(self):
+        array = datatypes.Array(of=datatypes.String(), max_item_errors=3)
+
+        errors = PayloadErrors()
+        self.assertFalse(array.test('key', list(range(100)), payload=None,
+                                    errors=errors['key']))
+        self.assertItemsEqual(errors.to_dict()['key'][1].keys(), [0, 1, 2])
+
+    def test_array_of_json_reuses_validator(self):
+        instances = []
+
+        class ItemValidator(PayloadValidator):
+            sku = datatypes.String()
+
+            def __init__(self, *args, **kwargs):
+                super(ItemValidator, self).__init__(*args, **kwargs)
+                instances.append(self)
+
+        class OrderValidator(PayloadValidator):
+            items = datatypes.Array(of=datatypes.JSON('Item'))
+            Item = ItemValidator
+
+        result, errors = OrderValidator().validate(dict(items=[
+            dict(sku='a'), dict(sku=1), 'b', dict(sku='c')]))
+        self.assertFalse(result)
+        self.assertEqual(errors, {'items': [
+            datatypes.Array._DEFAULT_ERROR,
+            {1: [datatypes.JSON._DEFAULT_ERROR,
+                 {'sku': [datatypes.String._DEFAULT_ERROR]}],
+             2: [datatypes.JSON._DEFAULT_ERROR]},
+        ]})
+        self.assertEqual(len(instances), 1)
+
 
 class TestBoolean(TestCase):
 
@@ -123,6 +261,77 @@ class TestFunction(TestCase):
             func=PseudoNameSpace().test_func_regular).validate(18))
 
 
+class TestFunctionMemoization(TestCase):
+
+    def setUp(self):
+        calls = self.calls = []
+
+        def validate_code(val, *args, **kwargs):
+            calls.append(val)
+            if val not in ('IN', 'US'):
+                kwargs['errors'].append('Unknown country %r.' % (val,))
+                return False
+            return True
+
+        self.validate_code = validate_code
+
+    def test_pure_functions_are_memoized(self):
+        function = datatypes.Function(self.validate_code, pure=True,
+                                      cache_size=2)
+
+        for val in ('IN', 'IN', 'XX', 'XX', 'US'):
+            errors = PayloadErrors()
+            result = function.test('country', val, payload=None,
+                                   errors=errors['country'])
+            self.assertEqual(result, val != 'XX')
+            if val == 'XX':
+                self.assertEqual(errors.to_dict(), {'country': [
+                    datatypes.Function._DEFAULT_ERROR,
+                    "Unknown country 'XX'.",
+                ]})
+
+        self.assertEqual(self.calls, ['IN', 'XX', 'US'])
+        self.assertEqual(function.cache_info(), dict(
+            hits=2, misses=3, evictions=1, size=2, maxsize=2))
+
+    def test_memoization_tells_types_apart(self):
+        function = datatypes.Function(
+            lambda val, *args, **kwargs: isinstance(val, int),
+            pure=True, cache_size=10)
+
+        self.assertTrue(function.validate(1, errors=[]))
+        self.assertFalse(function.validate(1.0, errors=[]))
+
+    def test_unhashable_values_are_not_memoized(self):
+        function = datatypes.Function(self.validate_code, pure=True,
+                                      cache_size=10)
+
+        self.assertFalse(function.validate(['IN'], errors=[]))
+        self.assertFalse(function.validate(['IN'], errors=[]))
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(function.cache_info()['size'], 0)
+
+    def test_memoization_is_off_by_default(self):
+        function = datatypes.Function(self.validate_code, pure=True)
+        self.assertTrue(function.cache_info() is None)
+
+    def test_only_pure_functions_can_be_memoized(self):
+        self.assertRaises(ValueError, datatypes.Function, self.validate_code,
+                          cache_size=10)
+
+    def test_memoized_method_is_shared_by_instances(self):
+        class CustomValidator(PayloadValidator):
+            country = datatypes.Function('validate_country', pure=True,
+                                         cache_size=10)
+
+            def validate_country(self, val, *args, **kwargs):
+                return val in ('IN', 'US')
+
+        CustomValidator().validate(dict(country='IN'))
+        CustomValidator().validate(dict(country='IN'))
+        self.assertEqual(CustomValidator.country.cache_info()['hits'], 1)
+
+
 class TestJSON(TestCase):
 
     def test_json_nested_json(self):
@@ -206,3 +415,62 @@ class TestJSON(TestCase):
         self.assertFalse(result)
         self.assertTrue('nested' in errors)
         self.assertTrue(len(errors.to_dict().keys()) == 1)
+
+    def test_json_reuses_nested_validator(self):
+        instances = []
+
+        class InnerValidator(PayloadValidator):
+            foo = datatypes.String()
+
+            def __init__(self, *args, **kwargs):
+                super(InnerValidator, self).__init__(*args, **kwargs)
+                instances.append(self)
+
+        class OuterValidator(PayloadValidator):
+            inner = datatypes.JSON(InnerValidator)
+            other = datatypes.JSON('Inner')
+            Inner = InnerValidator
+
+        for validator in (OuterValidator(), OuterValidator()):
+            for _ in range(3):
+                result, errors = validator.validate(
+                    dict(inner=dict(foo='bar'), other=dict(foo='bar')))
+                self.assertTrue(result)
+
+        self.assertEqual(len(instances), 2)
+        self.assertTrue(OuterValidator.inner.validator is instances[0] or
+                        OuterValidator.inner.validator is instances[1])
+
+    def test_json_runs_nested_validator_with_passed_options(self):
+        class InnerValidator(PayloadValidator):
+            foo = datatypes.String()
+            bar = datatypes.Integer()
+
+        class OuterValidator(PayloadValidator):
+            inner = datatypes.JSON(InnerValidator)
+            items = datatypes.Array(of=datatypes.JSON(InnerValidator))
+
+        inner = dict(foo=1, bar='1', baz=True)
+        validator = OuterValidator()
+
+        errors = validator.validate(dict(inner=inner, items=[]),
+                                    fail_fast=True)[1]
+        self.assertEqual(errors['inner'][1],
+                         InnerValidator().validate(inner, fail_fast=True)[1])
+        self.assertEqual(len(errors['inner'][1]), 1)
+
+        errors = validator.validate(dict(inner=inner, items=[inner]),
+                                    strict=True)[1]
+        self.assertEqual(errors['inner'][1]['baz'],
+                         [InnerValidator.strict_error])
+        self.assertEqual(errors['items'][1][0][1]['baz'],
+                         [InnerValidator.strict_error])
+
+        self.assertTrue(validator.validate(dict(inner={}, items=[{}]),
+                                           required=False)[0])
+
+        # options that are not passed are left to the nested validator
+        errors = validator.validate(dict(inner=inner, items=[]),
+                                    strict=False)[1]
+        self.assertEqual(sorted(errors['inner'][1]), ['bar', 'foo'])
+        self.assertFalse(validator.validate(dict(inner={}, items=[]))[0])
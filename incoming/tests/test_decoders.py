@@ -0,0 +1,77 @@
+'''
+    test_decoders
+    ~~~~~~~~~~~~~
+
+    Tests for incoming.decoders module.
+'''
+
+import io
+
+from . import TestCase
+from .. import datatypes, decoders
+from ..incoming import PayloadValidator
+from ..stream import validate_ndjson
+
+
+class TestDecoders(TestCase):
+
+    def test_decoders_accept_bytes_memoryview_and_str(self):
+        data = u'{"name": "caf\xe9", "tags": [1, 2.5, null]}'
+        expected = dict(name=u'caf\xe9', tags=[1, 2.5, None])
+        for name in decoders.DECODERS:
+            decoder = decoders.get_decoder(name)
+            encoded = data.encode('utf-8')
+            for value in (data, encoded, bytearray(encoded),
+                          memoryview(encoded)):
+                self.assertEqual(decoder.loads(value), expected)
+            self.assertRaises(ValueError, decoder.loads, b'{"name": ')
+            self.assertRaises(ValueError, decoder.loads, b'\xff')
+
+    def test_decoders_reject_non_finite_numbers(self):
+        for name in decoders.DECODERS:
+            decoder = decoders.get_decoder(name)
+            for data in (b'NaN', b'[Infinity]', b'{"a": -Infinity}',
+                         b'1e400', b'[-1e400]'):
+                self.assertRaises(ValueError, decoder.loads, data)
+            self.assertEqual(decoder.loads(b'[1e300, 1e-400]'), [1e300, 0.0])
+
+    def test_get_decoder(self):
+        self.assertTrue(isinstance(decoders.get_decoder('json'),
+                                   decoders.StdlibDecoder))
+        self.assertEqual(decoders.default.name,
+                         'orjson' if decoders.orjson else 'json')
+        self.assertRaises(ValueError, decoders.get_decoder, 'unknown')
+
+    def test_validators_use_their_decoder(self):
+        class RecordingDecoder(decoders.StdlibDecoder):
+            def __init__(self):
+                self.calls = 0
+
+            def loads(self, data):
+                self.calls += 1
+                return super(RecordingDecoder, self).loads(data)
+
+        class DummyValidator(PayloadValidator):
+            decoder = RecordingDecoder()
+
+            name = datatypes.String()
+
+        validator = DummyValidator()
+        self.assertEqual(validator.validate_bytes(b'{"name": "x"}'),
+                         (True, None, dict(name='x')))
+        results = list(validate_ndjson(io.BytesIO(b'{"name": "x"}\n[]\n'),
+                                       validator))
+        self.assertEqual([result.is_valid for result in results],
+                         [True, False])
+        self.assertEqual(DummyValidator.decoder.calls, 3)
+
+    def test_field_named_decoder(self):
+        class UploadValidator(PayloadValidator):
+            decoder = datatypes.String()
+
+        validator = UploadValidator()
+        self.assertEqual(validator.validate_bytes(b'{"decoder": "json"}'),
+                         (True, None, dict(decoder='json')))
+        self.assertEqual(validator.validate_bytes(b'{"decoder": 1}'), (
+            False, {'decoder': [datatypes.String._DEFAULT_ERROR]},
+            dict(decoder=1)))
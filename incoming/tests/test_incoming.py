@@ -5,9 +5,21 @@
     Tests for incoming.incoming module.
 '''
 
+import json
+import pickle
+import sys
+import threading
+import unittest
+from collections import OrderedDict
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
 from . import TestCase
 from .. import datatypes
-from ..incoming import PayloadErrors
+from ..incoming import CompactErrors, PayloadErrors
 from ..incoming import PayloadValidator
 
 
@@ -37,6 +49,36 @@ class TestPayloadErrors(TestCase):
         self.assertTrue('key2' in errors)
         self.assertFalse('key3' in errors)
 
+    def test_add_and_extend(self):
+        errors = PayloadErrors()
+        self.assertFalse(errors.has_errors())
+
+        errors.add('key1', 'value1.1')
+        errors.extend('key1', ['value1.2'])
+        errors.extend('key2', [])
+        self.assertTrue(errors.has_errors())
+        self.assertTrue('key1' in errors)
+        self.assertFalse('key2' in errors)
+        self.assertDictEqual(errors.to_dict(),
+                             {'key1': ['value1.1', 'value1.2']})
+
+    def test_lookups_do_not_record_errors(self):
+        errors = PayloadErrors()
+        errors['key1']
+        self.assertFalse(errors.has_errors())
+        self.assertFalse('key1' in errors)
+        self.assertDictEqual(errors.to_dict(), {})
+
+        errors['key1'].append('value1')
+        self.assertTrue(errors.has_errors())
+        self.assertDictEqual(errors.to_dict(), {'key1': ['value1']})
+
+    def test_to_dict_does_not_share_lists(self):
+        errors = PayloadErrors()
+        errors.add('key1', 'value1')
+        errors.to_dict()['key1'].append('value2')
+        self.assertDictEqual(errors.to_dict(), {'key1': ['value1']})
+
 
 class TestPayloadValidator(TestCase):
 
@@ -252,49 +294,26 @@ class TestPayloadValidator(TestCase):
         self.assertFalse(result)
         self.assertItemsEqual(errors.keys(), ['missing1', 'missing2'])
 
-    def test_replace_string_args_replaces_strings_with_methods(self):
-        class CustomValidator(PayloadValidator):
-            age = datatypes.Function(func='validate_age')
-            hobbies = datatypes.Function(func='validate_hobbies')
-
-            def validate_hobbies(self, val, *args, **kwargs):
-                return False if len(val) == 0 else True
-
-            def validate_age(self, val, *args, **kwargs):
-                if val < 18:
-                    return False
-                return True
-
-        validator = CustomValidator()
-        self.assertTrue(isinstance(validator.age.func, str))
-        self.assertTrue(isinstance(validator.hobbies.func, str))
-
-        validator._replace_string_args()
-
-        self.assertTrue(callable(validator.age.func))
-        self.assertTrue(callable(validator.hobbies.func))
-
-    def test_replace_string_args_gets_called_only_once(self):
+    def test_string_args_are_bound_per_instance(self):
         class CustomValidator(PayloadValidator):
             age = datatypes.Function(func='validate_age')
-            hobbies = datatypes.Function(func='validate_hobbies')
 
-            def validate_hobbies(self, val, *args, **kwargs):
-                return False if len(val) == 0 else True
+            def __init__(self, min_age, *args, **kwargs):
+                super(CustomValidator, self).__init__(*args, **kwargs)
+                self.min_age = min_age
 
             def validate_age(self, val, *args, **kwargs):
-                if val < 18:
-                    return False
-                return True
+                return val >= self.min_age
 
-        validator = CustomValidator()
-        self.assertFalse(validator._string_args_replaced)
-        validator._replace_string_args()
-        self.assertTrue(validator._string_args_replaced)
+        adults = CustomValidator(18)
+        children = CustomValidator(0)
+        self.assertTrue(isinstance(CustomValidator.age.func, str))
+        self.assertEqual(adults._rules['age'].func, adults.validate_age)
+        self.assertEqual(children._rules['age'].func, children.validate_age)
 
-        validator.age.func = 'validate_hobbies'
-        validator._replace_string_args()
-        self.assertFalse(callable(validator.age.func))
+        self.assertFalse(adults.validate(dict(age=10))[0])
+        self.assertTrue(children.validate(dict(age=10))[0])
+        self.assertTrue(isinstance(CustomValidator.age.func, str))
 
     def test_function_validator_gets_called_even_when_required_is_false(self):
         '''
@@ -329,8 +348,8 @@ class TestPayloadValidator(TestCase):
 
     def test_function_datatype_validates_with_validator_method(self):
         '''
-        Tests the working of Function datatype with
-        PayloadValidator._replace_string_args.
+        Tests the working of Function datatype with methods of the validator
+        class referred to by name.
         '''
 
         class CustomValidator(PayloadValidator):
@@ -557,3 +576,669 @@ class TestNestedPayloadValidator(TestCase):
                               ['region', 'pincode'])
         self.assertItemsEqual(errors['address'][1]['region'][1].keys(),
                               ['country'])
+
+
+class TestValidationPlan(TestCase):
+
+    def test_plan_is_compiled_once_per_class(self):
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Integer()
+
+        self.assertItemsEqual(CustomValidator._plan.fields, ['name', 'age'])
+        self.assertTrue(CustomValidator()._rules is
+                        CustomValidator._plan.rules)
+
+        class AnotherValidator(CustomValidator):
+            hobbies = datatypes.Array()
+
+        self.assertFalse(AnotherValidator._plan is CustomValidator._plan)
+        self.assertItemsEqual(AnotherValidator._plan.fields,
+                              ['name', 'age', 'hobbies'])
+
+    def test_plan_resolves_string_references_without_mutating_rules(self):
+        class CustomValidator(PayloadValidator):
+            age = datatypes.Function('validate_age')
+            address = datatypes.JSON('AddressValidator')
+
+            class AddressValidator(PayloadValidator):
+                street = datatypes.String()
+
+            def validate_age(self, val, *args, **kwargs):
+                return val >= 18
+
+        self.assertTrue(CustomValidator._plan.rules['address'].cls is
+                        CustomValidator.AddressValidator)
+        self.assertEqual(CustomValidator.address.cls, 'AddressValidator')
+
+        validator = CustomValidator()
+        result, errors = validator.validate(
+            dict(age=10, address=dict(street='Test street')))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['age'])
+        self.assertEqual(CustomValidator.age.func, 'validate_age')
+        self.assertEqual(validator._rules['age'].func, validator.validate_age)
+
+    def test_plan_raises_on_undefined_string_references(self):
+        class FunctionValidator(PayloadValidator):
+            age = datatypes.Function('validate_age')
+
+        class JSONValidator(PayloadValidator):
+            address = datatypes.JSON('AddressValidator')
+            addresses = datatypes.Array(of=datatypes.JSON('AddressValidator'))
+
+        self.assertRaises(AttributeError, FunctionValidator)
+        self.assertRaises(AttributeError, JSONValidator)
+
+    def test_sub_classes_can_define_string_references(self):
+        class BaseValidator(PayloadValidator):
+            age = datatypes.Function('validate_age')
+            address = datatypes.JSON('AddressValidator', required=False)
+
+        class ChildValidator(BaseValidator):
+            class AddressValidator(PayloadValidator):
+                street = datatypes.String()
+
+            def validate_age(self, val, *args, **kwargs):
+                return val >= 18
+
+        validator = ChildValidator()
+        self.assertEqual(validator.validate(dict(age=20)), (True, None))
+        result, errors = validator.validate(dict(age=10, address=dict()))
+        self.assertItemsEqual(errors.keys(), ['age', 'address'])
+
+    def test_customized_instance_types_are_not_short_circuited(self):
+        class EvenInteger(datatypes.Integer):
+            @classmethod
+            def validate(cls, val, *args, **kwargs):
+                return isinstance(val, int) and val % 2 == 0
+
+        class CustomValidator(PayloadValidator):
+            age = datatypes.Integer()
+            count = EvenInteger()
+
+        self.assertItemsEqual(CustomValidator._plan.checks.keys(), ['age'])
+
+        result, errors = CustomValidator().validate(dict(age=1, count=3))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['count'])
+
+
+class TestPayloadShapes(TestCase):
+
+    def setUp(self):
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Integer(required=False)
+            email = datatypes.Function(lambda val, *args, **kwargs: True,
+                                       required=False)
+
+        self.CustomValidator = CustomValidator
+
+    def test_shapes_are_reused_for_payloads_with_the_same_keys(self):
+        validator = self.CustomValidator()
+        plan = self.CustomValidator._plan
+
+        self.assertEqual(validator.validate(dict(name='Alice', x=1)),
+                         (True, None))
+        shape = plan.shape(dict(x=2, name='Bob'), True)
+        self.assertEqual(len(plan.shapes), 1)
+        self.assertEqual(shape.present, ('name', ))
+        self.assertEqual(shape.extra, ('x', ))
+        self.assertEqual(shape.missing, ())
+        self.assertEqual(shape.optional, ('email', ))
+
+        result, errors = validator.validate(dict(x=2, name=1), strict=True)
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['name', 'x'])
+        self.assertEqual(len(plan.shapes), 1)
+
+    def test_shapes_depend_on_required(self):
+        validator = self.CustomValidator()
+
+        self.assertFalse(validator.validate({})[0])
+        self.assertEqual(validator.validate({}, required=False),
+                         (True, None))
+
+        result, errors = validator.validate(dict(x=1), required=True)
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['name'])
+
+    def test_shapes_of_wide_payloads(self):
+        attrs = dict(('field%d' % i, datatypes.Integer()) for i in range(300))
+        CustomValidator = type('CustomValidator', (PayloadValidator,), attrs)
+
+        payload = OrderedDict(('field%d' % i, i) for i in range(299, 9, -1))
+        payload['extra'] = 0
+        shape = CustomValidator._plan.shape(payload, True)
+        self.assertEqual(list(shape.present), list(payload)[:-1])
+        self.assertEqual(shape.extra, ('extra', ))
+        self.assertItemsEqual(shape.missing,
+                              ['field%d' % i for i in range(10)])
+
+        result, errors = CustomValidator().validate(payload, strict=True)
+        self.assertFalse(result)
+        self.assertEqual(len(errors), 11)
+
+    def test_shape_cache_is_bounded(self):
+        class CustomValidator(self.CustomValidator):
+            shape_cache_size = 2
+
+        validator = CustomValidator()
+        for i in range(5):
+            validator.validate({'name': 'Alice', 'key%d' % i: i})
+            self.assertTrue(len(CustomValidator._plan.shapes) <= 2)
+
+    def test_extra_keys_are_not_cached(self):
+        validator = self.CustomValidator()
+        plan = self.CustomValidator._plan
+
+        for i in range(300):
+            payload = dict(('junk%d.%d' % (i, j), j) for j in range(100))
+            payload['name'] = 'Alice'
+            self.assertEqual(validator.validate(payload), (True, None))
+
+        self.assertEqual(list(plan.shapes),
+                         [(frozenset(['name']), True)])
+        shape = plan.shapes[(frozenset(['name']), True)]
+        self.assertEqual((shape.extra, shape.extra_count), ((), 0))
+
+        # Shapes handed out for such payloads list their extra keys only on
+        # demand and do not keep the payload once they are listed.
+        shape = plan.shape(OrderedDict([('name', 'Alice'), ('x', 1),
+                                        ('y', 2)]), True)
+        self.assertEqual(shape.extra_count, 2)
+        self.assertEqual(shape.extra, ('x', 'y'))
+        self.assertEqual(shape._payload, None)
+
+    @unittest.skipIf(tracemalloc is None, 'requires tracemalloc')
+    def test_junk_keys_do_not_grow_memory(self):
+        validator = self.CustomValidator()
+        payloads = []
+        for i in range(256):
+            payload = dict(('junk%d.%d' % (i, j), j) for j in range(1000))
+            payload['name'] = 'Alice'
+            payloads.append(payload)
+
+        tracemalloc.start()
+        try:
+            for payload in payloads:
+                validator.validate(payload)
+            retained = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        # 256 sets of 1000 keys would take up tens of megabytes.
+        self.assertTrue(retained < 1024 * 1024, retained)
+
+    def test_shape_cache_can_be_turned_off(self):
+        class CustomValidator(self.CustomValidator):
+            shape_cache_size = 0
+
+        self.assertEqual(CustomValidator().validate(dict(name='Alice')),
+                         (True, None))
+        self.assertEqual(CustomValidator._plan.shapes, {})
+
+    def test_field_named_shape_cache_size(self):
+        class CustomValidator(self.CustomValidator):
+            shape_cache_size = datatypes.Integer(required=False)
+
+        self.assertEqual(CustomValidator._plan.max_shapes, 256)
+        self.assertEqual(CustomValidator().validate(
+            dict(name='Alice', shape_cache_size='1')), (False, {
+                'shape_cache_size': [datatypes.Integer._DEFAULT_ERROR]}))
+
+
+class TestValidateMany(TestCase):
+
+    def setUp(self):
+        class DummyValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Integer()
+
+        self.validator = DummyValidator()
+        self.payloads = [
+            dict(name='a', age=1),
+            dict(name='b', age='2'),
+            dict(name='c', age=3),
+            dict(age=4),
+            dict(name='e', age='5'),
+        ]
+
+    def test_validate_many_yields_results_in_order(self):
+        results = list(self.validator.validate_many(self.payloads))
+        self.assertEqual([r[0] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r[1] for r in results],
+                         [True, False, True, False, False])
+        self.assertEqual(results[0][2], None)
+        self.assertItemsEqual(results[1][2].keys(), ['age'])
+        self.assertItemsEqual(results[3][2].keys(), ['name'])
+
+    def test_validate_many_is_lazy(self):
+        def payloads():
+            yield dict(name='a', age=1)
+            raise AssertionError('Consumed more payloads than needed.')
+
+        results = self.validator.validate_many(payloads())
+        self.assertEqual(next(results), (0, True, None))
+
+    def test_validate_many_failures_only(self):
+        results = list(self.validator.validate_many(self.payloads,
+                                                    failures_only=True))
+        self.assertEqual([r[0] for r in results], [1, 3, 4])
+
+    def test_validate_many_max_failures(self):
+        results = list(self.validator.validate_many(self.payloads,
+                                                    max_failures=2))
+        self.assertEqual([r[0] for r in results], [0, 1, 2, 3])
+
+        results = list(self.validator.validate_many(self.payloads,
+                                                    failures_only=True,
+                                                    max_failures=1))
+        self.assertEqual([r[0] for r in results], [1])
+
+    def test_validate_many_overrides(self):
+        results = list(self.validator.validate_many(self.payloads,
+                                                    required=False,
+                                                    failures_only=True))
+        self.assertEqual([r[0] for r in results], [1, 4])
+
+
+class TestFailFast(TestCase):
+
+    def setUp(self):
+        class DummyValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Function('validate_age')
+
+            validate_age_called = False
+
+            def validate_age(self, val, *args, **kwargs):
+                self.validate_age_called = True
+                return isinstance(val, int)
+
+        self.DummyValidator = DummyValidator
+
+    def test_fail_fast_when_global_is_false(self):
+        validator = self.DummyValidator()
+        result, errors = validator.validate(dict(name=1, age='1'))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['name', 'age'])
+
+        result, errors = validator.validate(dict(name=1, age='1'),
+                                            fail_fast=True)
+        self.assertFalse(result)
+        self.assertEqual(len(errors), 1)
+
+    def test_fail_fast_when_global_is_true(self):
+        class AnotherDummyValidator(self.DummyValidator):
+            fail_fast = True
+
+        validator = AnotherDummyValidator()
+        result, errors = validator.validate(
+            OrderedDict([('name', 1), ('age', '1')]))
+        self.assertFalse(result)
+        self.assertEqual(errors, {'name': [datatypes.String._DEFAULT_ERROR]})
+        self.assertFalse(validator.validate_age_called)
+
+        result, errors = validator.validate(dict(name=1, age='1'),
+                                            fail_fast=False)
+        self.assertItemsEqual(errors.keys(), ['name', 'age'])
+
+    def test_fail_fast_stops_at_required_and_strict_errors(self):
+        validator = self.DummyValidator()
+
+        result, errors = validator.validate(dict(age=1), fail_fast=True)
+        self.assertEqual(errors, {'name': [validator.required_error]})
+
+        result, errors = validator.validate(dict(name='a', age=1, extra=1),
+                                            strict=True, fail_fast=True)
+        self.assertEqual(errors, {'extra': [validator.strict_error]})
+
+    def test_fail_fast_with_valid_payload(self):
+        result, errors = self.DummyValidator().validate(dict(name='a', age=1),
+                                                        fail_fast=True)
+        self.assertTrue(result)
+        self.assertEqual(errors, None)
+
+
+class TestThreadSafety(TestCase):
+
+    def test_one_instance_validates_from_many_threads(self):
+        class AddressValidator(PayloadValidator):
+            city = datatypes.String()
+
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Function('validate_age')
+            address = datatypes.JSON(AddressValidator)
+            tags = datatypes.Array(of=datatypes.String(), required=False)
+
+            def validate_age(self, val, *args, **kwargs):
+                return isinstance(val, int) and val >= self.min_age
+
+        validator = CustomValidator()
+        validator.min_age = 18
+        other = CustomValidator()
+        other.min_age = 0
+
+        cases = [
+            (dict(name='Alice', age=30, address=dict(city='Pune')), None),
+            (dict(name='Bob', age=10, address=dict(city='Pune')), ['age']),
+            (dict(name=1, age=30, address=dict(city=2), tags=[1]),
+             ['name', 'address', 'tags']),
+            (dict(name='Carol', age=30), ['address']),
+            (dict(name='Dave', age=30, address={}, extra=0),
+             ['address', 'extra']),
+        ]
+        failures = []
+        start = threading.Event()
+
+        def hammer(offset):
+            start.wait()
+            for i in range(300):
+                payload, expected = cases[(i + offset) % len(cases)]
+                result, errors = validator.validate(payload, strict=True)
+                if expected is None:
+                    if not result or errors is not None:
+                        failures.append((payload, errors))
+                elif result or sorted(errors) != sorted(expected):
+                    failures.append((payload, errors))
+                if not other.validate(dict(name='Eve', age=5,
+                                           address=dict(city='Goa')))[0]:
+                    failures.append('bound method leaked')
+
+        # Switch threads as often as possible to make races likely.
+        interval = getattr(sys, 'getswitchinterval', None)
+        if interval is not None:
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=hammer, args=(i, ))
+                       for i in range(16)]
+            for thread in threads:
+                thread.start()
+            start.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            if interval is not None:
+                sys.setswitchinterval(interval)
+
+        self.assertEqual(failures, [])
+        self.assertTrue(isinstance(CustomValidator.age.func, str))
+
+
+class TestCompactErrors(TestCase):
+
+    def setUp(self):
+        class AddressValidator(PayloadValidator):
+            street = datatypes.String()
+            pincode = datatypes.Integer()
+
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Integer()
+            address = datatypes.JSON(AddressValidator)
+            tags = datatypes.Array(of=datatypes.String(), required=False)
+
+        class CompactValidator(CustomValidator):
+            compact_errors = True
+
+        self.CustomValidator = CustomValidator
+        self.CompactValidator = CompactValidator
+        self.payload = dict(age='1', address=dict(pincode='x'), tags=['a', 1],
+                            extra=0)
+
+    def test_compact_errors_match_errors(self):
+        for strict in (False, True):
+            expected = self.CustomValidator().validate(self.payload,
+                                                       strict=strict)
+            result, errors = self.CompactValidator().validate(self.payload,
+                                                              strict=strict)
+            self.assertFalse(result)
+            self.assertTrue(isinstance(errors, CompactErrors))
+            self.assertEqual(errors.to_dict(), expected[1])
+            self.assertEqual(dict(errors), expected[1])
+            self.assertEqual(errors, expected[1])
+            self.assertTrue('age' in errors)
+
+        self.assertEqual(self.CompactValidator().validate(
+            dict(name='x', age=1, address=dict(street='s', pincode=1))),
+            (True, None))
+
+    def test_compact_errors_in_fail_fast_mode(self):
+        result, errors = self.CompactValidator().validate(self.payload,
+                                                          fail_fast=True)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors, self.CustomValidator().validate(
+            self.payload, fail_fast=True)[1])
+
+    def test_compact_errors_store_paths_and_interned_messages(self):
+        errors = self.CompactValidator().validate(self.payload)[1]
+        self.assertEqual(errors._dict, None)
+
+        pairs = list(errors.pairs())
+        self.assertTrue((('address', 'pincode'),
+                         datatypes.Integer._DEFAULT_ERROR) in pairs)
+        self.assertTrue((('tags', 1), datatypes.String._DEFAULT_ERROR) in
+                        pairs)
+        self.assertTrue(errors.has_errors())
+
+        other = self.CompactValidator().validate(self.payload)[1]
+        self.assertEqual(list(errors._codes), list(other._codes))
+
+    def test_compact_errors_can_be_pickled(self):
+        errors = self.CompactValidator().validate(self.payload)[1]
+        errors.add('custom', ['unhashable'])
+        self.assertEqual(pickle.loads(pickle.dumps(errors)), errors)
+
+    def test_nested_compact_errors_in_plain_errors(self):
+        class ParentValidator(PayloadValidator):
+            address = datatypes.JSON(self.CompactValidator)
+            people = datatypes.Array(of=datatypes.JSON(self.CompactValidator))
+
+        payload = dict(address=self.payload, people=[self.payload])
+        for fail_fast in (False, True):
+            expected = self.CustomValidator().validate(
+                self.payload, fail_fast=fail_fast)[1]
+            errors = ParentValidator().validate(payload,
+                                                fail_fast=fail_fast)[1]
+            self.assertEqual(errors['address'][1], expected)
+            self.assertTrue(errors['address'][1].__class__ is dict)
+            if not fail_fast:
+                self.assertTrue(
+                    errors['people'][1][0][1].__class__ is dict)
+            json.dumps(errors)
+
+
+class TestRuleOrdering(TestCase):
+
+    def setUp(self):
+        calls = self.calls = []
+
+        def check(val, *args, **kwargs):
+            calls.append(val)
+            return False
+
+        class OrderedValidator(PayloadValidator):
+            fail_fast = True
+
+            func = datatypes.Function(check)
+            address = datatypes.JSON('AddressValidator', required=False)
+            name = datatypes.String()
+
+            class AddressValidator(PayloadValidator):
+                street = datatypes.String()
+
+        self.check = check
+        self.OrderedValidator = OrderedValidator
+
+    def test_rules_are_ordered_by_cost(self):
+        payload = OrderedDict([('func', 1), ('address', dict(street=1)),
+                               ('name', 1)])
+        result, errors = self.OrderedValidator().validate(payload)
+        self.assertEqual(list(errors), ['name'])
+        self.assertEqual(self.calls, [])
+
+        result, errors = self.OrderedValidator().validate(
+            payload, fail_fast=False)
+        self.assertEqual(list(errors), ['name', 'address', 'func'])
+
+    def test_cost_hints(self):
+        class HintedValidator(self.OrderedValidator):
+            func = datatypes.Function(self.check, cost=0)
+
+        result, errors = HintedValidator().validate(
+            OrderedDict([('name', 1), ('func', 1)]))
+        self.assertEqual(list(errors), ['func'])
+        self.assertEqual(self.calls, [1])
+
+    def test_missing_fields_are_reported_before_running_rules(self):
+        validator = self.OrderedValidator()
+        result, errors = validator.validate(dict(func=1))
+        self.assertEqual(errors, {'name': [validator.required_error]})
+        self.assertEqual(self.calls, [])
+
+    def test_equal_costs_keep_the_order_of_the_payload(self):
+        class PlainValidator(PayloadValidator):
+            fail_fast = True
+
+            age = datatypes.Integer()
+            name = datatypes.String()
+
+        self.assertEqual(PlainValidator._plan.ranks, None)
+        result, errors = PlainValidator().validate(
+            OrderedDict([('name', 1), ('age', 'x')]))
+        self.assertEqual(list(errors), ['name'])
+
+
+class TestErrorLimits(TestCase):
+
+    def setUp(self):
+        class LimitedValidator(PayloadValidator):
+            strict = True
+            max_errors = 3
+            max_extra_keys = 2
+
+            age = datatypes.Integer()
+            name = datatypes.String()
+            tags = datatypes.Function(lambda val, *args, **kwargs: False,
+                                      required=False)
+
+        self.LimitedValidator = LimitedValidator
+        self.key = LimitedValidator.payload_error_key
+
+    def test_extra_keys_are_summarized(self):
+        payload = OrderedDict([('age', 1), ('name', 'x'), ('tags', 'x')])
+        payload.update(('key%d' % i, i) for i in range(100000))
+
+        class OneErrorValidator(self.LimitedValidator):
+            max_errors = 10
+            tags = datatypes.String()
+
+        result, errors = OneErrorValidator().validate(payload)
+        self.assertEqual(errors, {
+            'key0': [self.LimitedValidator.strict_error],
+            'key1': [self.LimitedValidator.strict_error],
+            self.key: ['99998 more unexpected fields were not reported.'],
+        })
+
+        # Extra keys are not a part of cached shapes.
+        self.assertEqual(list(OneErrorValidator._plan.shapes),
+                         [(frozenset(['age', 'name', 'tags']), True)])
+
+    def test_validation_stops_at_max_errors(self):
+        payload = OrderedDict([('age', 'x'), ('name', 1), ('tags', 1),
+                               ('extra', 1)])
+        result, errors = self.LimitedValidator().validate(payload)
+        self.assertEqual(errors, {
+            'age': [datatypes.Integer._DEFAULT_ERROR],
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'tags': [datatypes.Function._DEFAULT_ERROR],
+            self.key: ['Too many errors. Validation stopped after 3 errors.'],
+        })
+
+        result, errors = self.LimitedValidator().validate(
+            dict(a=1, b=2, c=3, d=4))
+        self.assertEqual(errors, {
+            'a': [self.LimitedValidator.strict_error],
+            'b': [self.LimitedValidator.strict_error],
+            'age': [self.LimitedValidator.required_error],
+            self.key: ['2 more unexpected fields were not reported.',
+                       'Too many errors. Validation stopped after 3 errors.'],
+        })
+
+    def test_no_summary_at_exactly_max_errors(self):
+        payload = OrderedDict([('age', 'x'), ('name', 1), ('tags', 1)])
+        result, errors = self.LimitedValidator().validate(payload)
+        self.assertEqual(errors, {
+            'age': [datatypes.Integer._DEFAULT_ERROR],
+            'name': [datatypes.String._DEFAULT_ERROR],
+            'tags': [datatypes.Function._DEFAULT_ERROR],
+        })
+
+        result, errors = self.LimitedValidator().validate(
+            dict(age=1, name='x', a=1, b=2))
+        self.assertEqual(errors, {
+            'a': [self.LimitedValidator.strict_error],
+            'b': [self.LimitedValidator.strict_error],
+            'tags': [datatypes.Function._DEFAULT_ERROR],
+        })
+
+    def test_limits_must_be_positive(self):
+        def define(**attrs):
+            attrs['name'] = datatypes.String()
+            return type('CustomValidator', (PayloadValidator, ), attrs)
+
+        self.assertRaises(ValueError, define, max_errors=0)
+        self.assertRaises(ValueError, define, max_extra_keys=-1)
+        self.assertEqual(define(max_errors=1, max_extra_keys=0).max_errors, 1)
+
+    def test_limits_are_read_at_validation_time(self):
+        validator = self.LimitedValidator()
+        validator.max_extra_keys = 1
+        summary = ['1 more unexpected fields were not reported.']
+        result, errors = validator.validate(dict(age=1, name='x', tags=None,
+                                                 a=1, b=2))
+        self.assertEqual(errors[self.key], summary)
+
+        self.LimitedValidator.max_extra_keys = 0
+        result, errors = self.LimitedValidator().validate(
+            dict(age=1, name='x', a=1))
+        self.assertEqual(errors, {
+            'tags': [datatypes.Function._DEFAULT_ERROR], self.key: summary})
+
+    def test_limits_with_compact_errors(self):
+        class CompactValidator(self.LimitedValidator):
+            compact_errors = True
+
+        payload = dict(('key%d' % i, i) for i in range(10))
+        self.assertEqual(CompactValidator().validate(payload)[1],
+                         self.LimitedValidator().validate(payload)[1])
+
+    def test_errors_below_the_limits(self):
+        result, errors = self.LimitedValidator().validate(
+            dict(age=1, name='x', extra=1))
+        self.assertEqual(errors, {
+            'extra': [self.LimitedValidator.strict_error],
+            'tags': [datatypes.Function._DEFAULT_ERROR]})
+
+    def test_max_extra_keys_of_zero(self):
+        class NoExtraValidator(PayloadValidator):
+            strict = True
+            max_extra_keys = 0
+
+            a = datatypes.Integer()
+
+        summary = {self.key: ['1 more unexpected fields were not reported.']}
+        for fail_fast in (False, True):
+            self.assertEqual(
+                NoExtraValidator().validate(dict(a=1, junk=2),
+                                            fail_fast=fail_fast),
+                (False, summary))
+        self.assertEqual(NoExtraValidator().validate_bytes(
+            b'{"a": 1, "junk": 2}', fail_fast=True)[:2], (False, summary))
+        self.assertEqual(NoExtraValidator().validate(dict(a=1, junk=2),
+                                                     strict=False),
+                         (True, None))
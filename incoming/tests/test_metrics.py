@@ -0,0 +1,146 @@
+'''
+    test_metrics
+    ~~~~~~~~~~~~
+
+    Tests for incoming.metrics module.
+'''
+
+import threading
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+from ..metrics import Histogram, MetricsRegistry
+
+
+class TestHistogram(TestCase):
+
+    def test_observe(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 1, 1.5, 3, 10):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.sum, 16)
+        self.assertEqual(histogram.cumulative(), [
+            (1, 2), (2, 3), (5, 4), (float('inf'), 5)])
+
+
+class TestMetricsRegistry(TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry(buckets=(0.001, 1))
+
+        class CustomValidator(PayloadValidator):
+            metrics = self.registry
+            name = datatypes.String()
+            age = datatypes.Integer()
+
+        self.CustomValidator = CustomValidator
+
+    def test_field_named_metrics(self):
+        class ReportValidator(PayloadValidator):
+            class MetricsValidator(PayloadValidator):
+                count = datatypes.Integer()
+
+            metrics = datatypes.JSON(MetricsValidator)
+
+        validator = ReportValidator()
+        self.assertEqual(validator.metrics, None)
+        self.assertEqual(validator.validate(dict(metrics=dict(count=1))),
+                         (True, None))
+        self.assertEqual(validator.validate(dict(metrics=dict(count='1'))),
+                         (False, {'metrics': [
+                             datatypes.JSON._DEFAULT_ERROR,
+                             {'count': [datatypes.Integer._DEFAULT_ERROR]}]}))
+
+        # the option set by a base class is kept
+        class RecordedValidator(self.CustomValidator):
+            metrics = datatypes.String()
+
+        validator = RecordedValidator()
+        self.assertTrue(validator.metrics is self.registry)
+        self.assertEqual(validator.validate(dict(name='x', age=1, metrics=1)),
+                         (False, {'metrics': [
+                             datatypes.String._DEFAULT_ERROR]}))
+        self.assertEqual(self.registry.snapshot()['validations'],
+                         {'RecordedValidator': {'valid': 0, 'invalid': 1}})
+
+    def test_validators_record_metrics(self):
+        validator = self.CustomValidator()
+        validator.validate(dict(name='Test', age=1))
+        validator.validate(dict(name=1, age='1'))
+        list(validator.validate_many([dict(name='Test'),
+                                      dict(name='Test', age=1)]))
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['validations'],
+                         {'CustomValidator': {'valid': 2, 'invalid': 2}})
+        self.assertEqual(snapshot['field_failures'],
+                         {'CustomValidator': {'name': 1, 'age': 2}})
+
+        latency = snapshot['latency']['CustomValidator']
+        self.assertEqual(latency['count'], 4)
+        self.assertEqual(latency['buckets'][-1], (float('inf'), 4))
+
+    def test_metrics_are_off_by_default(self):
+        class OtherValidator(PayloadValidator):
+            name = datatypes.String()
+
+        self.assertTrue(OtherValidator.metrics is None)
+        OtherValidator().validate(dict(name=1))
+        self.CustomValidator().validate(dict(name=1))
+        self.assertItemsEqual(self.registry.snapshot()['validations'].keys(),
+                              ['CustomValidator'])
+
+    def test_metrics_are_thread_safe(self):
+        validator = self.CustomValidator()
+
+        def validate():
+            for i in range(500):
+                validator.validate(dict(name='Test', age=i % 2 or 'x'))
+
+        threads = [threading.Thread(target=validate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['validations']['CustomValidator'],
+                         dict(valid=2000, invalid=2000))
+        self.assertEqual(snapshot['latency']['CustomValidator']['count'],
+                         4000)
+
+    def test_render_prometheus(self):
+        self.registry.observe('CustomValidator', 0.0005, None)
+        self.registry.observe('CustomValidator', 0.5, {'na"me': ['Error']})
+
+        text = self.registry.render_prometheus()
+        self.assertTrue(text.endswith('\n'))
+        lines = text.splitlines()
+        for line in (
+            '# TYPE incoming_validations_total counter',
+            'incoming_validations_total{validator="CustomValidator",'
+            'result="valid"} 1',
+            'incoming_validations_total{validator="CustomValidator",'
+            'result="invalid"} 1',
+            'incoming_field_failures_total{validator="CustomValidator",'
+            'field="na\\"me"} 1',
+            '# TYPE incoming_validation_duration_seconds histogram',
+            'incoming_validation_duration_seconds_bucket{'
+            'validator="CustomValidator",le="0.001"} 1',
+            'incoming_validation_duration_seconds_bucket{'
+            'validator="CustomValidator",le="1"} 2',
+            'incoming_validation_duration_seconds_bucket{'
+            'validator="CustomValidator",le="+Inf"} 2',
+            'incoming_validation_duration_seconds_count{'
+            'validator="CustomValidator"} 2',
+        ):
+            self.assertTrue(line in lines, line)
+
+    def test_reset(self):
+        self.registry.observe('CustomValidator', 0.5, None)
+        self.registry.reset()
+        self.assertEqual(self.registry.snapshot(), dict(
+            validations={}, field_failures={}, latency={}))
@@ -0,0 +1,135 @@
+'''
+    test_middleware
+    ~~~~~~~~~~~~~~~
+
+    Tests for incoming.middleware module.
+'''
+
+import io
+import json
+from wsgiref.util import setup_testing_defaults
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+from ..middleware import LENGTH_REQUIRED_ERROR, Router, WSGIMiddleware
+
+
+class PersonValidator(PayloadValidator):
+    max_payload_size = 64
+
+    name = datatypes.String()
+    age = datatypes.Integer()
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    body = environ['wsgi.input'].read()
+    payload = environ.get('incoming.payload')
+    return [json.dumps([payload, body.decode('utf-8')]).encode('utf-8')]
+
+
+class TestRouter(TestCase):
+
+    def test_match(self):
+        router = Router({'/people': PersonValidator,
+                         ('delete', '/people'): PersonValidator()})
+        self.assertTrue(isinstance(router.match('POST', '/people'),
+                                   PersonValidator))
+        self.assertTrue(router.match('PUT', '/people') is
+                        router.match('POST', '/people'))
+        self.assertTrue(isinstance(router.match('DELETE', '/people'),
+                                   PersonValidator))
+        self.assertEqual(router.match('GET', '/people'), None)
+        self.assertEqual(router.match('POST', '/'), None)
+
+
+class TestWSGIMiddleware(TestCase):
+
+    def setUp(self):
+        self.app = WSGIMiddleware(app, {'/people': PersonValidator},
+                                  max_content_length=1024)
+
+    def request(self, body, method='POST', path='/people', length=None,
+                **environ):
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'CONTENT_LENGTH': str(len(body) if length is None else length),
+            'wsgi.input': io.BytesIO(body),
+        })
+        setup_testing_defaults(environ)
+
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = b''.join(self.app(environ, start_response))
+        return response['status'], json.loads(body.decode('utf-8'))
+
+    def test_valid_body_is_passed_on(self):
+        body = b'{"name": "Alice", "age": 30}'
+        self.assertEqual(self.request(body),
+                         ('200 OK', [dict(name='Alice', age=30),
+                                     body.decode('utf-8')]))
+
+    def test_invalid_body_is_rejected(self):
+        status, errors = self.request(b'{"name": "Alice", "age": "30"}')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(errors, dict(age=[PersonValidator.age.error]))
+
+        status, errors = self.request(b'{"name": ')
+        self.assertEqual(status, '400 Bad Request')
+        self.assertEqual(errors, {'__payload__':
+                                  [PersonValidator.decode_error]})
+
+    def test_compact_errors_are_encoded(self):
+        class AddressValidator(PayloadValidator):
+            compact_errors = True
+            street = datatypes.String()
+
+        class CompactValidator(PersonValidator):
+            compact_errors = True
+
+        class NestedValidator(PersonValidator):
+            address = datatypes.JSON(AddressValidator)
+
+        body = b'{"name": 1, "age": 30, "address": {"street": 1}}'
+        for validator in (CompactValidator, NestedValidator):
+            self.app = WSGIMiddleware(app, {'/people': validator})
+            status, errors = self.request(body)
+            self.assertEqual(status, '400 Bad Request')
+            self.assertEqual(errors['name'], [PersonValidator.name.error])
+
+        self.assertEqual(errors['address'], [
+            datatypes.JSON._DEFAULT_ERROR,
+            {'street': [datatypes.String._DEFAULT_ERROR]}])
+
+    def test_large_body_is_rejected_before_it_is_read(self):
+        status, errors = self.request(b'', length=65)
+        self.assertEqual(status, '413 Request Entity Too Large')
+        self.assertEqual(errors, {'__payload__':
+                                  [PersonValidator.size_error]})
+
+    def test_body_without_length(self):
+        body = json.dumps(dict(name='Alice', age=30)).encode('utf-8')
+
+        status, errors = self.request(body, length='')
+        self.assertEqual(status, '411 Length Required')
+        self.assertEqual(errors, {'__payload__': [LENGTH_REQUIRED_ERROR]})
+
+        terminated = {'wsgi.input_terminated': True}
+        self.assertEqual(self.request(body, length='', **terminated),
+                         ('200 OK', [dict(name='Alice', age=30),
+                                     body.decode('utf-8')]))
+
+        status, errors = self.request(b' ' * 64 + body, length='',
+                                      **terminated)
+        self.assertEqual(status, '413 Request Entity Too Large')
+
+    def test_other_routes_are_not_validated(self):
+        self.assertEqual(self.request(b'x', path='/'), ('200 OK', [None, 'x']))
+        self.assertEqual(self.request(b'x', method='GET'),
+                         ('200 OK', [None, 'x']))
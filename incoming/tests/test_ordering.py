@@ -0,0 +1,83 @@
+'''
+    test_ordering
+    ~~~~~~~~~~~~~
+
+    Tests for incoming.ordering module.
+'''
+
+from collections import OrderedDict
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+
+
+class TestAdaptiveOrder(TestCase):
+
+    def setUp(self):
+        class AdaptiveValidator(PayloadValidator):
+            adaptive_order = True
+            adaptive_interval = 10
+            fail_fast = True
+
+            name = datatypes.String()
+            age = datatypes.Integer()
+
+        AdaptiveValidator._plan.adaptive.sample_rate = 1
+        self.AdaptiveValidator = AdaptiveValidator
+
+    def test_rules_that_fail_are_run_first(self):
+        validator = self.AdaptiveValidator()
+        payload = OrderedDict([('name', 'x'), ('age', 'x')])
+
+        result, errors = validator.validate(payload)
+        self.assertEqual(list(errors), ['age'])
+        self.assertEqual(validator._plan.shape(payload, True).present,
+                         ('name', 'age'))
+
+        for i in range(10):
+            validator.validate(payload)
+
+        self.assertEqual(validator._plan.shape(payload, True).present,
+                         ('age', 'name'))
+        self.assertEqual(validator.validate(payload), (False, {
+            'age': [datatypes.Integer._DEFAULT_ERROR]}))
+
+    def test_stats(self):
+        validator = self.AdaptiveValidator()
+        validator.validate(dict(name=1, age=1), fail_fast=False)
+        validator.validate(dict(name='x', age=1), fail_fast=False)
+
+        stats = validator._plan.adaptive.stats()
+        self.assertEqual(stats['name'][:2], (2, 1))
+        self.assertEqual(stats['age'][:2], (2, 0))
+
+    def test_statistics_decay_after_ranking(self):
+        validator = self.AdaptiveValidator()
+        for i in range(10):
+            validator.validate(dict(name=1, age=1), fail_fast=False)
+
+        self.assertEqual(validator._plan.adaptive.stats()['name'][:2],
+                         (5, 5))
+
+    def test_results_match_plain_validation(self):
+        class PlainValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Integer()
+
+        payload = dict(name=1, age='x', extra=1)
+        for i in range(20):
+            self.assertEqual(
+                self.AdaptiveValidator().validate(payload, fail_fast=False,
+                                                  strict=True),
+                PlainValidator().validate(payload, strict=True))
+
+    def test_fields_named_like_options(self):
+        class CustomValidator(self.AdaptiveValidator):
+            adaptive_order = datatypes.Boolean()
+            adaptive_interval = datatypes.Integer()
+
+        self.assertEqual(CustomValidator._plan.adaptive.interval, 10)
+        self.assertEqual(CustomValidator().validate(dict(
+            name='x', age=1, adaptive_order=True, adaptive_interval=1)),
+            (True, None))
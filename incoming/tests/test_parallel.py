@@ -0,0 +1,95 @@
+'''
+    test_parallel
+    ~~~~~~~~~~~~~
+
+    Tests for incoming.parallel module.
+'''
+
+import io
+import pickle
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+from ..parallel import validate_ndjson_parallel, validate_parallel
+
+
+class PersonValidator(PayloadValidator):
+
+    class AddressValidator(PayloadValidator):
+        street = datatypes.String()
+        pincode = datatypes.Function(lambda val, *args, **kwargs:
+                                     isinstance(val, int))
+
+    name = datatypes.String()
+    age = datatypes.Function('validate_age')
+    address = datatypes.JSON(AddressValidator)
+
+    def validate_age(self, val, *args, **kwargs):
+        return isinstance(val, int) and val >= 18
+
+
+class AgeValidator(PayloadValidator):
+    age = datatypes.Function('validate_age')
+
+    def __init__(self, min_age, *args, **kwargs):
+        super(AgeValidator, self).__init__(*args, **kwargs)
+        self.min_age = min_age
+
+    def validate_age(self, val, *args, **kwargs):
+        return val >= self.min_age
+
+
+def payloads(count):
+    for i in range(count):
+        yield dict(name='Test', age=18 + i % 3 - 1,
+                   address=dict(street='Test street', pincode=i))
+
+
+class TestValidatePickling(TestCase):
+
+    def test_validators_can_be_pickled(self):
+        validator = pickle.loads(pickle.dumps(PersonValidator()))
+        self.assertTrue(isinstance(validator, PersonValidator))
+        result, errors = validator.validate(dict(
+            name='Test', age=10,
+            address=dict(street='Test street', pincode='123')))
+        self.assertFalse(result)
+        self.assertItemsEqual(errors.keys(), ['age', 'address'])
+
+    def test_validators_with_arguments_can_be_pickled(self):
+        validator = pickle.loads(pickle.dumps(AgeValidator(18)))
+        self.assertEqual(validator.min_age, 18)
+        self.assertEqual(validator.validate(dict(age=20)), (True, None))
+        self.assertFalse(validator.validate(dict(age=10))[0])
+        self.assertEqual(validator._rules['age'].func.__self__, validator)
+
+
+class TestValidateParallel(TestCase):
+
+    def test_results_are_in_order(self):
+        expected = list(PersonValidator().validate_many(payloads(50)))
+        results = list(validate_parallel(PersonValidator, payloads(50),
+                                         workers=2, batch_size=7))
+        self.assertEqual(results, expected)
+
+    def test_failures_only_and_max_failures(self):
+        results = list(validate_parallel(PersonValidator(), payloads(50),
+                                         workers=2, batch_size=4,
+                                         failures_only=True, max_failures=5))
+        self.assertEqual([r[0] for r in results], [0, 3, 6, 9, 12])
+
+    def test_validate_ndjson_parallel(self):
+        data = (b'{"name": "a", "age": 20, "address": '
+                b'{"street": "s", "pincode": 1}}\n'
+                b'not json\n'
+                b'\n'
+                b'{"name": "b", "age": 10, "address": '
+                b'{"street": "s", "pincode": 1}}\n')
+        results = list(validate_ndjson_parallel(io.BytesIO(data),
+                                                PersonValidator, workers=2,
+                                                batch_size=1))
+        self.assertEqual([r.line for r in results], [1, 2, 4])
+        self.assertEqual([r.offset for r in results], [0, 67, 77])
+        self.assertEqual([r.is_valid for r in results], [True, False, False])
+        self.assertItemsEqual(results[2].errors.keys(), ['age'])
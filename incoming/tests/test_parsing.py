@@ -0,0 +1,202 @@
+'''
+    test_parsing
+    ~~~~~~~~~~~~
+
+    Tests for incoming.parsing module.
+'''
+
+import json
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import CompactErrors, PayloadValidator
+from ..metrics import MetricsRegistry
+from ..parsing import iter_object, LimitExceeded
+
+
+class DummyValidator(PayloadValidator):
+    name = datatypes.String()
+    age = datatypes.Function(lambda val, *args, **kwargs: val >= 18)
+    tags = datatypes.Array(of=datatypes.String(), required=False)
+
+
+class TestIterObject(TestCase):
+
+    def test_iter_object_generates_keys_in_order(self):
+        text = ' { "a" : 1, "b":[1, {"c": "}"}], "c" : {"d": null}} \n'
+        self.assertEqual(list(iter_object(text)),
+                         [('a', 1), ('b', [1, {'c': '}'}]),
+                          ('c', {'d': None})])
+        self.assertEqual(list(iter_object('{}')), [])
+
+    def test_iter_object_raises_on_invalid_json(self):
+        for text in ('', '[]', '{"a"}', '{"a": 1,}', '{"a": 1} 1', '{a: 1}',
+                     '{"a": 1'):
+            self.assertRaises(ValueError, list, iter_object(text))
+
+    def test_iter_object_stops_at_limits(self):
+        members = iter_object('{"a": 1, "b": 2, "c": [', max_keys=2)
+        self.assertEqual([next(members), next(members)], [('a', 1), ('b', 2)])
+        self.assertRaises(LimitExceeded, next, members)
+
+        text = '{"a": [{"b": ["[[[["]}], "c": 1}'
+        self.assertEqual(len(list(iter_object(text, max_depth=4))), 2)
+        self.assertRaises(LimitExceeded, list, iter_object(text, max_depth=3))
+
+
+class TestValidateBytes(TestCase):
+
+    def setUp(self):
+        self.validator = DummyValidator()
+
+    def test_validate_bytes(self):
+        payload = dict(name='Alice', age=30, tags=['a'])
+        data = json.dumps(payload).encode('utf-8')
+        for fail_fast in (False, True):
+            self.assertEqual(
+                self.validator.validate_bytes(data, fail_fast=fail_fast),
+                (True, None, payload))
+            self.assertEqual(
+                self.validator.validate_bytes(memoryview(data),
+                                              fail_fast=fail_fast),
+                (True, None, payload))
+
+    def test_validate_bytes_reports_like_validate(self):
+        for payload in (dict(name=1, age=10, tags=[1]), dict(age=20, x=1),
+                        dict(name='Bob', age=10)):
+            data = json.dumps(payload).encode('utf-8')
+            self.validator.max_keys = None
+            expected = self.validator.validate(payload, strict=True)
+            self.assertEqual(self.validator.validate_bytes(data, strict=True),
+                             expected + (payload, ))
+
+            # parsing key by key
+            self.validator.max_keys = 10
+            self.assertEqual(self.validator.validate_bytes(data, strict=True),
+                             expected + (payload, ))
+
+    def test_validate_bytes_stops_at_first_error_in_fail_fast_mode(self):
+        data = b'{"name": 1, "age": 20, "tags": [' + b'"x", ' * 1000
+        self.assertEqual(self.validator.validate_bytes(data, fail_fast=True),
+                         (False, {'name': [DummyValidator.name.error]}, None))
+
+    def test_validate_bytes_rejects_invalid_payloads(self):
+        key = DummyValidator.payload_error_key
+        decode_error = (False, {key: [DummyValidator.decode_error]}, None)
+        for data in (b'[]', b'{"name": ', b'\xff', b'{"age": NaN}',
+                     b'{"age": -Infinity}', b'{"age": 1e400}'):
+            self.assertEqual(self.validator.validate_bytes(data,
+                                                           fail_fast=True),
+                             decode_error)
+            # the decoder rejects the same payloads
+            self.assertEqual(self.validator.validate_bytes(data),
+                             decode_error)
+
+        data = b'{"age": 1, "age": 20}'
+        self.assertEqual(self.validator.validate_bytes(data, fail_fast=True),
+                         (False, {key: [DummyValidator.duplicate_keys_error]},
+                          None))
+
+    def test_validate_bytes_limits(self):
+        class LimitedValidator(DummyValidator):
+            max_payload_size = 100
+            max_depth = 2
+            max_keys = 3
+
+        validator = LimitedValidator()
+        key = LimitedValidator.payload_error_key
+
+        data = json.dumps(dict(name='x' * 100, age=20)).encode('utf-8')
+        self.assertEqual(validator.validate_bytes(data),
+                         (False, {key: [LimitedValidator.size_error]}, None))
+
+        data = b'{"name": "x", "age": 20, "tags": [["x"]]}'
+        self.assertEqual(validator.validate_bytes(data),
+                         (False, {key: [LimitedValidator.depth_error]}, None))
+
+        data = b'{"name": "x", "age": 20, "a": 1, "b": 2}'
+        self.assertEqual(validator.validate_bytes(data),
+                         (False, {key: [LimitedValidator.keys_error]}, None))
+
+    def test_validate_bytes_error_limits(self):
+        class LimitedValidator(DummyValidator):
+            strict = True
+            max_errors = 2
+            max_extra_keys = 1
+
+        validator = LimitedValidator()
+        key = LimitedValidator.payload_error_key
+
+        # parsing stops at the first error that is not reported
+        data = b'{"a": 1, "b": 2, "name": 1, "tags": 1, "c": ' + b'[' * 1000
+        self.assertEqual(validator.validate_bytes(data), (False, {
+            'a': [LimitedValidator.strict_error],
+            'name': [DummyValidator.name.error],
+            key: [LimitedValidator.max_errors_error % 2]}, None))
+
+        # nothing is left out of payloads with max_errors errors
+        data = b'{"a": 1, "name": 1, "age": 20}'
+        is_valid, errors, payload = validator.validate_bytes(data)
+        self.assertEqual(errors, {
+            'a': [LimitedValidator.strict_error],
+            'name': [DummyValidator.name.error]})
+        self.assertEqual(errors, validator.validate(payload)[1])
+
+        data = b'{"a": 1, "b": 2, "c": 3, "name": "x", "age": 20}'
+        is_valid, errors, payload = validator.validate_bytes(data)
+        self.assertEqual(errors, {
+            'a': [LimitedValidator.strict_error],
+            key: [LimitedValidator.max_extra_keys_error % 2]})
+        self.assertEqual(errors, validator.validate(payload)[1])
+
+    def test_validate_bytes_builds_results_like_validate(self):
+        class AddressValidator(PayloadValidator):
+            compact_errors = True
+            city = datatypes.String()
+
+        class CompactValidator(DummyValidator):
+            compact_errors = True
+            max_keys = 10
+
+        class PlainValidator(DummyValidator):
+            max_keys = 10
+            address = datatypes.JSON(AddressValidator)
+
+        data = b'{"name": 1, "age": 20}'
+        for fail_fast in (False, True):
+            result = CompactValidator().validate_bytes(data,
+                                                       fail_fast=fail_fast)
+            self.assertTrue(isinstance(result[1], CompactErrors))
+            self.assertEqual(result[1].to_dict(),
+                             {'name': [DummyValidator.name.error]})
+
+        result = CompactValidator().validate_bytes(b'[]')
+        self.assertTrue(isinstance(result[1], CompactErrors))
+
+        # errors of nested validators with compact errors are plain dicts
+        data = b'{"name": "x", "age": 20, "address": {"city": 1}}'
+        for fail_fast in (False, True):
+            is_valid, errors, payload = PlainValidator().validate_bytes(
+                data, fail_fast=fail_fast)
+            self.assertEqual(json.loads(json.dumps(errors)), {'address': [
+                datatypes.JSON._DEFAULT_ERROR,
+                {'city': [datatypes.String._DEFAULT_ERROR]}]})
+
+    def test_validate_bytes_records_metrics_and_profiles(self):
+        registry = MetricsRegistry()
+
+        class MeteredValidator(DummyValidator):
+            metrics = registry
+            max_keys = 10
+
+        validator = MeteredValidator()
+        with PayloadValidator.profile() as profiler:
+            validator.validate_bytes(b'{"name": "x", "age": 20}')
+            validator.validate_bytes(b'{"name": 1, "age": 20}',
+                                     fail_fast=True)
+            validator.validate_bytes(b'{"name": ')
+
+        self.assertEqual(registry.snapshot()['validations'], {
+            'MeteredValidator': {'valid': 1, 'invalid': 1}})
+        stats = dict((stats.field, stats.calls) for stats in profiler.stats())
+        self.assertEqual(stats, dict(name=2, age=1))
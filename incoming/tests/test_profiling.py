@@ -0,0 +1,93 @@
+'''
+    test_profiling
+    ~~~~~~~~~~~~~~
+
+    Tests for incoming.profiling module.
+'''
+
+import time
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+from ..profiling import Profiler
+
+
+class TestProfiling(TestCase):
+
+    def setUp(self):
+        class AddressValidator(PayloadValidator):
+            street = datatypes.String()
+
+        class CustomValidator(PayloadValidator):
+            name = datatypes.String()
+            age = datatypes.Function('validate_age', required=False)
+            address = datatypes.JSON(AddressValidator)
+
+            def validate_age(self, val, *args, **kwargs):
+                time.sleep(0.01)
+                return isinstance(val, int)
+
+        self.AddressValidator = AddressValidator
+        self.CustomValidator = CustomValidator
+        self.payload = dict(name='Test', age=10,
+                            address=dict(street='Test street'))
+
+    def stats(self, profiler):
+        return dict(((s.validator, s.field), s) for s in profiler.stats())
+
+    def test_profile_collects_field_stats(self):
+        validator = self.CustomValidator()
+
+        with self.CustomValidator.profile() as profiler:
+            self.assertTrue(isinstance(profiler, Profiler))
+            validator.validate(self.payload)
+            validator.validate(dict(self.payload, name=1, age='10'))
+            list(validator.validate_many([dict(name='Test', address={})]))
+
+        stats = self.stats(profiler)
+        self.assertItemsEqual(stats.keys(), [
+            ('CustomValidator', 'name'),
+            ('CustomValidator', 'age'),
+            ('CustomValidator', 'address'),
+        ])
+
+        age = stats[('CustomValidator', 'age')]
+        self.assertEqual(age.calls, 3)
+        self.assertEqual(age.failures, 2)
+        self.assertTrue(age.total >= 0.03)
+        self.assertTrue(age.max >= 0.01)
+        self.assertEqual(profiler.stats()[0].field, 'age')
+
+        self.assertEqual(stats[('CustomValidator', 'name')].failures, 1)
+        self.assertEqual(stats[('CustomValidator', 'address')].failures, 1)
+
+    def test_profile_is_off_outside_the_context(self):
+        with self.CustomValidator.profile() as profiler:
+            pass
+
+        self.assertTrue(self.CustomValidator._profiler is None)
+        self.CustomValidator().validate(self.payload)
+        self.assertEqual(profiler.stats(), [])
+
+    def test_profile_all_validators_includes_nested(self):
+        with PayloadValidator.profile() as profiler:
+            self.CustomValidator().validate(self.payload)
+
+        stats = self.stats(profiler)
+        self.assertEqual(stats[('AddressValidator', 'street')].calls, 1)
+
+        address = stats[('CustomValidator', 'address')]
+        self.assertTrue(address.total >=
+                        stats[('AddressValidator', 'street')].total)
+
+    def test_report(self):
+        with self.CustomValidator.profile() as profiler:
+            self.CustomValidator().validate(self.payload)
+
+        report = profiler.report(limit=2).splitlines()
+        self.assertEqual(len(report), 3)
+        self.assertTrue(report[1].startswith('CustomValidator.age'))
+
+        profiler.reset()
+        self.assertEqual(profiler.stats(), [])
@@ -0,0 +1,86 @@
+'''
+    test_stream
+    ~~~~~~~~~~~
+
+    Tests for incoming.stream module.
+'''
+
+import io
+
+from . import TestCase
+from .. import datatypes
+from ..incoming import PayloadValidator
+from ..stream import iter_lines, validate_ndjson
+
+
+class DummyValidator(PayloadValidator):
+    name = datatypes.String()
+    age = datatypes.Integer()
+
+
+class TestIterLines(TestCase):
+
+    def test_iter_lines_splits_across_chunks(self):
+        data = b'first\nsecond line\n\nlast'
+        for chunk_size in (1, 2, 3, 7, 1024):
+            lines = list(iter_lines(io.BytesIO(data), chunk_size=chunk_size))
+            self.assertEqual(lines, [(0, b'first'), (6, b'second line'),
+                                     (18, b''), (19, b'last')])
+
+    def test_iter_lines_text_mode(self):
+        lines = list(iter_lines(io.StringIO(u'a\nb\n'), chunk_size=1))
+        self.assertEqual(lines, [(0, u'a'), (2, u'b')])
+
+    def test_iter_lines_skips_long_lines(self):
+        data = b'short\n' + b'x' * 50 + b'\nshort again\n'
+        for chunk_size in (4, 16, 1024):
+            lines = list(iter_lines(io.BytesIO(data), chunk_size=chunk_size,
+                                    max_line_size=20))
+            self.assertEqual(lines, [(0, b'short'), (6, None),
+                                     (57, b'short again')])
+
+
+class TestValidateNDJSON(TestCase):
+
+    def setUp(self):
+        self.data = (b'{"name": "a", "age": 1}\n'
+                     b'{"name": "b", "age": "2"}\n'
+                     b'\n'
+                     b'not json\n'
+                     b'[1, 2]\n'
+                     b'{"name": "f", "age": 6}')
+
+    def test_validate_ndjson(self):
+        results = list(validate_ndjson(io.BytesIO(self.data), DummyValidator,
+                                       chunk_size=8))
+        self.assertEqual([r.line for r in results], [1, 2, 4, 5, 6])
+        self.assertEqual([r.offset for r in results], [0, 24, 51, 60, 67])
+        self.assertEqual([r.is_valid for r in results],
+                         [True, False, False, False, True])
+        self.assertItemsEqual(results[1].errors.keys(), ['age'])
+
+        key = DummyValidator.payload_error_key
+        self.assertEqual(results[2].errors,
+                         {key: [DummyValidator.decode_error]})
+        self.assertEqual(results[3].errors,
+                         {key: [DummyValidator.decode_error]})
+
+    def test_validate_ndjson_with_instance_and_options(self):
+        results = list(validate_ndjson(io.BytesIO(self.data),
+                                       DummyValidator(), failures_only=True,
+                                       max_failures=2))
+        self.assertEqual([r.line for r in results], [2, 4])
+
+    def test_validate_ndjson_from_offset(self):
+        results = list(validate_ndjson(io.BytesIO(self.data), DummyValidator,
+                                       offset=60))
+        self.assertEqual([(r.line, r.offset) for r in results],
+                         [(1, 60), (2, 67)])
+
+    def test_validate_ndjson_reports_long_lines(self):
+        results = list(validate_ndjson(io.BytesIO(self.data), DummyValidator,
+                                       chunk_size=4, max_line_size=24))
+        self.assertEqual([r.line for r in results], [1, 2, 4, 5, 6])
+        self.assertEqual(results[1].errors,
+                         {DummyValidator.payload_error_key:
+                          [DummyValidator.size_error]})
@@ -34,6 +34,9 @@ setup(name='incoming',
       zip_safe=False,
       classifiers=classifiers,
       install_requires=install_requires,
+      extras_require={
+          'fast': ['orjson'],
+      },
       test_suite='incoming.tests',
       tests_require=[
           'pytest',